@@ -9,17 +9,20 @@ Created on 2018-06-19 17:17
 """
 
 import threading
+import time
+from contextlib import nullcontext
 from queue import Queue
 
 import beapder.utils.tools as tools
 from beapder import setting
+from beapder.core.task_queue import get_task_queue
 from beapder.db.redisdb import RedisDB
 from beapder.dedup import Dedup
 from beapder.network.item import Item, UpdateItem
 from beapder.pipelines import BasePipeline
-from beapder.pipelines.mysql_pipeline import MysqlPipeline
 from beapder.utils import metrics
-from beapder.utils.log import log
+from beapder.utils.log import lazy, log
+from beapder.utils.thread_pool import ThreadPool
 
 MYSQL_PIPELINE_PATH = "beapder.pipelines.mysql_pipeline.MysqlPipeline"
 
@@ -39,7 +42,7 @@ class ItemBuffer(threading.Thread):
 
             self._items_queue = Queue(maxsize=setting.ITEM_MAX_CACHED_COUNT)
 
-            self._table_request = setting.TAB_REQUESTS.format(redis_key=redis_key)
+            self._task_queue = None
             self._table_failed_items = setting.TAB_FAILED_ITEMS.format(
                 redis_key=redis_key
             )
@@ -57,6 +60,16 @@ class ItemBuffer(threading.Thread):
             self._have_mysql_pipeline = MYSQL_PIPELINE_PATH in setting.ITEM_PIPELINES
             self._mysql_pipeline = None
 
+            # 导出线程池，不同pipeline、不同表的数据并发导出
+            self._export_executor = None
+            # 非线程安全的pipeline同一时间只导出一个表
+            self._pipeline_locks = {
+                pipeline: threading.Lock()
+                for pipeline in self._pipelines
+                if not pipeline.thread_safe
+            }
+            self._export_latency = {}  # pipeline名: 导出耗时 秒
+
             if setting.ITEM_FILTER_ENABLE and not self.__class__.dedup:
                 self.__class__.dedup = Dedup(
                     to_md5=False, **setting.ITEM_FILTER_SETTING
@@ -74,6 +87,13 @@ class ItemBuffer(threading.Thread):
 
         return self.__class__.__redis_db
 
+    @property
+    def task_queue(self):
+        if self._task_queue is None:
+            self._task_queue = get_task_queue(self._redis_key)
+
+        return self._task_queue
+
     def load_pipelines(self):
         pipelines = []
         for pipeline_path in setting.ITEM_PIPELINES:
@@ -177,23 +197,19 @@ class ItemBuffer(threading.Thread):
         is_exists = self.__class__.dedup.get(items_fingerprints)
         is_exists = is_exists if isinstance(is_exists, list) else [is_exists]
 
+        # 一次遍历拆分，不在列表头部删除元素
         dedup_items = []
         dedup_items_fingerprints = []
-        items_count = dedup_items_count = dup_items_count = 0
-
-        while is_exists:
-            item = items.pop(0)
-            items_fingerprint = items_fingerprints.pop(0)
-            is_exist = is_exists.pop(0)
-
-            items_count += 1
-
+        for item, items_fingerprint, is_exist in zip(
+            items, items_fingerprints, is_exists
+        ):
             if not is_exist:
                 dedup_items.append(item)
                 dedup_items_fingerprints.append(items_fingerprint)
-                dedup_items_count += 1
-            else:
-                dup_items_count += 1
+
+        items_count = min(len(items), len(items_fingerprints), len(is_exists))
+        dedup_items_count = len(dedup_items)
+        dup_items_count = items_count - dedup_items_count
 
         log.info(
             "待入库数据 {} 条， 重复 {} 条，实际待入库数据 {} 条".format(
@@ -214,59 +230,126 @@ class ItemBuffer(threading.Thread):
             # 'table_name': [{}, {}]
         }
 
-        while items:
-            item = items.pop(0)
+        item_tables = self._item_tables
+        for item in items:
             # 取item下划线格式的名
             # 下划线类的名先从dict中取，没有则现取，然后存入dict。加快下次取的速度
             item_name = item.item_name
-            table_name = self._item_tables.get(item_name)
+            table_name = item_tables.get(item_name)
             if not table_name:
                 table_name = item.table_name
-                self._item_tables[item_name] = table_name
+                item_tables[item_name] = table_name
+
+            datas = datas_dict.get(table_name)
+            if datas is None:
+                datas = datas_dict[table_name] = []
 
-            if table_name not in datas_dict:
-                datas_dict[table_name] = []
+                if is_update_item and table_name not in self._item_update_keys:
+                    self._item_update_keys[table_name] = item.update_key
 
-            datas_dict[table_name].append(item.to_dict)
+            datas.append(item.to_dict)
 
-            if is_update_item and table_name not in self._item_update_keys:
-                self._item_update_keys[table_name] = item.update_key
+        items.clear()
 
         return datas_dict
 
-    def __export_to_db(self, table, datas, is_update=False, update_keys=()):
-        for pipeline in self._pipelines:
-            if is_update:
-                if table == self._task_table and not isinstance(
-                    pipeline, MysqlPipeline
-                ):
-                    continue
+    @property
+    def export_executor(self):
+        if self._export_executor is None:
+            self._export_executor = ThreadPool(
+                max_workers=setting.ITEM_EXPORT_THREAD_COUNT,
+                thread_name_prefix="item_export",
+            )
 
-                if not pipeline.update_items(table, datas, update_keys=update_keys):
-                    log.error(
-                        f"{pipeline.__class__.__name__} 更新数据失败. table: {table}  items: {datas}"
-                    )
-                    return False
+        return self._export_executor
 
-            else:
-                if not pipeline.save_items(table, datas):
-                    log.error(
-                        f"{pipeline.__class__.__name__} 保存数据失败. table: {table}  items: {datas}"
-                    )
-                    return False
+    def __get_export_pipelines(self, table, is_update):
+        if not (is_update and table == self._task_table):
+            return list(self._pipelines)
+
+        # mysql 依赖使用时才导入
+        from beapder.pipelines.mysql_pipeline import MysqlPipeline
+
+        pipelines = [
+            pipeline
+            for pipeline in self._pipelines
+            if isinstance(pipeline, MysqlPipeline)
+        ]
 
         # 若是任务表, 且上面的pipeline里没mysql，则需调用mysql更新任务
-        if not self._have_mysql_pipeline and is_update and table == self._task_table:
-            if not self.mysql_pipeline.update_items(
-                table, datas, update_keys=update_keys
-            ):
-                log.error(
-                    f"{self.mysql_pipeline.__class__.__name__} 更新数据失败. table: {table}  items: {datas}"
+        if not self._have_mysql_pipeline:
+            pipelines.append(self.mysql_pipeline)
+
+        return pipelines
+
+    def __export_by_pipeline(
+        self, pipeline, table, datas, is_update=False, update_keys=()
+    ):
+        pipeline_name = pipeline.__class__.__name__
+
+        with self._pipeline_locks.get(pipeline) or nullcontext():
+            # 耗时不含等锁的时间
+            start_time = time.time()
+            try:
+                if is_update:
+                    success = pipeline.update_items(
+                        table, datas, update_keys=update_keys
+                    )
+                else:
+                    success = pipeline.save_items(table, datas)
+            except Exception as e:
+                log.exception(e)
+                success = False
+            latency = time.time() - start_time
+
+        self._export_latency[pipeline_name] = tools.ewma(
+            self._export_latency.get(pipeline_name, latency), latency
+        )
+        metrics.emit_timer(
+            pipeline_name, latency, classify="export_latency", tags={"table": table}
+        )
+
+        if not success:
+            log.error(
+                f"{pipeline_name} {'更新' if is_update else '保存'}数据失败. table: {table}  items: {datas}"
+            )
+
+        return success
+
+    def __export_to_db(self, exports):
+        """
+        导出数据，每个(表, pipeline)为一个导出任务，提交到线程池并发执行
+        @param exports: [(table, datas, is_update, update_keys)]
+        @return: 每个表是否导出成功，一个表的所有pipeline均成功才算成功
+        """
+        tasks = []
+        for index, (table, datas, is_update, update_keys) in enumerate(exports):
+            for pipeline in self.__get_export_pipelines(table, is_update):
+                tasks.append(
+                    (index, (pipeline, table, datas, is_update, update_keys))
                 )
-                return False
 
-        self.metric_datas(table=table, datas=datas)
-        return True
+        if len(tasks) > 1 and setting.ITEM_EXPORT_THREAD_COUNT > 1:
+            futures = [
+                (index, self.export_executor.submit(self.__export_by_pipeline, *args))
+                for index, args in tasks
+            ]
+            results = [(index, future.result()) for index, future in futures]
+        else:
+            results = [
+                (index, self.__export_by_pipeline(*args)) for index, args in tasks
+            ]
+
+        export_results = [True] * len(exports)
+        for index, success in results:
+            if not success:
+                export_results[index] = False
+
+        for (table, datas, *_), success in zip(exports, export_results):
+            if success:
+                self.metric_datas(table=table, datas=datas)
+
+        return export_results
 
     def __add_item_to_db(
         self, items, update_items, requests, callbacks, items_fingerprints
@@ -284,39 +367,42 @@ class ItemBuffer(threading.Thread):
 
         # item批量入库
         failed_items = {"add": [], "update": [], "requests": []}
-        while items_dict:
-            table, datas = items_dict.popitem()
-
+        exports = []
+        for table, datas in items_dict.items():
             log.debug(
                 """
                 -------------- item 批量入库 --------------
                 表名: %s
                 datas: %s
-                    """
-                % (table, tools.dumps_json(datas, indent=16))
+                    """,
+                table,
+                lazy(tools.dumps_json, datas, indent=16),
             )
+            exports.append((table, datas, False, ()))
 
-            if not self.__export_to_db(table, datas):
+        for (table, datas, *_), success in zip(exports, self.__export_to_db(exports)):
+            if not success:
                 export_success = False
                 failed_items["add"].append({"table": table, "datas": datas})
 
-        # 执行批量update
-        while update_items_dict:
-            table, datas = update_items_dict.popitem()
-
+        # 执行批量update，在入库之后
+        exports = []
+        for table, datas in update_items_dict.items():
             log.debug(
                 """
                 -------------- item 批量更新 --------------
                 表名: %s
                 datas: %s
-                    """
-                % (table, tools.dumps_json(datas, indent=16))
+                    """,
+                table,
+                lazy(tools.dumps_json, datas, indent=16),
             )
+            exports.append((table, datas, True, self._item_update_keys.get(table)))
 
-            update_keys = self._item_update_keys.get(table)
-            if not self.__export_to_db(
-                table, datas, is_update=True, update_keys=update_keys
-            ):
+        for (table, datas, _, update_keys), success in zip(
+            exports, self.__export_to_db(exports)
+        ):
+            if not success:
                 export_success = False
                 failed_items["update"].append(
                     {"table": table, "datas": datas, "update_keys": update_keys}
@@ -324,16 +410,16 @@ class ItemBuffer(threading.Thread):
 
         if export_success:
             # 执行回调
-            while callbacks:
+            for callback in callbacks:
                 try:
-                    callback = callbacks.pop(0)
                     callback()
                 except Exception as e:
                     log.exception(e)
+            callbacks.clear()
 
             # 删除做过的request
             if requests:
-                self.redis_db.zrem(self._table_request, requests)
+                self.task_queue.ack(requests)
 
             # 去重入库
             if setting.ITEM_FILTER_ENABLE:
@@ -349,7 +435,7 @@ class ItemBuffer(threading.Thread):
 
                     # 删除做过的request
                     if requests:
-                        self.redis_db.zrem(self._table_request, requests)
+                        self.task_queue.ack(requests)
 
                     log.error(
                         "入库超过最大重试次数，不再重试，数据记录到redis，items:\n {}".format(
@@ -364,10 +450,8 @@ class ItemBuffer(threading.Thread):
                     tip.append("不执行回调")
                 if requests:
                     tip.append("不删除任务")
-                    exists = self.redis_db.zexists(self._table_request, requests)
-                    for exist, request in zip(exists, requests):
-                        if exist:
-                            self.redis_db.zadd(self._table_request, requests, 300)
+                    # 仍在任务表中的任务释放租约，重新下发
+                    self.task_queue.release(requests)
 
                 if setting.ITEM_FILTER_ENABLE:
                     tip.append("数据不入去重库")
@@ -411,7 +495,16 @@ class ItemBuffer(threading.Thread):
                 metrics.emit_counter(k, int(bool(v)), classify=table)
         metrics.emit_counter("total count", total_count, classify=table)
 
+    def get_export_stats(self):
+        """
+        各pipeline的导出耗时（平滑后） 秒
+        """
+        return dict(self._export_latency)
+
     def close(self):
+        if self._export_executor:
+            self._export_executor.shutdown()
+
         # 调用pipeline的close方法
         for pipeline in self._pipelines:
             try:
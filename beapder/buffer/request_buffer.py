@@ -14,9 +14,12 @@ import threading
 from beapder.utils.load_settings import LoadSettings
 setting = LoadSettings()
 import beapder.utils.tools as tools
+from beapder.core.task_queue import get_task_queue
 from beapder.db.memorydb import MemoryDB
 from beapder.db.redisdb import RedisDB
 from beapder.dedup import Dedup
+from beapder.network.request_codec import get_request_codec
+from beapder.utils import metrics
 from beapder.utils.log import log
 
 MAX_URL_COUNT = 1000  # 缓存中最大request数
@@ -44,10 +47,41 @@ class AirSpiderRequestBuffer:
             and setting.REQUEST_FILTER_ENABLE
             and not self.__class__.dedup.add(request.fingerprint)
         ):
-            log.debug("request已存在  url = %s" % request.url)
+            log.debug("request已存在  url = %s", request.url)
             return True
         return False
 
+    def is_exist_requests(self, requests):
+        """
+        批量判断request是否已存在，需去重的request合并为一次去重库的调用
+        @return: list 与requests一一对应
+        """
+        is_exists = [False] * len(requests)
+        if not setting.REQUEST_FILTER_ENABLE:
+            return is_exists
+
+        indexes = [i for i, request in enumerate(requests) if request.filter_repeat]
+        if not indexes:
+            return is_exists
+
+        dedup = self.__class__.dedup
+        stats = dedup.stats() if hasattr(dedup, "stats") else {}
+        is_added = dedup.add([requests[i].fingerprint for i in indexes])
+        for i, added in zip(indexes, is_added):
+            if not added:
+                is_exists[i] = True
+                log.debug("request已存在  url = %s", requests[i].url)
+
+        if stats:
+            # 本地缓存命中的request数及免去的redis访问次数
+            new_stats = dedup.stats()
+            for key in ("hits", "misses", "remote_calls", "remote_calls_avoided"):
+                metrics.emit_counter(
+                    key, new_stats[key] - stats[key], classify="request_dedup"
+                )
+
+        return is_exists
+
     def put_request(self, request, ignore_max_size=True):
         if self.is_exist_request(request):
             return
@@ -66,7 +100,9 @@ class RequestBuffer(AirSpiderRequestBuffer, threading.Thread):
         self._requests_deque = collections.deque()
         self._del_requests_deque = collections.deque()
 
-        self._table_request = setting.TAB_REQUESTS.format(redis_key=redis_key)
+        self._request_codec = get_request_codec()
+        self._task_queue = get_task_queue(redis_key)
+
         self._table_failed_request = setting.TAB_FAILED_REQUESTS.format(
             redis_key=redis_key
         )
@@ -96,9 +132,10 @@ class RequestBuffer(AirSpiderRequestBuffer, threading.Thread):
 
     def put_failed_request(self, request, table=None):
         try:
-            request_dict = request.to_dict
             self._db.zadd(
-                table or self._table_failed_request, request_dict, request.priority
+                table or self._table_failed_request,
+                self._request_codec.dumps(request),
+                request.priority,
             )
         except Exception as e:
             log.exception(e)
@@ -118,8 +155,11 @@ class RequestBuffer(AirSpiderRequestBuffer, threading.Thread):
     def __add_request_to_db(self):
         request_list = []
         prioritys = []
+        shard_keys = []
         callbacks = []
+        added_requests = set()  # 本次添加的全部request
 
+        requests = []
         while self._requests_deque:
             request = self._requests_deque.popleft()
             self._is_adding_to_db = True
@@ -133,23 +173,28 @@ class RequestBuffer(AirSpiderRequestBuffer, threading.Thread):
                 callbacks.append(request)
                 continue
 
-            priority = request.priority
+            requests.append(request)
 
-            # 如果需要去重并且库中已重复 则continue
-            if self.is_exist_request(request):
+        # 如果需要去重并且库中已重复 则跳过，本批次的request一次去重
+        for request, is_exist in zip(requests, self.is_exist_requests(requests)):
+            if is_exist:
                 continue
-            else:
-                request_list.append(str(request.to_dict))
-                prioritys.append(priority)
+
+            request_list.append(self._request_codec.dumps(request))
+            prioritys.append(request.priority)
+            shard_keys.append(self._task_queue.get_shard_key(request))
 
             if len(request_list) > MAX_URL_COUNT:
-                self._db.zadd(self._table_request, request_list, prioritys)
+                self._task_queue.put(request_list, prioritys, shard_keys)
+                added_requests.update(request_list)
                 request_list = []
                 prioritys = []
+                shard_keys = []
 
         # 入库
         if request_list:
-            self._db.zadd(self._table_request, request_list, prioritys)
+            self._task_queue.put(request_list, prioritys, shard_keys)
+            added_requests.update(request_list)
 
         # 执行回调
         for callback in callbacks:
@@ -164,10 +209,14 @@ class RequestBuffer(AirSpiderRequestBuffer, threading.Thread):
             while self._del_requests_deque:
                 request_done_list.append(self._del_requests_deque.popleft())
 
-            # 去掉request_list中的requests， 否则可能会将刚添加的request删除
-            request_done_list = list(set(request_done_list) - set(request_list))
+            # 去掉本次添加的requests， 否则可能会将刚添加的request删除
+            request_done_list = [
+                handle
+                for handle in set(request_done_list)
+                if self._task_queue.get_handle_data(handle) not in added_requests
+            ]
 
             if request_done_list:
-                self._db.zrem(self._table_request, request_done_list)
+                self._task_queue.ack(request_done_list)
 
         self._is_adding_to_db = False
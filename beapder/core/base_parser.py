@@ -10,7 +10,6 @@ Created on 2018-07-25 11:41:57
 import os
 
 import beapder.utils.tools as tools
-from beapder.db.mysqldb import MysqlDB
 from beapder.network.item import UpdateItem
 from beapder.utils.log import log
 
@@ -65,6 +64,19 @@ class BaseParser(object):
 
         pass
 
+    def not_modified(self, request, response):
+        """
+        @summary: 条件请求时页面未修改（服务器返回304）的处理函数，默认不解析
+        同时开启 RESPONSE_CACHED_ENABLE 且有缓存时，response 为缓存的响应，可调用解析函数重新解析
+        ---------
+        @param request:
+        @param response: response.not_modified 为 True
+        ---------
+        @result: request / item / callback / None (返回值必须可迭代)
+        """
+
+        pass
+
     def exception_request(self, request, response, e):
         """
         @summary: 请求或者parser里解析出异常的request
@@ -122,7 +134,11 @@ class BaseParser(object):
 
 class TaskParser(BaseParser):
     def __init__(self, task_table, task_state, mysqldb=None):
-        self._mysqldb = mysqldb or MysqlDB()  # mysqldb
+        if not mysqldb:
+            from beapder.db.mysqldb import MysqlDB
+
+            mysqldb = MysqlDB()
+        self._mysqldb = mysqldb  # mysqldb
 
         self._task_state = task_state  # mysql中任务表的state字段名
         self._task_table = task_table  # mysql中的任务表
@@ -218,7 +234,7 @@ class BatchParser(TaskParser):
                 date_format=self._date_format.replace(":%M", ":%i"),
                 batch_record_table=self._batch_record_table,
             )
-            batch_info = MysqlDB().find(sql)  # (('2018-08-19'),)
+            batch_info = self._mysqldb.find(sql)  # (('2018-08-19'),)
             if batch_info:
                 os.environ["batch_date"] = batch_date = batch_info[0][0]
             else:
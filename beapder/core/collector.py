@@ -8,23 +8,31 @@ Created on 2016-12-23 11:24
 @email: boris_liu@foxmail.com
 """
 
+import collections
+import math
 import threading
 import time
-from queue import Queue, Empty
-
 
 import beapder.utils.tools as tools
-from beapder.db.redisdb import RedisDB
+from beapder.core.task_queue import get_task_queue
 from beapder.network.request import Request
+from beapder.network.request_codec import get_request_codec
+from beapder.utils import metrics
 from beapder.utils.log import log
 from beapder.utils.load_settings import LoadSettings
 setting = LoadSettings()
 
+# 消费速率及取任务耗时的平滑系数
+EWMA_ALPHA = 0.3
+# 每次取的任务预计可供消费的时长（秒），不含取任务本身的耗时
+PREFETCH_HORIZON = 1
+
 
 class Collector(threading.Thread):
     def __init__(self, redis_key):
         """
-        @summary:
+        @summary: 从redis中预取任务，供parser_control消费
+        本地队列低于低水位时补充任务，单次取的数量根据消费速率及取任务的耗时自适应，最多补充到高水位
         ---------
         @param redis_key:
         ---------
@@ -32,16 +40,33 @@ class Collector(threading.Thread):
         """
 
         super(Collector, self).__init__()
-        self._db = RedisDB()
+        self._task_queue = get_task_queue(redis_key)
+        self._request_codec = get_request_codec()
 
         self._thread_stop = False
 
-        self._todo_requests = Queue(maxsize=setting.COLLECTOR_TASK_COUNT)
-        self._tab_requests = setting.TAB_REQUESTS.format(redis_key=redis_key)
+        self._todo_requests = collections.deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)  # 通知消费者有任务
+        self._need_fill = threading.Condition(self._lock)  # 通知collector补充任务
+
         self._is_collector_task = False
 
+        # 水位，SPIDER_THREAD_COUNT 可能在collector创建后才被修改，run时再计算
+        self._low_watermark = 1
+        self._high_watermark = setting.COLLECTOR_TASK_COUNT
+
+        # 统计
+        self._consumed_count = 0  # 上次统计后被消费的任务数
+        self._last_stat_time = time.time()
+        self._drain_rate = 0  # 每秒消费的任务数
+        self._fetch_latency = 0  # 取任务的耗时 秒
+        self._fetch_size = 0  # 最近一次取任务的数量
+
     def run(self):
         self._thread_stop = False
+        self.__init_watermark()
+
         while not self._thread_stop:
             try:
                 self.__input_data()
@@ -55,39 +80,107 @@ class Collector(threading.Thread):
         self._thread_stop = True
         self._started.clear()
 
+        with self._lock:
+            self._need_fill.notify_all()
+
+    def __init_watermark(self):
+        # 异步下载时同时处理的任务数为 ASYNC_CONCURRENT_REQUESTS
+        thread_count = max(
+            setting.ASYNC_CONCURRENT_REQUESTS
+            if setting.DOWNLOAD_ENGINE == "asyncio"
+            else setting.SPIDER_THREAD_COUNT,
+            1,
+        )
+        self._high_watermark = max(setting.COLLECTOR_TASK_COUNT, thread_count)
+        self._low_watermark = max(min(thread_count, self._high_watermark // 2), 1)
+
+    def __update_drain_rate(self):
+        now = time.time()
+        elapsed = now - self._last_stat_time
+        if elapsed < 0.1:
+            return
+
+        with self._lock:
+            consumed_count = self._consumed_count
+            self._consumed_count = 0
+
+        self._last_stat_time = now
+        self._drain_rate = tools.ewma(
+            self._drain_rate, consumed_count / elapsed, EWMA_ALPHA
+        )
+
+    def __get_fetch_size(self, queue_depth):
+        """
+        单次取任务的数量：取回来的任务需覆盖下次取任务完成前的消费，同时不超过高水位
+        """
+        free_size = self._high_watermark - queue_depth
+        if not self._drain_rate:
+            # 尚无消费数据，直接补满
+            return free_size
+
+        fetch_size = math.ceil(
+            self._drain_rate * (self._fetch_latency + PREFETCH_HORIZON)
+        )
+        return max(min(fetch_size, free_size), 1)
+
     def __input_data(self):
-        if setting.COLLECTOR_TASK_COUNT / setting.SPIDER_THREAD_COUNT > 1 and (
-            self._todo_requests.qsize() > setting.SPIDER_THREAD_COUNT
-            or self._todo_requests.qsize() >= self._todo_requests.maxsize
-        ):
-            time.sleep(0.1)
+        with self._lock:
+            # 高于低水位时等待消费者通知，不轮询
+            if len(self._todo_requests) > self._low_watermark:
+                self._need_fill.wait(timeout=1)
+
+            queue_depth = len(self._todo_requests)
+
+        self.__update_drain_rate()
+
+        if queue_depth > self._low_watermark or self._thread_stop:
             return
 
-        current_timestamp = tools.get_current_timestamp()
+        fetch_size = self.__get_fetch_size(queue_depth)
 
-        # 取任务，只取当前时间搓以内的任务，同时将任务分数修改为 current_timestamp + setting.REQUEST_LOST_TIMEOUT
-        requests_list = self._db.zrangebyscore_set_score(
-            self._tab_requests,
-            priority_min="-inf",
-            priority_max=current_timestamp,
-            score=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
-            count=setting.COLLECTOR_TASK_COUNT,
+        # 取任务，REQUEST_LOST_TIMEOUT 内未做完的任务会被重新下发
+        start_time = time.time()
+        tasks = self._task_queue.lease(fetch_size)
+        fetch_latency = time.time() - start_time
+
+        self._fetch_latency = tools.ewma(
+            self._fetch_latency, fetch_latency, EWMA_ALPHA
         )
+        self._fetch_size = len(tasks)
+        self.__emit_metrics(queue_depth, fetch_latency)
 
-        if requests_list:
+        if tasks:
             self._is_collector_task = True
             # 存request
-            self.__put_requests(requests_list)
+            self.__put_requests(tasks)
         else:
             time.sleep(0.1)
 
-    def __put_requests(self, requests_list):
-        for request in requests_list:
+    def __put_requests(self, tasks):
+        # 在锁外批量解码，再一次性放入队列
+        request_dicts = []
+        legacy_handles = []
+        migrated_requests = []
+
+        for handle, request in tasks:
             try:
+                request_data = self._request_codec.loads(request)
                 request_dict = {
-                    "request_obj": Request.from_dict(eval(request)),
-                    "request_redis": request,
+                    "request_obj": Request.from_dict(request_data),
+                    "request_redis": handle,  # 删除任务时使用
+                    "request_raw": request,  # 编码后的request
                 }
+                if self._request_codec.migrate_legacy and self._request_codec.is_legacy(
+                    request
+                ):
+                    # 老版本格式的任务，重新编码后替换，后续删除任务时使用的是新格式
+                    legacy_handles.append(handle)
+                    request_dict["request_raw"] = self._request_codec.encode(
+                        request_data
+                    )
+                    migrated_requests.append(request_dict)
+
+                request_dicts.append(request_dict)
             except Exception as e:
                 log.exception(
                     """
@@ -97,22 +190,68 @@ class Collector(threading.Thread):
                     % (e, request)
                 )
 
-                request_dict = None
+        if legacy_handles:
+            handles = self._task_queue.replace(
+                legacy_handles,
+                [request_dict["request_raw"] for request_dict in migrated_requests],
+            )
+            for request_dict, handle in zip(migrated_requests, handles):
+                request_dict["request_redis"] = handle
+            log.debug("迁移老版本格式的任务 %s 条", len(legacy_handles))
 
-            if request_dict:
-                self._todo_requests.put(request_dict)
+        if request_dicts:
+            with self._lock:
+                self._todo_requests.extend(request_dicts)
+                self._not_empty.notify(len(request_dicts))
+
+    def __emit_metrics(self, queue_depth, fetch_latency):
+        metrics.emit_store("queue_depth", queue_depth, classify="collector")
+        metrics.emit_store("fetch_size", self._fetch_size, classify="collector")
+        metrics.emit_timer("fetch_latency", fetch_latency, classify="collector")
+
+    def get_request(self, timeout=1):
+        with self._lock:
+            if not self._todo_requests:
+                if timeout > 0:
+                    self._not_empty.wait(timeout=timeout)
+                if not self._todo_requests:
+                    return None
+
+            request = self._todo_requests.popleft()
+            self._consumed_count += 1
+
+            if len(self._todo_requests) <= self._low_watermark:
+                self._need_fill.notify()
 
-    def get_request(self):
-        try:
-            request = self._todo_requests.get(timeout=1)
             return request
-        except Empty as e:
-            return None
+
+    def renew_requests(self, requests):
+        """
+        续约已取出但尚未下载的任务，避免等待下载期间租约到期被重新下发
+        """
+        try:
+            count = self._task_queue.renew(
+                [request["request_redis"] for request in requests]
+            )
+            log.debug("续约任务 %s 条", count)
+        except Exception as e:
+            log.exception(e)
 
     def get_requests_count(self):
-        return (
-            self._todo_requests.qsize() or self._db.zget_count(self._tab_requests) or 0
-        )
+        return len(self._todo_requests) or self._task_queue.get_count()
+
+    def get_stats(self):
+        """
+        预取状态 队列深度、最近一次取任务的数量、取任务耗时、消费速率
+        """
+        return {
+            "queue_depth": len(self._todo_requests),
+            "fetch_size": self._fetch_size,
+            "fetch_latency": self._fetch_latency,
+            "drain_rate": self._drain_rate,
+            "low_watermark": self._low_watermark,
+            "high_watermark": self._high_watermark,
+        }
 
     def is_collector_task(self):
         return self._is_collector_task
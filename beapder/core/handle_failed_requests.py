@@ -10,6 +10,7 @@ Created on 2018-08-13 11:43:01
 from beapder.buffer.request_buffer import RequestBuffer
 from beapder.db.redisdb import RedisDB
 from beapder.network.request import Request
+from beapder.network.request_codec import get_request_codec
 from beapder.utils.log import log
 from beapder.utils.load_settings import LoadSettings
 setting = LoadSettings()
@@ -20,7 +21,8 @@ class HandleFailedRequests:
         if redis_key.endswith(":z_failed_requests"):
             redis_key = redis_key.replace(":z_failed_requests", "")
 
-        self._redisdb = RedisDB()
+        self._redisdb = RedisDB(decode_responses=False)
+        self._request_codec = get_request_codec()
         self._request_buffer = RequestBuffer(redis_key)
 
         self._table_failed_request = setting.TAB_FAILED_REQUESTS.format(
@@ -29,7 +31,10 @@ class HandleFailedRequests:
 
     def get_failed_requests(self, count=10000):
         failed_requests = self._redisdb.zget(self._table_failed_request, count=count)
-        failed_requests = [eval(failed_request) for failed_request in failed_requests]
+        failed_requests = [
+            self._request_codec.loads(failed_request)
+            for failed_request in failed_requests
+        ]
         return failed_requests
 
     def reput_failed_requests_to_requests(self):
@@ -7,6 +7,8 @@ Created on 2017-01-03 16:06
 @author: Boris
 @email: boris_liu@foxmail.com
 """
+import asyncio
+import functools
 import inspect
 import random
 import threading
@@ -17,11 +19,15 @@ import beapder.utils.tools as tools
 from beapder.buffer.item_buffer import ItemBuffer
 from beapder.buffer.request_buffer import AirSpiderRequestBuffer
 from beapder.core.base_parser import BaseParser
+from beapder.core.slot_scheduler import SlotScheduler
 from beapder.db.memorydb import MemoryDB
 from beapder.network.item import Item
 from beapder.network.request import Request
+from beapder.network.request_codec import get_request_codec
+from beapder.network.response import Response
 from beapder.utils import metrics
-from beapder.utils.log import log
+from beapder.utils.log import lazy, log
+from beapder.utils.thread_pool import ThreadPool
 from beapder.utils.load_settings import LoadSettings
 setting = LoadSettings()
 
@@ -33,6 +39,7 @@ class ParserControl(threading.Thread):
     PAESERS_EXCEPTION = "parser_exception"
 
     is_show_tip = False
+    is_async = False  # 是否异步下载，异步时一个parser_control即可驱动全部请求
 
     # 实时统计已做任务数及失败任务数，若失败任务数/已做任务数>0.5 则报警
     _success_task_count = 0
@@ -48,6 +55,7 @@ class ParserControl(threading.Thread):
         self._redis_key = redis_key
         self._request_buffer = request_buffer
         self._item_buffer = item_buffer
+        self._slot_scheduler = SlotScheduler.from_settings()
 
         self._thread_stop = False
 
@@ -55,7 +63,7 @@ class ParserControl(threading.Thread):
         self._thread_stop = False
         while not self._thread_stop:
             try:
-                request = self._collector.get_request()
+                request = self.next_task()
                 if not request:
                     if not self.is_show_tip:
                         log.debug("等待任务...")
@@ -69,15 +77,114 @@ class ParserControl(threading.Thread):
                 log.exception(e)
 
     def is_not_task(self):
-        return self.is_show_tip
+        return self.is_show_tip and not self.held_task_count
+
+    @property
+    def held_task_count(self):
+        """
+        因域名限速暂存的任务数
+        """
+        return self._slot_scheduler.held_count if self._slot_scheduler else 0
 
     @classmethod
     def get_task_status_count(cls):
         return cls._failed_task_count, cls._success_task_count, cls._total_task_count
 
+    def get_task(self, timeout=1):
+        return self._collector.get_request(timeout)
+
+    def get_task_request(self, task):
+        return task["request_obj"]
+
+    def renew_tasks(self, tasks):
+        """
+        续约因域名限速暂存的任务
+        """
+        self._collector.renew_requests(tasks)
+
+    def next_task(self):
+        """
+        取下一个任务。开启域名限速时，所在域名不可下载的任务暂存，先处理其他域名的任务
+        """
+        if not self._slot_scheduler:
+            return self.get_task()
+        return self._slot_scheduler.get(
+            self.get_task, self.get_task_request, renew_tasks=self.renew_tasks
+        )
+
+    def release_slot(self, task, latency=None, success=True):
+        """
+        任务首次下载完毕后释放所在域名的并发数
+        """
+        if self._slot_scheduler:
+            self._slot_scheduler.release(task, latency, success)
+
+    @staticmethod
+    def report_proxy(request, latency=None, response=None):
+        """
+        向代理池反馈本次下载所用代理的结果。下载异常为失败，响应状态码为 PROXY_BAN_STATUS_CODES 时视为被封
+        """
+        if request.custom_proxies or not request.proxies_pool:
+            return
+        proxies = request.get_proxies()
+        if not proxies:
+            return
+
+        if response is None:
+            request.proxies_pool.report(proxies, success=False)
+        else:
+            banned = response.status_code in setting.PROXY_BAN_STATUS_CODES
+            request.proxies_pool.report(
+                proxies, success=not banned, latency=latency, banned=banned
+            )
+
     def deal_request(self, request):
+        """
+        处理任务，下载与解析在当前线程中依次进行
+        """
+        try:
+            steps = self._deal_request_steps(request)
+            download_request = self._next_step(next, steps)
+            while download_request is not None:
+                start_time = time.time()
+                try:
+                    response = self.download(download_request)
+                except Exception as e:
+                    self.release_slot(request, time.time() - start_time, False)
+                    self.report_proxy(download_request)
+                    download_request = self._next_step(steps.throw, e)
+                else:
+                    latency = time.time() - start_time
+                    self.release_slot(request, latency, response.status_code == 200)
+                    self.report_proxy(download_request, latency, response)
+                    download_request = self._next_step(steps.send, response)
+        finally:
+            self.release_slot(request)
+
+    @staticmethod
+    def _next_step(func, *args):
+        """
+        推进处理任务的生成器，返回下一个需下载的request，处理完毕时返回None
+        """
+        try:
+            return func(*args)
+        except StopIteration:
+            return None
+
+    def download(self, request):
+        if setting.RESPONSE_CACHED_USED:
+            return request.get_response_from_cached(save_cached=False)
+        return request.get_response()
+
+    def _deal_request_steps(self, request):
+        """
+        处理任务的各个步骤，需下载时 yield 待下载的request，由调用方下载后将response（或下载异常）送回
+        下载与其余步骤分离，同步与异步的parser_control共用此处的逻辑
+        """
         response = None
         request_redis = request["request_redis"]
+        # 编码后的request，任务队列的handle与编码后的request不一定相同
+        request_raw = request.get("request_raw", request_redis)
         request = request["request_obj"]
 
         del_request_redis_after_item_to_db = False
@@ -137,33 +244,28 @@ class ParserControl(threading.Thread):
                                 )
                             used_download_midware_enable = True
                             if not response:
-                                response = (
-                                    request_temp.get_response()
-                                    if not setting.RESPONSE_CACHED_USED
-                                    else request_temp.get_response_from_cached(
-                                        save_cached=False
-                                    )
-                                )
+                                response = yield request_temp
                         else:
-                            response = (
-                                request.get_response()
-                                if not setting.RESPONSE_CACHED_USED
-                                else request.get_response_from_cached(save_cached=False)
-                            )
+                            response = yield request
 
                         if response == None:
                             raise Exception(
                                 "连接超时 url: %s" % (request.url or request_temp.url)
                             )
 
-                        # 校验
-                        if parser.validate(request, response) == False:
+                        # 校验，条件请求页面未修改时不校验
+                        if (
+                            not getattr(response, "not_modified", False)
+                            and parser.validate(request, response) == False
+                        ):
                             break
 
                     else:
                         response = None
 
-                    if request.callback:  # 如果有parser的回调函数，则用回调处理
+                    if getattr(response, "not_modified", False):  # 条件请求页面未修改
+                        results = parser.not_modified(request, response)
+                    elif request.callback:  # 如果有parser的回调函数，则用回调处理
                         callback_parser = (
                             request.callback
                             if callable(request.callback)
@@ -234,7 +336,7 @@ class ParserControl(threading.Thread):
                     exception_type = (
                         str(type(e)).replace("<class '", "").replace("'>", "")
                     )
-                    if exception_type.startswith("requests"):
+                    if exception_type.startswith(("requests", "aiohttp", "asyncio")):
                         # 记录下载失败的文档
                         self.record_download_status(
                             ParserControl.DOWNLOAD_EXCEPTION, parser.name
@@ -255,22 +357,20 @@ class ParserControl(threading.Thread):
                         error          %s
                         response       %s
                         deal request   %s
-                        """
-                        % (
-                            parser.name,
-                            (
-                                request.callback
-                                and callable(request.callback)
-                                and getattr(request.callback, "__name__")
-                                or request.callback
-                            )
-                            or "parse",
-                            str(e),
-                            response,
-                            tools.dumps_json(request.to_dict, indent=28)
-                            if setting.LOG_LEVEL == "DEBUG"
-                            else request,
+                        """,
+                        parser.name,
+                        (
+                            request.callback
+                            and callable(request.callback)
+                            and getattr(request.callback, "__name__")
+                            or request.callback
                         )
+                        or "parse",
+                        str(e),
+                        response,
+                        lazy(tools.dumps_json, request.to_dict, indent=28)
+                        if setting.LOG_LEVEL == "DEBUG"
+                        else request,
                     )
 
                     request.error_msg = "%s: %s" % (exception_type, e)
@@ -315,8 +415,10 @@ class ParserControl(threading.Thread):
                                         if used_download_midware_enable:
                                             # 去掉download_midware 添加的属性
                                             original_request = (
-                                                Request.from_dict(eval(request_redis))
-                                                if request_redis
+                                                Request.from_dict(
+                                                    get_request_codec().loads(request_raw)
+                                                )
+                                                if request_raw
                                                 else result
                                             )
                                             original_request.error_msg = (
@@ -359,8 +461,10 @@ class ParserControl(threading.Thread):
                             if used_download_midware_enable:
                                 # 去掉download_midware 添加的属性 使用原来的requests
                                 original_request = (
-                                    Request.from_dict(eval(request_redis))
-                                    if request_redis
+                                    Request.from_dict(
+                                        get_request_codec().loads(request_raw)
+                                    )
+                                    if request_raw
                                     else request
                                 )
                                 if hasattr(request, "error_msg"):
@@ -390,11 +494,19 @@ class ParserControl(threading.Thread):
                             expire_time=setting.RESPONSE_CACHED_EXPIRE_TIME,
                         )
 
+                    # 解析成功后记录条件请求的校验信息
+                    if isinstance(response, Response):
+                        request.save_validators(response)
+
                 finally:
                     # 释放浏览器
                     if response and getattr(response, "browser", None):
                         request.render_downloader.put_back(response.browser)
 
+                    # 释放解析的文档
+                    if isinstance(response, Response):
+                        response.release_document()
+
                 break
 
         # 删除正在做的request 跟随item优先
@@ -471,24 +583,19 @@ class AirSpiderParserControl(ParserControl):
         self._thread_stop = False
         self._request_buffer = request_buffer
         self._item_buffer = item_buffer
+        self._slot_scheduler = SlotScheduler.from_settings()
 
-    def run(self):
-        while not self._thread_stop:
-            try:
-                request = self._memory_db.get()
-                if not request:
-                    if not self.is_show_tip:
-                        log.debug("等待任务...")
-                        self.is_show_tip = True
-                    continue
+    def get_task(self, timeout=1):
+        return self._memory_db.get(timeout)
 
-                self.is_show_tip = False
-                self.deal_request(request)
+    def get_task_request(self, task):
+        return task
 
-            except Exception as e:
-                log.exception(e)
+    def renew_tasks(self, tasks):
+        # 内存中的任务无租约
+        pass
 
-    def deal_request(self, request):
+    def _deal_request_steps(self, request):
         response = None
 
         for parser in self._parsers:
@@ -545,20 +652,21 @@ class AirSpiderParserControl(ParserControl):
                             request = request_temp
 
                         if not response:
-                            response = (
-                                request.get_response()
-                                if not setting.RESPONSE_CACHED_USED
-                                else request.get_response_from_cached(save_cached=False)
-                            )
+                            response = yield request
 
-                        # 校验
-                        if parser.validate(request, response) == False:
+                        # 校验，条件请求页面未修改时不校验
+                        if (
+                            not getattr(response, "not_modified", False)
+                            and parser.validate(request, response) == False
+                        ):
                             break
 
                     else:
                         response = None
 
-                    if request.callback:  # 如果有parser的回调函数，则用回调处理
+                    if getattr(response, "not_modified", False):  # 条件请求页面未修改
+                        results = parser.not_modified(request, response)
+                    elif request.callback:  # 如果有parser的回调函数，则用回调处理
                         callback_parser = (
                             request.callback
                             if callable(request.callback)
@@ -607,7 +715,7 @@ class AirSpiderParserControl(ParserControl):
                     exception_type = (
                         str(type(e)).replace("<class '", "").replace("'>", "")
                     )
-                    if exception_type.startswith("requests"):
+                    if exception_type.startswith(("requests", "aiohttp", "asyncio")):
                         # 记录下载失败的文档
                         self.record_download_status(
                             ParserControl.DOWNLOAD_EXCEPTION, parser.name
@@ -628,22 +736,20 @@ class AirSpiderParserControl(ParserControl):
                             error          %s
                             response       %s
                             deal request   %s
-                            """
-                        % (
-                            parser.name,
-                            (
-                                request.callback
-                                and callable(request.callback)
-                                and getattr(request.callback, "__name__")
-                                or request.callback
-                            )
-                            or "parse",
-                            str(e),
-                            response,
-                            tools.dumps_json(request.to_dict, indent=28)
-                            if setting.LOG_LEVEL == "DEBUG"
-                            else request,
+                            """,
+                        parser.name,
+                        (
+                            request.callback
+                            and callable(request.callback)
+                            and getattr(request.callback, "__name__")
+                            or request.callback
                         )
+                        or "parse",
+                        str(e),
+                        response,
+                        lazy(tools.dumps_json, request.to_dict, indent=28)
+                        if setting.LOG_LEVEL == "DEBUG"
+                        else request,
                     )
 
                     request.error_msg = "%s: %s" % (exception_type, e)
@@ -724,11 +830,19 @@ class AirSpiderParserControl(ParserControl):
                             expire_time=setting.RESPONSE_CACHED_EXPIRE_TIME,
                         )
 
+                    # 解析成功后记录条件请求的校验信息
+                    if isinstance(response, Response):
+                        request.save_validators(response)
+
                 finally:
                     # 释放浏览器
                     if response and getattr(response, "browser", None):
                         request.render_downloader.put_back(response.browser)
 
+                    # 释放解析的文档
+                    if isinstance(response, Response):
+                        response.release_document()
+
                 break
 
         if setting.SPIDER_SLEEP_TIME:
@@ -742,3 +856,119 @@ class AirSpiderParserControl(ParserControl):
                 time.sleep(sleep_time)
             else:
                 time.sleep(setting.SPIDER_SLEEP_TIME)
+
+
+class AsyncParserControlMixin:
+    """
+    以asyncio事件循环驱动下载，最多 ASYNC_CONCURRENT_REQUESTS 个请求同时进行
+    下载中间件、校验、解析等同步的回调在 SPIDER_THREAD_COUNT 个线程的线程池中执行，回调的写法不变
+    """
+
+    is_async = True
+
+    def run(self):
+        self._thread_stop = False
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._run_async())
+        finally:
+            loop.close()
+
+    async def _run_async(self):
+        self._loop = asyncio.get_event_loop()
+        # 取任务、渲染等同步下载使用默认的线程池，解析使用单独的线程池
+        self._loop.set_default_executor(ThreadPool(thread_name_prefix="async_download"))
+        self._executor = ThreadPool(
+            max(setting.SPIDER_THREAD_COUNT, 1), thread_name_prefix="parser_control"
+        )
+        self._tasks = set()
+        semaphore = asyncio.Semaphore(setting.ASYNC_CONCURRENT_REQUESTS)
+
+        def on_done(task):
+            self._tasks.discard(task)
+            semaphore.release()
+
+        while not self._thread_stop:
+            await semaphore.acquire()
+            try:
+                # 取任务最多阻塞1秒，不占用解析线程
+                request = await self._loop.run_in_executor(None, self.next_task)
+            except Exception as e:
+                log.exception(e)
+                request = None
+
+            if not request:
+                semaphore.release()
+                if not self.is_show_tip:
+                    log.debug("等待任务...")
+                    self.is_show_tip = True
+                continue
+
+            self.is_show_tip = False
+            task = self._loop.create_task(self.deal_request_async(request))
+            self._tasks.add(task)
+            task.add_done_callback(on_done)
+
+        # 等待进行中的请求处理完毕
+        if self._tasks:
+            await asyncio.wait(list(self._tasks))
+        await Request.close_async_downloader()
+        self._executor.shutdown()
+
+    def is_not_task(self):
+        return (
+            self.is_show_tip
+            and not getattr(self, "_tasks", None)
+            and not self.held_task_count
+        )
+
+    async def _run_step(self, func, *args):
+        return await self._loop.run_in_executor(
+            self._executor, functools.partial(self._next_step, func, *args)
+        )
+
+    async def deal_request_async(self, request):
+        """
+        处理任务，下载在事件循环中进行，其余步骤在线程池中进行
+        """
+        try:
+            steps = self._deal_request_steps(request)
+            download_request = await self._run_step(next, steps)
+            while download_request is not None:
+                start_time = time.time()
+                try:
+                    response = await self.download_async(download_request)
+                except Exception as e:
+                    self.release_slot(request, time.time() - start_time, False)
+                    self.report_proxy(download_request)
+                    download_request = await self._run_step(steps.throw, e)
+                else:
+                    latency = time.time() - start_time
+                    self.release_slot(request, latency, response.status_code == 200)
+                    self.report_proxy(download_request, latency, response)
+                    download_request = await self._run_step(steps.send, response)
+        except Exception as e:
+            log.exception(e)
+        finally:
+            self.release_slot(request)
+
+    async def download_async(self, request):
+        if setting.RESPONSE_CACHED_USED:
+            return await self._loop.run_in_executor(
+                self._executor, request.get_response_from_cached, False
+            )
+        return await request.get_response_async()
+
+    def download(self, request):
+        # 同步请求（request_sync）在解析线程中处理，下载仍交给事件循环
+        return asyncio.run_coroutine_threadsafe(
+            self.download_async(request), self._loop
+        ).result()
+
+
+class AsyncParserControl(AsyncParserControlMixin, ParserControl):
+    pass
+
+
+class AirSpiderAsyncParserControl(AsyncParserControlMixin, AirSpiderParserControl):
+    pass
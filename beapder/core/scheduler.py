@@ -7,6 +7,7 @@ Created on 2017-01-09 10:38
 @author: Boris
 @email: boris_liu@foxmail.com
 """
+import multiprocessing
 import threading
 import time
 from collections.abc import Iterable
@@ -18,7 +19,8 @@ from beapder.core.base_parser import BaseParser
 from beapder.core.collector import Collector
 from beapder.core.handle_failed_requests import HandleFailedRequests
 from beapder.core.handle_failed_items import HandleFailedItems
-from beapder.core.parser_control import ParserControl
+from beapder.core.parser_control import AsyncParserControl, ParserControl
+from beapder.core.task_queue import get_task_queue
 from beapder.db.redisdb import RedisDB
 from beapder.network.item import Item
 from beapder.network.request import Request
@@ -92,7 +94,9 @@ class Scheduler(threading.Thread):
         self._collector = Collector(redis_key)
         self._parsers = []
         self._parser_controls = []
-        self._parser_control_obj = ParserControl
+        self._parser_control_obj = (
+            AsyncParserControl if setting.DOWNLOAD_ENGINE == "asyncio" else ParserControl
+        )
 
         # 兼容老版本的参数
         if "auto_stop_when_spider_done" in kwargs:
@@ -122,6 +126,9 @@ class Scheduler(threading.Thread):
         if thread_count:
             setting.update("SPIDER_THREAD_COUNT", thread_count, "instance")
         self._thread_count = setting.SPIDER_THREAD_COUNT
+        self._process_count = setting.SPIDER_PROCESS_COUNT
+        self._worker_processes = []  # [(进程, 是否空闲, 停止事件)]
+        self._reach_next_spider_time = None  # start 中已检查的结果，run 中复用
 
         self._spider_name = redis_key
         self._project_name = redis_key.split(":")[0]
@@ -137,6 +144,7 @@ class Scheduler(threading.Thread):
         self._last_check_task_count_time = 0
         self._stop_heartbeat = False  # 是否停止心跳
         self._redisdb = RedisDB()
+        self._task_queue = get_task_queue(redis_key)
 
         self._project_total_state_table = "{}_total_state".format(self._project_name)
         self._is_exist_project_total_state_table = False
@@ -239,7 +247,115 @@ class Scheduler(threading.Thread):
                 self._request_buffer.flush()
                 self._item_buffer.flush()
 
+    def _start_parser_controls(self, collector, request_buffer, item_buffer):
+        parser_controls = []
+        # 异步下载时一个parser_control驱动全部请求，SPIDER_THREAD_COUNT 为其解析线程数
+        for i in range(1 if self._parser_control_obj.is_async else self._thread_count):
+            parser_control = self._parser_control_obj(
+                collector,
+                self._redis_key,
+                request_buffer,
+                item_buffer,
+            )
+
+            for parser in self._parsers:
+                parser_control.add_parser(parser)
+
+            parser_control.start()
+            parser_controls.append(parser_control)
+
+        return parser_controls
+
+    def start(self):
+        """
+        启动爬虫线程
+        SPIDER_PROCESS_COUNT 大于1时，先在调用方的线程（通常为主线程）中fork解析子进程，此时爬虫的线程均未启动
+        """
+        if self._process_count > 1:
+            # 只检查一次，run 中复用结果
+            self._reach_next_spider_time = self.is_reach_next_spider_time()
+            if self._reach_next_spider_time:
+                if not self._parsers:  # 不是add_parser 模式
+                    self._parsers.append(self)
+                self._start_worker_processes()
+
+        super(Scheduler, self).start()
+
+    def _start_worker_processes(self):
+        """
+        SPIDER_PROCESS_COUNT 大于1时，另起 SPIDER_PROCESS_COUNT - 1 个子进程解析，突破GIL对解析的限制
+        子进程有各自的 collector、parser_control、request_buffer、item_buffer，与主进程共同消费redis中的任务
+        由 start 在爬虫线程启动前调用，避免子进程继承其他线程持有的锁；直接调用 run 时在 _start 中调用
+        """
+        if self._process_count <= 1 or self._worker_processes:
+            return
+
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            log.warning("当前系统不支持fork，SPIDER_PROCESS_COUNT 不生效，以单进程运行")
+            self._process_count = 1
+            return
+
+        threads = [
+            thread.name
+            for thread in threading.enumerate()
+            if thread is not threading.current_thread()
+        ]
+        if threads:
+            log.warning(
+                "fork解析子进程时已有其他线程在运行 {}，子进程可能继承这些线程持有的锁".format(threads)
+            )
+
+        for i in range(self._process_count - 1):
+            is_idle = context.Value("b", 0, lock=False)
+            stop_event = context.Event()
+            process = context.Process(
+                target=self._run_worker_process,
+                args=(is_idle, stop_event),
+                name="{}_worker_{}".format(self._spider_name, i),
+                daemon=True,
+            )
+            process.start()
+            self._worker_processes.append((process, is_idle, stop_event))
+
+        log.info("已启动 {} 个解析子进程".format(len(self._worker_processes)))
+
+    def _run_worker_process(self, is_idle, stop_event):
+        """
+        子进程入口，定时将是否空闲写入共享内存供主进程判断爬虫是否结束，直到主进程通知停止
+        """
+        self.init_metrics()
+
+        request_buffer = RequestBuffer(self._redis_key)
+        item_buffer = ItemBuffer(self._redis_key, self._task_table)
+        collector = Collector(self._redis_key)
+
+        request_buffer.start()
+        item_buffer.start()
+        collector.start()
+        parser_controls = self._start_parser_controls(
+            collector, request_buffer, item_buffer
+        )
+
+        while not stop_event.is_set():
+            is_idle.value = self._is_done(
+                collector, parser_controls, item_buffer, request_buffer
+            )
+            stop_event.wait(0.5)
+
+        request_buffer.stop()
+        item_buffer.stop()
+        collector.stop()
+        for parser_control in parser_controls:
+            parser_control.stop()
+
+        metrics.close()
+
     def _start(self):
+        # 启动解析子进程，已由 start 启动的不再重复启动
+        self._start_worker_processes()
+
         # 将失败的item入库
         if setting.RETRY_FAILED_ITEMS:
             handle_failed_items = HandleFailedItems(
@@ -259,19 +375,11 @@ class Scheduler(threading.Thread):
         self._collector.start()
 
         # 启动parser control
-        for i in range(self._thread_count):
-            parser_control = self._parser_control_obj(
-                self._collector,
-                self._redis_key,
-                self._request_buffer,
-                self._item_buffer,
+        self._parser_controls.extend(
+            self._start_parser_controls(
+                self._collector, self._request_buffer, self._item_buffer
             )
-
-            for parser in self._parsers:
-                parser_control.add_parser(parser)
-
-            parser_control.start()
-            self._parser_controls.append(parser_control)
+        )
 
         # 下发任务 因为时间可能比较长，放到最后面
         if setting.RETRY_FAILED_REQUESTS:
@@ -289,35 +397,43 @@ class Scheduler(threading.Thread):
             else:
                 self.__add_task()
 
+    @staticmethod
+    def _is_done(collector, parser_controls, item_buffer, request_buffer):
+        # 检测 collector 状态
+        if collector.is_collector_task() or collector.get_requests_count() > 0:
+            return False
+
+        # 检测 parser_control 状态
+        for parser_control in parser_controls:
+            if not parser_control.is_not_task():
+                return False
+
+        # 检测 item_buffer 状态
+        if item_buffer.get_items_count() > 0 or item_buffer.is_adding_to_db():
+            return False
+
+        # 检测 request_buffer 状态
+        if request_buffer.get_requests_count() > 0 or request_buffer.is_adding_to_db():
+            return False
+
+        return True
+
     def all_thread_is_done(self):
         # 降低偶然性, 因为各个环节不是并发的，很有可能当时状态为假，但检测下一条时该状态为真。一次检测很有可能遇到这种偶然性
         for i in range(3):
-            # 检测 collector 状态
-            if (
-                self._collector.is_collector_task()
-                or self._collector.get_requests_count() > 0
+            if not self._is_done(
+                self._collector,
+                self._parser_controls,
+                self._item_buffer,
+                self._request_buffer,
             ):
                 return False
 
-            # 检测 parser_control 状态
-            for parser_control in self._parser_controls:
-                if not parser_control.is_not_task():
+            # 检测解析子进程状态，退出的子进程不再等待
+            for process, is_idle, _ in self._worker_processes:
+                if process.is_alive() and not is_idle.value:
                     return False
 
-            # 检测 item_buffer 状态
-            if (
-                self._item_buffer.get_items_count() > 0
-                or self._item_buffer.is_adding_to_db()
-            ):
-                return False
-
-            # 检测 request_buffer 状态
-            if (
-                self._request_buffer.get_requests_count() > 0
-                or self._request_buffer.is_adding_to_db()
-            ):
-                return False
-
             tools.delay_time(1)
 
         return True
@@ -379,7 +495,7 @@ class Scheduler(threading.Thread):
             if (
                 self._last_task_count
                 and self._last_task_count == total_task_count
-                and self._redisdb.zget_count(self._tab_requests) > 0
+                and self._task_queue.get_count() > 0
             ):
                 # 发送报警
                 msg = "《{}》爬虫停滞 {}，请检查爬虫是否正常".format(
@@ -430,6 +546,11 @@ class Scheduler(threading.Thread):
         # 停止 parser_controls
         for parser_control in self._parser_controls:
             parser_control.stop()
+        # 停止解析子进程，子进程中的buffer入库完毕后退出
+        for process, _, stop_event in self._worker_processes:
+            stop_event.set()
+        for process, _, _ in self._worker_processes:
+            process.join()
         self.heartbeat_stop()
         self._started.clear()
 
@@ -512,6 +633,11 @@ class Scheduler(threading.Thread):
             )
 
     def is_reach_next_spider_time(self):
+        if self._reach_next_spider_time is not None:
+            reach_next_spider_time = self._reach_next_spider_time
+            self._reach_next_spider_time = None
+            return reach_next_spider_time
+
         if not self._batch_interval:
             return True
 
@@ -578,17 +704,9 @@ class Scheduler(threading.Thread):
 
         """
         if self.have_alive_spider(heartbeat_interval=heartbeat_interval):
-            current_timestamp = tools.get_current_timestamp()
-            datas = self._redisdb.zrangebyscore_set_score(
-                self._tab_requests,
-                priority_min=current_timestamp,
-                priority_max=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
-                score=300,
-                count=None,
-            )
-            lose_count = len(datas)
+            lose_count = self._task_queue.reset_lost_tasks()
             if lose_count:
-                log.info("重置丢失任务完毕，共{}条".format(len(datas)))
+                log.info("重置丢失任务完毕，共{}条".format(lose_count))
 
     def stop_spider(self):
         self._stop_spider = True
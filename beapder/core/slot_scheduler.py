@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 按域名（或代理）调度下载。限制每个域名同时下载的请求数及两次下载的最小间隔，可根据响应延迟自动调整间隔
+---------
+@author: pikadoramon
+"""
+
+import threading
+import time
+from collections import deque
+
+import beapder.utils.tools as tools
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+
+
+class Slot:
+    """
+    一个域名（或代理）的下载状态
+    """
+
+    __slots__ = ("concurrency", "delay", "active", "last_time", "tasks")
+
+    def __init__(self, concurrency, delay):
+        self.concurrency = concurrency  # 同时下载的请求数，0为不限制
+        self.delay = delay  # 两次下载的最小间隔 秒
+        self.active = 0  # 下载中的请求数
+        self.last_time = 0  # 上次开始下载的时间
+        self.tasks = deque()  # 暂存的任务
+
+    def ready_time(self):
+        """
+        可开始下一次下载的时间，并发已满时返回None
+        """
+        if self.concurrency and self.active >= self.concurrency:
+            return None
+        return self.last_time + self.delay
+
+
+class SlotScheduler:
+    """
+    位于collector与下载之间，parser_control通过 get 取任务，下载完毕后调用 release
+    任务所在的域名并发已满或间隔未到时，任务暂存在该域名的队列中，线程继续取其他任务，不阻塞等待
+    同一进程内的parser_control共用一个实例
+    """
+
+    MAX_HELD_TASKS = 100  # 最多暂存的任务数，超过后不再取新任务，等待暂存的任务可下载
+    SLOT_IDLE_TIME = 60  # 空闲超过此时间的slot被清理 秒
+    POLL_INTERVAL = 0.1  # 暂存的任务均因并发已满不可下载时，取新任务的最长等待时间 秒
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(
+        self,
+        concurrency=0,
+        delay=0,
+        slot_by="domain",
+        autothrottle=False,
+        start_delay=5,
+        max_delay=60,
+        target_concurrency=1,
+        renew_interval=200,
+    ):
+        """
+        @param concurrency: 同一域名同时下载的请求数，0为不限制
+        @param delay: 同一域名两次下载的最小间隔 秒
+        @param slot_by: 限速依据 domain 或 proxy
+        @param autothrottle: 是否根据响应延迟自动调整下载间隔
+        @param start_delay: 自动调整时的初始间隔 秒
+        @param max_delay: 自动调整时的最大间隔 秒
+        @param target_concurrency: 自动调整时期望每个域名平均同时进行的请求数
+        @param renew_interval: 暂存任务的续约间隔 秒，需小于任务的租约时长
+        """
+        if slot_by not in ("domain", "proxy"):
+            raise ValueError("DOMAIN_SLOT_BY 仅支持 domain、proxy，当前为 %s" % slot_by)
+
+        self._concurrency = concurrency
+        self._delay = delay
+        self._slot_by = slot_by
+        self._autothrottle = autothrottle
+        self._start_delay = max(start_delay, delay)
+        self._max_delay = max_delay
+        self._target_concurrency = max(target_concurrency, 1)
+        self._renew_interval = renew_interval
+
+        self._slots = {}
+        self._held_slots = {}  # 有暂存任务的slot，保持插入顺序，依次检查
+        self._held_count = 0
+        self._leases = {}  # id(任务): slot key
+        self._last_clear_time = time.time()
+        self._last_renew_time = time.time()
+
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+
+    @classmethod
+    def from_settings(cls):
+        """
+        返回当前进程共用的实例，未配置限速时返回None
+        """
+        if not (
+            setting.DOMAIN_CONCURRENT_REQUESTS
+            or setting.DOMAIN_DOWNLOAD_DELAY
+            or setting.AUTOTHROTTLE_ENABLE
+        ):
+            return None
+
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(
+                    concurrency=setting.DOMAIN_CONCURRENT_REQUESTS or 0,
+                    delay=(setting.DOMAIN_DOWNLOAD_DELAY or 0) / 1000,
+                    slot_by=setting.DOMAIN_SLOT_BY or "domain",
+                    autothrottle=bool(setting.AUTOTHROTTLE_ENABLE),
+                    start_delay=(setting.AUTOTHROTTLE_START_DELAY or 0) / 1000,
+                    max_delay=(setting.AUTOTHROTTLE_MAX_DELAY or 0) / 1000,
+                    target_concurrency=setting.AUTOTHROTTLE_TARGET_CONCURRENCY or 1,
+                    # 暂存的任务可能等待超过 REQUEST_LOST_TIMEOUT，租约到期前续约，避免被重新下发
+                    renew_interval=(setting.REQUEST_LOST_TIMEOUT or 600) / 3,
+                )
+            return cls._instance
+
+    @property
+    def held_count(self):
+        return self._held_count
+
+    def get_slot_key(self, request):
+        proxies = request.requests_kwargs.get("proxies")
+        if self._slot_by == "proxy" and proxies:
+            return proxies.get("https") or proxies.get("http") or str(proxies)
+        return tools.get_domain(request.url)
+
+    def get(self, get_task, get_request, timeout=1, renew_tasks=None):
+        """
+        取一个可以下载的任务，先取暂存的任务中已可下载的，再取新任务
+        @param get_task: 取新任务的方法，参数为最多等待的时间 秒，无任务时返回None
+        @param get_request: 由任务取request的方法
+        @param timeout: 无可下载的任务时最多等待的时间 秒
+        @param renew_tasks: 续约暂存任务的方法，参数为任务列表
+        @return: 任务，超时返回None
+        """
+        if renew_tasks:
+            self._renew_held_tasks(renew_tasks)
+
+        deadline = time.time() + timeout
+        while True:
+            with self._lock:
+                task = self._pop_ready_task()
+                if task is not None:
+                    return task
+                wait_time = self._get_wait_time(deadline)
+                can_hold = self._held_count < self.MAX_HELD_TASKS
+
+            if can_hold:
+                # 取新任务最多等到暂存的任务可下载
+                task = get_task(wait_time)
+                if task is not None:
+                    key = self.get_slot_key(get_request(task))
+                    with self._lock:
+                        slot = self._get_slot(key)
+                        # 同一slot的任务先进先出
+                        if not slot.tasks and self._acquire(slot, key, task):
+                            return task
+
+                        slot.tasks.append(task)
+                        self._held_slots[key] = slot
+                        self._held_count += 1
+                    continue
+
+            elif wait_time > 0:
+                with self._lock:
+                    self._ready.wait(wait_time)
+
+            if time.time() >= deadline:
+                with self._lock:
+                    return self._pop_ready_task()
+
+    def release(self, task, latency=None, success=True):
+        """
+        任务下载完毕，释放所在slot的并发数，重复调用无影响
+        @param task: get 取到的任务
+        @param latency: 下载耗时 秒，用于自动调整下载间隔
+        @param success: 是否下载成功，失败时间隔只增不减
+        """
+        with self._lock:
+            key = self._leases.pop(id(task), None)
+            if key is None:
+                return
+
+            slot = self._slots[key]
+            slot.active -= 1
+            if self._autothrottle and latency is not None:
+                self._adjust_delay(slot, latency, success)
+
+            self._ready.notify_all()
+
+    def _renew_held_tasks(self, renew_tasks):
+        with self._lock:
+            now = time.time()
+            if now - self._last_renew_time < self._renew_interval:
+                return
+            self._last_renew_time = now
+            tasks = [task for slot in self._held_slots.values() for task in slot.tasks]
+
+        if tasks:
+            renew_tasks(tasks)
+
+    def _get_slot(self, key):
+        slot = self._slots.get(key)
+        if slot is None:
+            self._clear_idle_slots()
+            slot = Slot(
+                self._concurrency,
+                self._start_delay if self._autothrottle else self._delay,
+            )
+            self._slots[key] = slot
+        return slot
+
+    def _acquire(self, slot, key, task):
+        now = time.time()
+        ready_time = slot.ready_time()
+        if ready_time is None or ready_time > now:
+            return False
+
+        slot.active += 1
+        slot.last_time = now
+        self._leases[id(task)] = key
+        return True
+
+    def _pop_ready_task(self):
+        for key, slot in self._held_slots.items():
+            if self._acquire(slot, key, slot.tasks[0]):
+                task = slot.tasks.popleft()
+                self._held_count -= 1
+                if not slot.tasks:
+                    del self._held_slots[key]
+                return task
+        return None
+
+    def _get_wait_time(self, deadline):
+        """
+        无可下载的任务时等待的时长，不超过暂存的任务可下载的时间。并发已满的slot在释放时才可下载，间隔 POLL_INTERVAL 检查
+        """
+        now = time.time()
+        wait_until = deadline
+        if self._held_count:
+            next_ready_time = self._next_ready_time()
+            wait_until = min(
+                wait_until,
+                next_ready_time
+                if next_ready_time is not None
+                else now + self.POLL_INTERVAL,
+            )
+        return max(wait_until - now, 0)
+
+    def _next_ready_time(self):
+        ready_times = [
+            ready_time
+            for ready_time in (slot.ready_time() for slot in self._held_slots.values())
+            if ready_time is not None
+        ]
+        return min(ready_times) if ready_times else None
+
+    def _adjust_delay(self, slot, latency, success):
+        """
+        期望的间隔为 响应延迟/期望并发数，新间隔取当前间隔与期望间隔的平均值，且不小于期望间隔
+        """
+        target_delay = latency / self._target_concurrency
+        new_delay = max(target_delay, (slot.delay + target_delay) / 2)
+        new_delay = min(max(self._delay, new_delay), self._max_delay)
+
+        # 下载失败的响应延迟通常较短，不据此缩短间隔
+        if not success and new_delay < slot.delay:
+            return
+
+        slot.delay = new_delay
+
+    def _clear_idle_slots(self):
+        now = time.time()
+        if now - self._last_clear_time < self.SLOT_IDLE_TIME:
+            return
+
+        self._last_clear_time = now
+        for key, slot in list(self._slots.items()):
+            if (
+                not slot.active
+                and not slot.tasks
+                and now - slot.last_time > max(slot.delay, self.SLOT_IDLE_TIME)
+            ):
+                del self._slots[key]
@@ -14,7 +14,10 @@ import beapder.utils.tools as tools
 from beapder.buffer.item_buffer import ItemBuffer
 from beapder.buffer.request_buffer import AirSpiderRequestBuffer
 from beapder.core.base_parser import BaseParser
-from beapder.core.parser_control import AirSpiderParserControl
+from beapder.core.parser_control import (
+    AirSpiderAsyncParserControl,
+    AirSpiderParserControl,
+)
 from beapder.db.memorydb import MemoryDB
 from beapder.network.request import Request
 from beapder.utils import metrics
@@ -90,8 +93,17 @@ class AirSpider(BaseParser, Thread):
     def run(self):
         self.start_callback()
 
-        for i in range(self._thread_count):
-            parser_control = AirSpiderParserControl(
+        if self.settings.DOWNLOAD_ENGINE == "asyncio":
+            # 异步下载时一个parser_control驱动全部请求，SPIDER_THREAD_COUNT 为其解析线程数
+            parser_control_cls, parser_control_count = AirSpiderAsyncParserControl, 1
+        else:
+            parser_control_cls, parser_control_count = (
+                AirSpiderParserControl,
+                self._thread_count,
+            )
+
+        for i in range(parser_control_count):
+            parser_control = parser_control_cls(
                 memory_db=self._memory_db,
                 request_buffer=self._request_buffer,
                 item_buffer=self._item_buffer,
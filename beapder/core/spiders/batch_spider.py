@@ -16,7 +16,7 @@ from collections import Iterable
 import beapder.utils.tools as tools
 from beapder.core.base_parser import BatchParser
 from beapder.core.scheduler import Scheduler
-from beapder.db.mysqldb import MysqlDB
+from beapder.core.task_queue import get_task_queue
 from beapder.db.redisdb import RedisDB
 from beapder.network.item import Item
 from beapder.network.item import UpdateItem
@@ -115,6 +115,8 @@ class BatchSpider(BatchParser, Scheduler):
             **kwargs,
         )
 
+        from beapder.db.mysqldb import MysqlDB
+
         self._redisdb = RedisDB()
         self._mysqldb = MysqlDB()
 
@@ -130,10 +132,12 @@ class BatchSpider(BatchParser, Scheduler):
         self._related_task_tables = [
             self.settings.TAB_REQUESTS.format(redis_key=redis_key)
         ]  # 自己的task表也需要检查是否有任务
+        self._related_task_queues = [self._task_queue]
         if related_redis_key:
             self._related_task_tables.append(
                 self.settings.TAB_REQUESTS.format(redis_key=related_redis_key)
             )
+            self._related_task_queues.append(get_task_queue(related_redis_key))
 
         self._related_batch_record = related_batch_record
         self._task_condition = task_condition
@@ -228,8 +232,7 @@ class BatchSpider(BatchParser, Scheduler):
                 is_first_check = False
 
                 # 检查redis中是否有任务 任务小于_min_task_count 则从mysql中取
-                tab_requests = self.settings.TAB_REQUESTS.format(redis_key=self._redis_key)
-                todo_task_count = self._redisdb.zget_count(tab_requests)
+                todo_task_count = self._task_queue.get_count()
 
                 tasks = []
                 if todo_task_count < self._min_task_count:  # 从mysql中取任务
@@ -860,8 +863,10 @@ class BatchSpider(BatchParser, Scheduler):
         @return: True / False / None 表示无相关的爬虫 可由自身的total_count 和 done_count 来判断
         """
 
-        for related_redis_task_table in self._related_task_tables:
-            if self._redisdb.exists_key(related_redis_task_table):
+        for related_redis_task_table, related_task_queue in zip(
+            self._related_task_tables, self._related_task_queues
+        ):
+            if related_task_queue.get_count():
                 return False
 
         if self._related_batch_record:
@@ -1057,6 +1062,7 @@ class DebugBatchSpider(BatchSpider):
         COLLECTOR_TASK_COUNT=1,
         # SPIDER
         SPIDER_THREAD_COUNT=1,
+        SPIDER_PROCESS_COUNT=1,
         SPIDER_SLEEP_TIME=0,
         SPIDER_MAX_RETRY_TIMES=10,
         REQUEST_LOST_TIMEOUT=600,  # 10分钟
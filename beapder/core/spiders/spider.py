@@ -14,7 +14,6 @@ from typing import Iterable
 import beapder.utils.tools as tools
 from beapder.core.base_parser import BaseParser
 from beapder.core.scheduler import Scheduler
-from beapder.db.redisdb import RedisDB
 from beapder.network.item import Item
 from beapder.network.request import Request
 from beapder.utils.log import log
@@ -96,7 +95,6 @@ class Spider(
             return
 
         self._auto_start_requests = False
-        redisdb = RedisDB()
 
         if not self._parsers:  # 不是add_parser 模式
             self._parsers.append(self)
@@ -104,8 +102,7 @@ class Spider(
         while True:
             try:
                 # 检查redis中是否有任务
-                tab_requests = self.settings.TAB_REQUESTS.format(redis_key=self._redis_key)
-                todo_task_count = redisdb.zget_count(tab_requests)
+                todo_task_count = self._task_queue.get_count()
 
                 if todo_task_count < self._min_task_count:  # 添加任务
                     # make start requests
@@ -227,6 +224,7 @@ class DebugSpider(Spider):
         COLLECTOR_TASK_COUNT=1,
         # SPIDER
         SPIDER_THREAD_COUNT=1,
+        SPIDER_PROCESS_COUNT=1,
         SPIDER_SLEEP_TIME=0,
         SPIDER_MAX_RETRY_TIMES=10,
         REQUEST_LOST_TIMEOUT=600,  # 10分钟
@@ -362,19 +360,11 @@ class DebugSpider(Spider):
         self._collector.start()
 
         # 启动parser control
-        for i in range(self._thread_count):
-            parser_control = self._parser_control_obj(
-                self._collector,
-                self._redis_key,
-                self._request_buffer,
-                self._item_buffer,
+        self._parser_controls.extend(
+            self._start_parser_controls(
+                self._collector, self._request_buffer, self._item_buffer
             )
-
-            for parser in self._parsers:
-                parser_control.add_parser(parser)
-
-            parser_control.start()
-            self._parser_controls.append(parser_control)
+        )
 
         # 启动request_buffer
         self._request_buffer.start()
@@ -17,7 +17,7 @@ from typing import List, Tuple, Dict, Union
 import beapder.utils.tools as tools
 from beapder.core.base_parser import TaskParser
 from beapder.core.scheduler import Scheduler
-from beapder.db.mysqldb import MysqlDB
+from beapder.core.task_queue import get_task_queue
 from beapder.db.redisdb import RedisDB
 from beapder.network.item import Item
 from beapder.network.item import UpdateItem
@@ -114,7 +114,12 @@ class TaskSpider(TaskParser, Scheduler):
         )
 
         self._redisdb = RedisDB()
-        self._mysqldb = MysqlDB() if use_mysql else None
+        self._mysqldb = None
+        if use_mysql:
+            # mysql 依赖使用时才导入
+            from beapder.db.mysqldb import MysqlDB
+
+            self._mysqldb = MysqlDB()
 
         self._task_table = task_table  # mysql中的任务表
         self._task_keys = task_keys  # 需要获取的任务字段
@@ -130,10 +135,12 @@ class TaskSpider(TaskParser, Scheduler):
         self._related_task_tables = [
             self.settings.TAB_REQUESTS.format(redis_key=redis_key)
         ]  # 自己的task表也需要检查是否有任务
+        self._related_task_queues = [self._task_queue]
         if related_redis_key:
             self._related_task_tables.append(
                 self.settings.TAB_REQUESTS.format(redis_key=related_redis_key)
             )
+            self._related_task_queues.append(get_task_queue(related_redis_key))
 
         self._related_batch_record = related_batch_record
         self._task_condition = task_condition
@@ -185,8 +192,7 @@ class TaskSpider(TaskParser, Scheduler):
         while True:
             try:
                 # 检查redis中是否有任务 任务小于_min_task_count 则从mysql中取
-                tab_requests = self.settings.TAB_REQUESTS.format(redis_key=self._redis_key)
-                todo_task_count = self._redisdb.zget_count(tab_requests)
+                todo_task_count = self._task_queue.get_count()
 
                 tasks = []
                 if todo_task_count < self._min_task_count:
@@ -457,8 +463,10 @@ class TaskSpider(TaskParser, Scheduler):
         @return: True / False / None 表示无相关的爬虫 可由自身的total_count 和 done_count 来判断
         """
 
-        for related_redis_task_table in self._related_task_tables:
-            if self._redisdb.exists_key(related_redis_task_table):
+        for related_redis_task_table, related_task_queue in zip(
+            self._related_task_tables, self._related_task_queues
+        ):
+            if related_task_queue.get_count():
                 log.info(f"依赖的爬虫还未结束，任务表为：{related_redis_task_table}")
                 return False
 
@@ -578,6 +586,7 @@ class DebugTaskSpider(TaskSpider):
         COLLECTOR_TASK_COUNT=1,
         # SPIDER
         SPIDER_THREAD_COUNT=1,
+        SPIDER_PROCESS_COUNT=1,
         SPIDER_SLEEP_TIME=0,
         SPIDER_MAX_RETRY_TIMES=10,
         REQUEST_LOST_TIMEOUT=600,  # 10分钟
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 分布式任务队列，通过 setting.TASK_QUEUE 选择实现
+---------
+@author: pikadoramon
+"""
+
+import beapder.utils.tools as tools
+from beapder.utils.load_settings import LoadSettings
+
+from .base import TaskQueue
+from ._sharded import ShardedZSetTaskQueue
+from ._stream import StreamTaskQueue
+from ._zset import ZSetTaskQueue
+
+setting = LoadSettings()
+
+
+def get_task_queue(redis_key) -> TaskQueue:
+    """
+    创建 setting.TASK_QUEUE 指定的任务队列
+    """
+    return tools.import_cls(setting.TASK_QUEUE)(redis_key)
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 分片的有序集合任务队列。任务按指纹或域名散列到多个有序集合中，分散单个key上的竞争
+---------
+@author: pikadoramon
+"""
+
+import random
+import time
+import zlib
+
+import beapder.utils.tools as tools
+from beapder.core.task_queue.base import TaskQueue
+from beapder.db.redisdb import TASK_LEASE_BATCH_SIZE, RedisDB
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+
+
+class ShardedZSetTaskQueue(TaskQueue):
+    """
+    任务分散在 TASK_QUEUE_SHARD_COUNT 个有序集合中，每个分片的用法与 ZSetTaskQueue 相同
+    分片key以 {redis_key:分片序号} 作为hash tag，集群模式下分布在不同的slot
+    每个实例随机选一个分片作为主分片，优先从主分片取任务，取不够时依次从其他分片窃取
+    handle 为 (分片key, 编码后的request)
+    """
+
+    EMPTY_SHARD_SKIP_TIME = 1  # 取不到任务的分片，在此时间内窃取时跳过 秒
+
+    def __init__(self, redis_key):
+        super(ShardedZSetTaskQueue, self).__init__(redis_key)
+        # 任务队列中的request为二进制编码，读取时不做解码
+        self._db = RedisDB(decode_responses=False)
+
+        self._shard_by = setting.TASK_QUEUE_SHARD_BY
+        if self._shard_by not in ("fingerprint", "domain"):
+            raise ValueError(
+                "TASK_QUEUE_SHARD_BY 仅支持 fingerprint、domain，当前为 %s" % self._shard_by
+            )
+
+        self._shards = [
+            setting.TAB_SHARD_REQUESTS.format(redis_key=redis_key, shard=shard)
+            for shard in range(max(setting.TASK_QUEUE_SHARD_COUNT, 1))
+        ]
+        self._home_shard = random.randrange(len(self._shards))
+        self._empty_shards = {}  # 分片key: 取不到任务的时间
+
+    def __get_shard(self, shard_key):
+        if shard_key is None:
+            return random.randrange(len(self._shards))
+        return zlib.crc32(shard_key.encode("utf-8")) % len(self._shards)
+
+    def __lease_from_shard(self, shard, count, current_timestamp):
+        # 只取当前时间搓以内的任务，同时将任务分数修改为 current_timestamp + setting.REQUEST_LOST_TIMEOUT
+        datas = self._db.lease_tasks(
+            self._shards[shard],
+            priority_min="-inf",
+            priority_max=current_timestamp,
+            lease_score=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
+            count=count,
+            with_scores=False,
+        )
+        if len(datas) < count:
+            self._empty_shards[self._shards[shard]] = time.time()
+        else:
+            self._empty_shards.pop(self._shards[shard], None)
+
+        return [((self._shards[shard], data), data) for data in datas]
+
+    def __group_by_shard(self, handles):
+        datas = {}
+        for table, data in handles:
+            datas.setdefault(table, []).append(data)
+        return datas
+
+    def get_shard_key(self, request):
+        if self._shard_by == "domain":
+            return tools.get_domain(request.url)
+        return request.fingerprint
+
+    def put(self, datas, prioritys, shard_keys=None):
+        shard_keys = shard_keys or [None] * len(datas)
+
+        shard_args = {}
+        for data, priority, shard_key in zip(datas, prioritys, shard_keys):
+            shard_args.setdefault(self.__get_shard(shard_key), []).extend(
+                (priority, data)
+            )
+
+        # 所有分片的任务一次提交，每个分片每TASK_LEASE_BATCH_SIZE个任务1条ZADD
+        pipe = self._db.get_redis_obj().pipeline(transaction=False)
+        for shard, args in shard_args.items():
+            for i in range(0, len(args), TASK_LEASE_BATCH_SIZE * 2):
+                pipe.execute_command(
+                    "ZADD", self._shards[shard], *args[i : i + TASK_LEASE_BATCH_SIZE * 2]
+                )
+        return pipe.execute()
+
+    def lease(self, count):
+        current_timestamp = tools.get_current_timestamp()
+        tasks = self.__lease_from_shard(self._home_shard, count, current_timestamp)
+
+        # 主分片不够时，从其他分片窃取。刚取不到任务的分片暂时跳过
+        now = time.time()
+        for i in range(1, len(self._shards)):
+            if len(tasks) >= count:
+                break
+
+            shard = (self._home_shard + i) % len(self._shards)
+            if (
+                now - self._empty_shards.get(self._shards[shard], 0)
+                < self.EMPTY_SHARD_SKIP_TIME
+            ):
+                continue
+
+            tasks.extend(
+                self.__lease_from_shard(shard, count - len(tasks), current_timestamp)
+            )
+
+        return tasks
+
+    def get_handle_data(self, handle):
+        return handle[1]
+
+    def ack(self, handles):
+        return sum(
+            self._db.ack_tasks(table, datas)
+            for table, datas in self.__group_by_shard(handles).items()
+        )
+
+    def release(self, handles):
+        count = 0
+        for table, datas in self.__group_by_shard(handles).items():
+            count += self._db.release_task_leases(table, datas, 300)
+            # 释放后的分片有任务，不再跳过
+            self._empty_shards.pop(table, None)
+
+        return count
+
+    def renew(self, handles):
+        lease_score = tools.get_current_timestamp() + setting.REQUEST_LOST_TIMEOUT
+        return sum(
+            self._db.renew_task_leases(table, datas, lease_score)
+            for table, datas in self.__group_by_shard(handles).items()
+        )
+
+    def replace(self, handles, datas):
+        lease_score = tools.get_current_timestamp() + setting.REQUEST_LOST_TIMEOUT
+
+        shard_datas = {}
+        for (table, old_data), new_data in zip(handles, datas):
+            old_datas, new_datas = shard_datas.setdefault(table, ([], []))
+            old_datas.append(old_data)
+            new_datas.append(new_data)
+
+        for table, (old_datas, new_datas) in shard_datas.items():
+            self._db.zreplace(table, old_datas, new_datas, lease_score)
+
+        return [(table, data) for (table, _), data in zip(handles, datas)]
+
+    def reset_lost_tasks(self):
+        # 租约未到期的任务，分数在 (当前时间, 当前时间 + REQUEST_LOST_TIMEOUT] 之间
+        current_timestamp = tools.get_current_timestamp()
+        return sum(
+            len(
+                self._db.lease_tasks(
+                    table,
+                    priority_min=current_timestamp,
+                    priority_max=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
+                    lease_score=300,
+                    with_scores=False,
+                )
+            )
+            for table in self._shards
+        )
+
+    def get_count(self):
+        # 各分片的任务数一次取回
+        pipe = self._db.get_redis_obj().pipeline(transaction=False)
+        for table in self._shards:
+            pipe.zcard(table)
+        return sum(pipe.execute())
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 基于 Redis Streams 的任务队列，需要 redis >= 6.2
+---------
+@author: pikadoramon
+"""
+
+import bisect
+import os
+import socket
+import time
+
+from redis.exceptions import ResponseError
+
+from beapder.core.task_queue.base import TaskQueue
+from beapder.db.redisdb import LuaScript, RedisDB
+from beapder.utils.load_settings import LoadSettings
+from beapder.utils.log import log
+
+setting = LoadSettings()
+
+# 按KEYS的顺序（优先级从高到低）读取新任务，取够count为止
+# 返回 [stream序号, 消息id, data, stream序号, 消息id, data ...]
+STREAM_LEASE_SCRIPT = LuaScript(
+    """
+    local group = ARGV[1]
+    local consumer = ARGV[2]
+    local count = tonumber(ARGV[3])
+
+    local tasks = {}
+    for i, key in ipairs(KEYS) do
+        if count <= 0 then
+            break
+        end
+
+        local reply = redis.call('xreadgroup', 'group', group, consumer, 'count', count, 'streams', key, '>')
+        if reply then
+            local entries = reply[1][2]
+            for _, entry in ipairs(entries) do
+                -- 每条消息只有一个字段
+                table.insert(tasks, i - 1)
+                table.insert(tasks, entry[1])
+                table.insert(tasks, entry[2][2])
+            end
+            count = count - #entries
+        end
+    end
+
+    return tasks
+    """
+)
+
+
+class StreamTaskQueue(TaskQueue):
+    """
+    按优先级分为多个stream，所有爬虫共用一个消费组
+    取任务：lua脚本中 XREADGROUP 按优先级从高到低读取新任务，取够为止；XAUTOCLAIM 定期认领空闲超过 REQUEST_LOST_TIMEOUT 的任务
+    完成任务：XACK 后 XDEL， handle 为 (stream, 消息id)
+    释放任务：将任务的空闲时间设为 REQUEST_LOST_TIMEOUT，下次认领丢失任务时重新下发
+    注：有序集合队列中以时间戳作为优先级延迟下发任务的用法在此不生效
+    """
+
+    GROUP = "beapder"
+    FIELD = b"request"
+    CLAIM_INTERVAL = 10  # 认领丢失任务的间隔 秒
+    BATCH_SIZE = 1000
+
+    def __init__(self, redis_key):
+        super(StreamTaskQueue, self).__init__(redis_key)
+        self._db = RedisDB(decode_responses=False)
+
+        # priority <= levels[i] 的任务存入第i个stream，大于最后一个值的存入最后一个stream
+        self._levels = sorted(setting.TASK_QUEUE_STREAM_PRIORITY_LEVELS)
+        self._streams = [
+            setting.TAB_STREAM_REQUESTS.format(redis_key=redis_key, level=level)
+            for level in range(len(self._levels) + 1)
+        ]
+        self._consumer = "{}:{}".format(socket.gethostname(), os.getpid())
+        self._lost_timeout_ms = setting.REQUEST_LOST_TIMEOUT * 1000
+
+        self._is_group_created = False
+        self._last_claim_time = 0
+        self._claim_cursors = {stream: "0-0" for stream in self._streams}
+
+    def __create_groups(self):
+        redis = self._db.get_redis_obj()
+        for stream in self._streams:
+            try:
+                # 从头消费，消费组创建前已添加的任务也会被下发
+                redis.xgroup_create(stream, self.GROUP, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+
+        self._is_group_created = True
+
+    @classmethod
+    def __parse_entries(cls, entries):
+        """
+        解析 XAUTOCLAIM 返回的消息，兼容不同版本redis-py的返回格式
+        Returns: [(消息id, data)]， 消息已被删除时data为None（redis 6.2）
+        """
+        messages = []
+        for message_id, fields in entries or []:
+            if isinstance(fields, dict):
+                data = fields.get(cls.FIELD)
+            elif fields:
+                data = dict(zip(fields[::2], fields[1::2])).get(cls.FIELD)
+            else:
+                data = None
+            messages.append((message_id, data))
+
+        return messages
+
+    def __to_tasks(self, stream, messages):
+        tasks = []
+        deleted_message_ids = []
+        for message_id, data in messages:
+            if data is None:
+                deleted_message_ids.append(message_id)
+            else:
+                tasks.append(((stream, message_id), data))
+
+        if deleted_message_ids:
+            self._db.get_redis_obj().xack(stream, self.GROUP, *deleted_message_ids)
+
+        return tasks
+
+    def __claim_lost_tasks(self, count):
+        redis = self._db.get_redis_obj()
+        tasks = []
+        for stream in self._streams:
+            if len(tasks) >= count:
+                break
+
+            response = redis.execute_command(
+                "XAUTOCLAIM",
+                stream,
+                self.GROUP,
+                self._consumer,
+                self._lost_timeout_ms,
+                self._claim_cursors[stream],
+                "COUNT",
+                count - len(tasks),
+            )
+            # redis 7.0 起多返回一项已被删除的消息id
+            cursor, entries = response[0], response[1]
+            self._claim_cursors[stream] = cursor
+            tasks.extend(self.__to_tasks(stream, self.__parse_entries(entries)))
+
+        if tasks:
+            log.info("认领丢失的任务 %s 条" % len(tasks))
+
+        return tasks
+
+    def __read_tasks(self, count):
+        datas = STREAM_LEASE_SCRIPT(
+            self._db.get_redis_obj(),
+            keys=self._streams,
+            args=[self.GROUP, self._consumer, count],
+        )
+        return [
+            ((self._streams[datas[i]], datas[i + 1]), datas[i + 2])
+            for i in range(0, len(datas), 3)
+        ]
+
+    def __group_by_stream(self, handles):
+        message_ids = {}
+        for stream, message_id in handles:
+            message_ids.setdefault(stream, []).append(message_id)
+        return message_ids
+
+    def put(self, datas, prioritys, shard_keys=None):
+        pipe = self._db.get_redis_obj().pipeline(transaction=False)
+        for data, priority in zip(datas, prioritys):
+            level = bisect.bisect_left(self._levels, priority)
+            pipe.xadd(self._streams[level], {self.FIELD: data})
+        return pipe.execute()
+
+    def lease(self, count):
+        if not self._is_group_created:
+            self.__create_groups()
+
+        try:
+            tasks = []
+            if time.time() - self._last_claim_time > self.CLAIM_INTERVAL:
+                self._last_claim_time = time.time()
+                tasks.extend(self.__claim_lost_tasks(count))
+
+            if len(tasks) < count:
+                tasks.extend(self.__read_tasks(count - len(tasks)))
+
+            return tasks
+        except ResponseError as e:
+            if "NOGROUP" in str(e):
+                # 任务表被删除，下次取任务时重新创建消费组
+                self._is_group_created = False
+                return []
+            raise
+
+    def get_handle_data(self, handle):
+        # 重新添加的任务为新的消息，不会被 ack 删除
+        return None
+
+    def ack(self, handles):
+        pipe = self._db.get_redis_obj().pipeline(transaction=False)
+        for stream, message_ids in self.__group_by_stream(handles).items():
+            for i in range(0, len(message_ids), self.BATCH_SIZE):
+                batch = message_ids[i : i + self.BATCH_SIZE]
+                pipe.xack(stream, self.GROUP, *batch)
+                pipe.xdel(stream, *batch)
+
+        return sum(pipe.execute()[::2])
+
+    def release(self, handles):
+        redis = self._db.get_redis_obj()
+        count = 0
+        for stream, message_ids in self.__group_by_stream(handles).items():
+            for i in range(0, len(message_ids), self.BATCH_SIZE):
+                count += len(
+                    redis.xclaim(
+                        stream,
+                        self.GROUP,
+                        self._consumer,
+                        0,
+                        message_ids[i : i + self.BATCH_SIZE],
+                        idle=self._lost_timeout_ms,
+                        justid=True,
+                    )
+                )
+
+        # 下次取任务时认领
+        self._last_claim_time = 0
+        return count
+
+    def renew(self, handles):
+        # 重新认领自己的任务，空闲时间归零
+        redis = self._db.get_redis_obj()
+        count = 0
+        for stream, message_ids in self.__group_by_stream(handles).items():
+            for i in range(0, len(message_ids), self.BATCH_SIZE):
+                count += len(
+                    redis.xclaim(
+                        stream,
+                        self.GROUP,
+                        self._consumer,
+                        0,
+                        message_ids[i : i + self.BATCH_SIZE],
+                        idle=0,
+                        justid=True,
+                    )
+                )
+
+        return count
+
+    def reset_lost_tasks(self):
+        redis = self._db.get_redis_obj()
+        count = 0
+        for stream in self._streams:
+            start = "-"
+            while True:
+                try:
+                    pendings = redis.xpending_range(
+                        stream, self.GROUP, start, "+", self.BATCH_SIZE
+                    )
+                except ResponseError as e:
+                    if "NOGROUP" in str(e):
+                        break
+                    raise
+
+                if not pendings:
+                    break
+
+                message_ids = [pending["message_id"] for pending in pendings]
+                count += self.release([(stream, message_id) for message_id in message_ids])
+
+                # 从上一批最后一个消息之后继续
+                last_message_id = message_ids[-1]
+                if isinstance(last_message_id, bytes):
+                    last_message_id = last_message_id.decode()
+                start = "(" + last_message_id
+
+        return count
+
+    def get_count(self):
+        pipe = self._db.get_redis_obj().pipeline(transaction=False)
+        for stream in self._streams:
+            pipe.xlen(stream)
+        return sum(pipe.execute())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 基于有序集合的任务队列。分数为优先级，取任务时将分数改为租约到期时间
+---------
+@author: pikadoramon
+"""
+
+import beapder.utils.tools as tools
+from beapder.core.task_queue.base import TaskQueue
+from beapder.db.redisdb import RedisDB
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+
+
+class ZSetTaskQueue(TaskQueue):
+    """
+    任务存储在 TAB_REQUESTS 有序集合中，成员为编码后的request，handle 即成员本身
+    """
+
+    def __init__(self, redis_key):
+        super(ZSetTaskQueue, self).__init__(redis_key)
+        # 任务队列中的request为二进制编码，读取时不做解码
+        self._db = RedisDB(decode_responses=False)
+        self._tab_requests = setting.TAB_REQUESTS.format(redis_key=redis_key)
+
+    def put(self, datas, prioritys, shard_keys=None):
+        return self._db.zadd(self._tab_requests, datas, prioritys)
+
+    def lease(self, count):
+        # 只取当前时间搓以内的任务，同时将任务分数修改为 current_timestamp + setting.REQUEST_LOST_TIMEOUT
+        current_timestamp = tools.get_current_timestamp()
+        datas = self._db.lease_tasks(
+            self._tab_requests,
+            priority_min="-inf",
+            priority_max=current_timestamp,
+            lease_score=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
+            count=count,
+            with_scores=False,
+        )
+        return [(data, data) for data in datas]
+
+    def ack(self, handles):
+        return self._db.ack_tasks(self._tab_requests, handles)
+
+    def release(self, handles):
+        return self._db.release_task_leases(self._tab_requests, handles, 300)
+
+    def renew(self, handles):
+        lease_score = tools.get_current_timestamp() + setting.REQUEST_LOST_TIMEOUT
+        return self._db.renew_task_leases(self._tab_requests, handles, lease_score)
+
+    def replace(self, handles, datas):
+        lease_score = tools.get_current_timestamp() + setting.REQUEST_LOST_TIMEOUT
+        self._db.zreplace(self._tab_requests, handles, datas, lease_score)
+        return datas
+
+    def reset_lost_tasks(self):
+        # 租约未到期的任务，分数在 (当前时间, 当前时间 + REQUEST_LOST_TIMEOUT] 之间
+        current_timestamp = tools.get_current_timestamp()
+        datas = self._db.lease_tasks(
+            self._tab_requests,
+            priority_min=current_timestamp,
+            priority_max=current_timestamp + setting.REQUEST_LOST_TIMEOUT,
+            lease_score=300,
+            with_scores=False,
+        )
+        return len(datas)
+
+    def get_count(self):
+        return self._db.zget_count(self._tab_requests) or 0
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 分布式任务队列的接口。Collector 取任务，RequestBuffer 添加及删除任务，ItemBuffer 删除及释放任务
+---------
+@author: pikadoramon
+"""
+
+import abc
+from typing import Any, List, Optional, Tuple
+
+
+class TaskQueue:
+    """
+    任务队列基类
+    队列中存储的是编码后的request（bytes），取任务时返回 (handle, data)
+    handle 为任务在队列中的标识，确认完成（ack）及释放（release）任务时使用；data 为编码后的request
+    """
+
+    def __init__(self, redis_key):
+        self._redis_key = redis_key
+
+    def get_shard_key(self, request) -> Optional[str]:
+        """
+        request的分片依据，分片队列使用
+        Args:
+            request: beapder.Request
+
+        Returns:
+
+        """
+        return None
+
+    @abc.abstractmethod
+    def put(
+        self,
+        datas: List[bytes],
+        prioritys: List[int],
+        shard_keys: Optional[List[Optional[str]]] = None,
+    ):
+        """
+        添加任务
+        Args:
+            datas: 编码后的request列表
+            prioritys: 优先级列表，与datas一一对应，越小越优先
+            shard_keys: get_shard_key 的返回值列表，与datas一一对应
+
+        Returns:
+
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def lease(self, count: int) -> List[Tuple[Any, bytes]]:
+        """
+        取任务，任务在 REQUEST_LOST_TIMEOUT 内未确认完成，会重新下发
+        Args:
+            count: 最多取的数量
+
+        Returns: [(handle, data)]
+
+        """
+        raise NotImplementedError
+
+    def get_handle_data(self, handle) -> Optional[bytes]:
+        """
+        handle 对应的编码后的request，用于判断确认完成的任务是否刚被重新添加
+        Returns: 重新添加同一request会被 ack 删除时返回编码后的request，否则返回None
+
+        """
+        return handle
+
+    @abc.abstractmethod
+    def ack(self, handles: List[Any]) -> int:
+        """
+        确认任务已完成，从队列中删除
+        Returns: 删除的数量
+
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def release(self, handles: List[Any]) -> int:
+        """
+        释放已取出但未完成的任务，使其可以立即被重新下发
+        Returns: 释放的数量
+
+        """
+        raise NotImplementedError
+
+    def renew(self, handles: List[Any]) -> int:
+        """
+        续约已取出但未完成的任务，租约重新计为 REQUEST_LOST_TIMEOUT
+        Returns: 续约的数量
+
+        """
+        raise NotImplementedError
+
+    def replace(self, handles: List[Any], datas: List[bytes]) -> List[Any]:
+        """
+        将已取出的任务替换为新的编码，用于迁移老版本格式的任务
+        Args:
+            handles: 已取出任务的handle
+            datas: 新的编码，与handles一一对应
+
+        Returns: 新的handle列表
+
+        """
+        raise NotImplementedError
+
+    def reset_lost_tasks(self) -> int:
+        """
+        重置丢失的任务（已取出但取任务的爬虫已不存在），使其可以立即被重新下发
+        Returns: 重置的数量
+
+        """
+        return 0
+
+    @abc.abstractmethod
+    def get_count(self) -> int:
+        """
+        队列中的任务数，包含已取出尚未确认完成的任务
+        """
+        raise NotImplementedError
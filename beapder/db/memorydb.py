@@ -29,13 +29,14 @@ class MemoryDB:
         else:
             self.priority_queue.put(item)
 
-    def get(self):
+    def get(self, timeout=1):
         """
         获取任务
+        :param timeout: 无任务时最多等待的时间 秒，0为不等待
         :return:
         """
         try:
-            item = self.priority_queue.get(timeout=1)
+            item = self.priority_queue.get(timeout=timeout)
             return item
         except:
             return
@@ -6,13 +6,16 @@ Created on 2016-11-16 16:25
 ---------
 @author: Boris
 """
+import hashlib
 import os
+import struct
 import time
 
 import redis
 from redis.connection import Encoder as _Encoder
 from redis.exceptions import ConnectionError, TimeoutError
 from redis.exceptions import DataError
+from redis.exceptions import NoScriptError
 from redis.sentinel import Sentinel
 
 from beapder.utils.load_settings import LoadSettings
@@ -53,6 +56,184 @@ class Encoder(_Encoder):
 redis.connection.Encoder = Encoder
 
 
+class LuaScript:
+    """
+    lua脚本。sha在创建时计算，调用时使用EVALSHA，服务端不存在该脚本时（NOSCRIPT）使用SCRIPT LOAD加载后重试
+    集群模式下 SCRIPT LOAD 会发送到所有主节点，EVALSHA 根据第一个key路由
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.sha = hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+    def __call__(self, client, keys=(), args=()):
+        try:
+            return client.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            client.script_load(self.script)
+            return client.evalsha(self.sha, len(keys), *keys, *args)
+
+    def call_many(self, client, keys=(), args_list=(), transaction=False):
+        """
+        在一个pipeline中以不同参数多次调用脚本
+        @return: 各次调用的返回值
+        """
+        for retry in range(2):
+            pipe = client.pipeline(transaction=transaction)
+            for args in args_list:
+                pipe.evalsha(self.sha, len(keys), *keys, *args)
+            try:
+                return pipe.execute()
+            except NoScriptError:
+                if retry:
+                    raise
+                client.script_load(self.script)
+
+
+# 使用lua脚本， 保证操作的原子性
+ZRANGEBYSCORE_SCRIPT = LuaScript(
+    """
+    -- local key = KEYS[1]
+    local min_score = ARGV[2]
+    local max_score = ARGV[3]
+    local is_pop = ARGV[4]
+    local count = ARGV[5]
+
+    -- 取值
+    local datas = nil
+    if count then
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'limit', 0, count)
+    else
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score)
+    end
+
+    -- 删除redis中刚取到的值
+    if (is_pop=='True' or is_pop=='1') then
+        for i=1, #datas do
+            redis.call('zrem', KEYS[1], datas[i])
+        end
+    end
+
+
+    return datas
+    """
+)
+
+ZRANGEBYSCORE_INCREASE_SCORE_SCRIPT = LuaScript(
+    """
+    -- local key = KEYS[1]
+    local min_score = ARGV[1]
+    local max_score = ARGV[2]
+    local increase_score = ARGV[3]
+    local count = ARGV[4]
+
+    -- 取值
+    local datas = nil
+    if count then
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'limit', 0, count)
+    else
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score)
+    end
+
+    --修改优先级
+    for i=1, #datas do
+        redis.call('zincrby', KEYS[1], increase_score, datas[i])
+    end
+
+    return datas
+    """
+)
+
+# 每条ZADD命令携带的最大成员数，避免lua unpack参数过多
+TASK_LEASE_BATCH_SIZE = 1000
+
+# 租约任务：取指定分数区间的任务，并用 ZADD XX 批量将分数设置为租约分数，返回 成员（及原分数）
+TASK_LEASE_SCRIPT = LuaScript(
+    """
+    -- local key = KEYS[1]
+    local min_score = ARGV[1]
+    local max_score = ARGV[2]
+    local lease_score = ARGV[3]
+    local batch_size = tonumber(ARGV[4])
+    local with_scores = ARGV[5]
+    local count = ARGV[6]
+
+    -- 取值
+    local datas = nil
+    if count then
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'withscores', 'limit', 0, count)
+    else
+        datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'withscores')
+    end
+
+    -- 修改分数，每batch_size个成员一条ZADD
+    local args = {}
+    local real_datas = {}
+    for i=1, #datas, 2 do
+        table.insert(args, lease_score)
+        table.insert(args, datas[i])
+        table.insert(real_datas, datas[i])
+
+        if #args >= batch_size * 2 then
+            redis.call('zadd', KEYS[1], 'XX', unpack(args))
+            args = {}
+        end
+    end
+
+    if #args > 0 then
+        redis.call('zadd', KEYS[1], 'XX', unpack(args))
+    end
+
+    if with_scores == '1' then
+        return datas
+    end
+    return real_datas
+    """
+)
+
+# 每次调用BITS_SCRIPT处理的最大位数，限制单条命令的大小及脚本阻塞redis的时间
+BITS_SCRIPT_CHUNK_SIZE = 4096
+
+# 批量读写位：ARGV[1] 为小端uint32打包的偏移量；有 ARGV[2] 时为设置，每个偏移量对应一个字节的值，只有一个字节时所有偏移量使用同一个值
+# 返回各位之前的值拼成的字符串，如 "0110"
+BITS_SCRIPT = LuaScript(
+    """
+    local key = KEYS[1]
+    local offsets = ARGV[1]
+    local values = ARGV[2]
+    local value = values and #values == 1 and string.byte(values)
+
+    local result = {}
+    local i = 1
+    for pos = 1, #offsets, 4 do
+        local offset = struct.unpack('<I4', offsets, pos)
+        if values then
+            result[i] = redis.call('setbit', key, offset, value or string.byte(values, i))
+        else
+            result[i] = redis.call('getbit', key, offset)
+        end
+        i = i + 1
+    end
+
+    return table.concat(result)
+    """
+)
+
+HGET_POP_SCRIPT = LuaScript(
+    """
+    -- local key = KEYS[1]
+    local field = ARGV[1]
+
+    -- 取值
+    local datas = redis.call('hget', KEYS[1], field)
+    -- 删除值
+    redis.call('hdel', KEYS[1], field)
+
+    return datas
+    """
+)
+
+
 class RedisDB:
     def __init__(
         self,
@@ -342,6 +523,30 @@ class RedisDB:
                 "ZADD", table, prioritys, values
             )  # 为了兼容2.x与3.x版本的redis
 
+    def zreplace(self, table, old_values, new_values, prioritys=0):
+        """
+        @summary: 用新成员替换有序集合中的旧成员
+        ---------
+        @param table:
+        @param old_values: 旧成员列表
+        @param new_values: 新成员列表， 与old_values一一对应
+        @param prioritys: 新成员的优先级； 支持list 或 单个值
+        ---------
+        @result:
+        """
+        assert len(old_values) == len(new_values), "old_values值要与new_values值一一对应"
+        if not isinstance(prioritys, list):
+            prioritys = [prioritys] * len(new_values)
+
+        pipe = self._redis.pipeline()
+
+        if not self._is_redis_cluster:
+            pipe.multi()
+        for old_value, new_value, priority in zip(old_values, new_values, prioritys):
+            pipe.execute_command("ZADD", table, priority, new_value)
+            pipe.zrem(table, old_value)
+        return pipe.execute()
+
     def zget(self, table, count=1, is_pop=True):
         """
         @summary: 从有序set集合中获取数据 优先返回分数小的（优先级高的）
@@ -389,40 +594,18 @@ class RedisDB:
         @result:
         """
 
-        # 使用lua脚本， 保证操作的原子性
-        lua = """
-            -- local key = KEYS[1]
-            local min_score = ARGV[2]
-            local max_score = ARGV[3]
-            local is_pop = ARGV[4]
-            local count = ARGV[5]
-
-            -- 取值
-            local datas = nil
-            if count then
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'limit', 0, count)
-            else
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score)
-            end
-
-            -- 删除redis中刚取到的值
-            if (is_pop=='True' or is_pop=='1') then
-                for i=1, #datas do
-                    redis.call('zrem', KEYS[1], datas[i])
-                end
-            end
-
-
-            return datas
-
-        """
-        cmd = self._redis.register_script(lua)
         if count:
-            res = cmd(
-                keys=[table], args=[table, priority_min, priority_max, is_pop, count]
+            res = ZRANGEBYSCORE_SCRIPT(
+                self._redis,
+                keys=[table],
+                args=[table, priority_min, priority_max, is_pop, count],
             )
         else:
-            res = cmd(keys=[table], args=[table, priority_min, priority_max, is_pop])
+            res = ZRANGEBYSCORE_SCRIPT(
+                self._redis,
+                keys=[table],
+                args=[table, priority_min, priority_max, is_pop],
+            )
 
         return res
 
@@ -441,37 +624,18 @@ class RedisDB:
         @result:
         """
 
-        # 使用lua脚本， 保证操作的原子性
-        lua = """
-            -- local key = KEYS[1]
-            local min_score = ARGV[1]
-            local max_score = ARGV[2]
-            local increase_score = ARGV[3]
-            local count = ARGV[4]
-
-            -- 取值
-            local datas = nil
-            if count then
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'limit', 0, count)
-            else
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score)
-            end
-
-            --修改优先级
-            for i=1, #datas do
-                redis.call('zincrby', KEYS[1], increase_score, datas[i])
-            end
-
-            return datas
-
-        """
-        cmd = self._redis.register_script(lua)
         if count:
-            res = cmd(
-                keys=[table], args=[priority_min, priority_max, increase_score, count]
+            res = ZRANGEBYSCORE_INCREASE_SCORE_SCRIPT(
+                self._redis,
+                keys=[table],
+                args=[priority_min, priority_max, increase_score, count],
             )
         else:
-            res = cmd(keys=[table], args=[priority_min, priority_max, increase_score])
+            res = ZRANGEBYSCORE_INCREASE_SCORE_SCRIPT(
+                self._redis,
+                keys=[table],
+                args=[priority_min, priority_max, increase_score],
+            )
 
         return res
 
@@ -490,43 +654,116 @@ class RedisDB:
         @result:
         """
 
-        # 使用lua脚本， 保证操作的原子性
-        lua = """
-            -- local key = KEYS[1]
-            local min_score = ARGV[1]
-            local max_score = ARGV[2]
-            local set_score = ARGV[3]
-            local count = ARGV[4]
+        return self.lease_tasks(
+            table, priority_min, priority_max, score, count=count, with_scores=False
+        )
 
-            -- 取值
-            local datas = nil
-            if count then
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'withscores','limit', 0, count)
-            else
-                datas = redis.call('zrangebyscore', KEYS[1], min_score, max_score, 'withscores')
-            end
+    def lease_tasks(
+        self,
+        table,
+        priority_min,
+        priority_max,
+        lease_score,
+        count=None,
+        with_scores=True,
+    ):
+        """
+        @summary: 租约任务。取指定分数区间的任务 闭区间，同时将分数修改为lease_score
+        无论取多少任务，只需 1条ZRANGEBYSCORE + 每TASK_LEASE_BATCH_SIZE个任务1条ZADD XX
+        ---------
+        @param table:
+        @param priority_min: 最小分数
+        @param priority_max: 最大分数
+        @param lease_score: 租约分数，一般为 租约到期的时间戳
+        @param count: 获取的数量，为空则表示分数区间内的全部数据
+        @param with_scores: 是否同时返回原分数
+        ---------
+        @result: with_scores为True时 [(任务, 原分数)]， 否则 [任务]
+        """
+        args = [
+            priority_min,
+            priority_max,
+            lease_score,
+            TASK_LEASE_BATCH_SIZE,
+            int(with_scores),
+        ]
+        if count:
+            args.append(count)
 
-            local real_datas = {} -- 数据
-            --修改优先级
-            for i=1, #datas, 2 do
-               local data = datas[i]
-               local score = datas[i+1]
+        datas = TASK_LEASE_SCRIPT(self._redis, keys=[table], args=args)
+        if not with_scores:
+            return datas
 
-               table.insert(real_datas, data) -- 添加数据
+        return [(datas[i], float(datas[i + 1])) for i in range(0, len(datas), 2)]
 
-               redis.call('zincrby', KEYS[1], set_score - score, datas[i])
-            end
+    def renew_task_leases(self, table, values, lease_score):
+        """
+        @summary: 批量续约，仅修改库中仍存在的任务
+        ---------
+        @param table:
+        @param values: 任务列表
+        @param lease_score: 新的租约分数
+        ---------
+        @result: 续约成功的任务数
+        """
+        return self.__zadd_xx(table, values, lease_score)
 
-            return real_datas
+    def release_task_leases(self, table, values, prioritys=300):
+        """
+        @summary: 批量释放租约，将任务分数改回优先级，重新下发。仅修改库中仍存在的任务
+        ---------
+        @param table:
+        @param values: 任务列表
+        @param prioritys: 优先级； 支持list 或 单个值
+        ---------
+        @result: 释放成功的任务数
+        """
+        return self.__zadd_xx(table, values, prioritys)
 
+    def ack_tasks(self, table, values):
         """
-        cmd = self._redis.register_script(lua)
-        if count:
-            res = cmd(keys=[table], args=[priority_min, priority_max, score, count])
+        @summary: 批量删除已完成的任务 每TASK_LEASE_BATCH_SIZE个任务1条ZREM
+        ---------
+        @param table:
+        @param values: 任务列表
+        ---------
+        @result: 删除的任务数
+        """
+        if not values:
+            return 0
+
+        if len(values) <= TASK_LEASE_BATCH_SIZE:
+            return self._redis.zrem(table, *values)
+
+        pipe = self._redis.pipeline()
+        if not self._is_redis_cluster:
+            pipe.multi()
+        for i in range(0, len(values), TASK_LEASE_BATCH_SIZE):
+            pipe.zrem(table, *values[i : i + TASK_LEASE_BATCH_SIZE])
+        return sum(pipe.execute())
+
+    def __zadd_xx(self, table, values, prioritys):
+        if not values:
+            return 0
+
+        if not isinstance(prioritys, list):
+            prioritys = [prioritys] * len(values)
         else:
-            res = cmd(keys=[table], args=[priority_min, priority_max, score])
+            assert len(values) == len(prioritys), "values值要与prioritys值一一对应"
 
-        return res
+        pipe = self._redis.pipeline()
+        if not self._is_redis_cluster:
+            pipe.multi()
+        for i in range(0, len(values), TASK_LEASE_BATCH_SIZE):
+            args = []
+            for value, priority in zip(
+                values[i : i + TASK_LEASE_BATCH_SIZE],
+                prioritys[i : i + TASK_LEASE_BATCH_SIZE],
+            ):
+                args.extend((priority, value))
+            # CH: 返回分数被修改的成员数
+            pipe.execute_command("ZADD", table, "XX", "CH", *args)
+        return sum(pipe.execute())
 
     def zincrby(self, table, amount, value):
         return self._redis.zincrby(table, amount, value)
@@ -704,22 +941,7 @@ class RedisDB:
         if not is_pop:
             return self._redis.hget(table, key)
         else:
-            lua = """
-                -- local key = KEYS[1]
-                local field = ARGV[1]
-
-                -- 取值
-                local datas = redis.call('hget', KEYS[1], field)
-                -- 删除值
-                redis.call('hdel', KEYS[1], field)
-
-                return datas
-
-                    """
-            cmd = self._redis.register_script(lua)
-            res = cmd(keys=[table], args=[key])
-
-            return res
+            return HGET_POP_SCRIPT(self._redis, keys=[table], args=[key])
 
     def hgetall(self, table):
         return self._redis.hgetall(table)
@@ -747,6 +969,7 @@ class RedisDB:
     def setbit(self, table, offsets, values):
         """
         设置字符串数组某一位的值， 返回之前的值
+        多个位时每 BITS_SCRIPT_CHUNK_SIZE 个位打包为一次 BITS_SCRIPT 调用，各调用在一个事务中执行
         @param table:
         @param offsets: 支持列表或单个值
         @param values: 支持列表或单个值
@@ -754,17 +977,22 @@ class RedisDB:
         """
         if isinstance(offsets, list):
             if not isinstance(values, list):
-                values = [values] * len(offsets)
+                values = bytes([1 if values else 0])
             else:
                 assert len(offsets) == len(values), "offsets值要与values值一一对应"
+                values = bytes([1 if value else 0 for value in values])
 
-            pipe = self._redis.pipeline()
-            pipe.multi()
-
-            for offset, value in zip(offsets, values):
-                pipe.setbit(table, offset, value)
+            args_list = []
+            for i in range(0, len(offsets), BITS_SCRIPT_CHUNK_SIZE):
+                chunk = offsets[i : i + BITS_SCRIPT_CHUNK_SIZE]
+                chunk_values = (
+                    values if len(values) == 1 else values[i : i + BITS_SCRIPT_CHUNK_SIZE]
+                )
+                args_list.append(
+                    (struct.pack("<%dI" % len(chunk), *chunk), chunk_values)
+                )
 
-            return pipe.execute()
+            return self._bits_script(table, args_list, transaction=True)
 
         else:
             return self._redis.setbit(table, offsets, values)
@@ -772,21 +1000,40 @@ class RedisDB:
     def getbit(self, table, offsets):
         """
         取字符串数组某一位的值
+        多个位时每 BITS_SCRIPT_CHUNK_SIZE 个位打包为一次 BITS_SCRIPT 调用
         @param table:
         @param offsets: 支持列表
         @return: list / 单个值
         """
         if isinstance(offsets, list):
-            pipe = self._redis.pipeline(transaction=False)
-            pipe.multi()
-            for offset in offsets:
-                pipe.getbit(table, offset)
+            args_list = []
+            for i in range(0, len(offsets), BITS_SCRIPT_CHUNK_SIZE):
+                chunk = offsets[i : i + BITS_SCRIPT_CHUNK_SIZE]
+                args_list.append((struct.pack("<%dI" % len(chunk), *chunk),))
 
-            return pipe.execute()
+            return self._bits_script(table, args_list)
 
         else:
             return self._redis.getbit(table, offsets)
 
+    def _bits_script(self, table, args_list, transaction=False):
+        if not args_list:
+            return []
+
+        if len(args_list) == 1:
+            results = [BITS_SCRIPT(self._redis, keys=[table], args=args_list[0])]
+        else:
+            results = BITS_SCRIPT.call_many(
+                self._redis, keys=[table], args_list=args_list, transaction=transaction
+            )
+
+        bits = []
+        for result in results:
+            if isinstance(result, bytes):
+                result = result.decode()
+            bits.extend(map(int, result))
+        return bits
+
     def bitcount(self, table):
         return self._redis.bitcount(table)
 
@@ -15,6 +15,7 @@ from beapder.utils.tools import get_md5
 from .bloomfilter import BloomFilter, ScalableBloomFilter
 from .expirefilter import ExpireFilter
 from .litefilter import LiteFilter
+from .localcachefilter import LocalCacheFilter
 
 
 class Dedup:
@@ -38,6 +39,8 @@ class Dedup:
                        默认会读取setting中的redis配置，若无setting，则需要专递redis_url
             initial_capacity: 单个布隆过滤器去重容量 默认100000000，当布隆过滤器容量满时会扩展下一个布隆过滤器
             error_rate：布隆过滤器的误判率 默认0.00001
+            hash_version: 新建的布隆过滤器的哈希格式版本 默认2，redis中已有的过滤器沿用其版本
+            local_cache_size: BloomFilter 在进程内缓存的已存在的key数，命中的key不再访问redis，默认0不缓存
             **kwargs:
         """
 
@@ -75,6 +78,7 @@ class Dedup:
                     error_rate=error_rate,
                     bitarray_type=ScalableBloomFilter.BASE_REDIS,
                     redis_url=kwargs.get("redis_url"),
+                    hash_version=kwargs.get("hash_version"),
                 )
             elif filter_type == Dedup.MemoryFilter:
                 self.dedup = ScalableBloomFilter(
@@ -82,12 +86,18 @@ class Dedup:
                     initial_capacity=initial_capacity,
                     error_rate=error_rate,
                     bitarray_type=ScalableBloomFilter.BASE_MEMORY,
+                    hash_version=kwargs.get("hash_version"),
                 )
             else:
                 raise ValueError(
                     "filter_type 类型错误，仅支持 Dedup.BloomFilter、Dedup.MemoryFilter、Dedup.ExpireFilter"
                 )
 
+        # ExpireFilter 每次添加都会刷新key的过期时间，不使用本地缓存
+        local_cache_size = kwargs.get("local_cache_size")
+        if local_cache_size and filter_type == Dedup.BloomFilter:
+            self.dedup = LocalCacheFilter(self.dedup, max_size=local_cache_size)
+
         self._to_md5 = to_md5
 
     def __repr__(self):
@@ -130,6 +140,14 @@ class Dedup:
 
         return is_exists
 
+    def stats(self) -> dict:
+        """
+        开启 local_cache_size 时，返回本地缓存的命中率及免去的redis访问次数，否则返回空字典
+        """
+        if isinstance(self.dedup, LocalCacheFilter):
+            return self.dedup.stats()
+        return {}
+
     def filter_exist_data(
         self,
         datas: List[Any],
@@ -148,15 +166,14 @@ class Dedup:
 
         is_exists = self.get(datas_fingerprints or datas)
 
+        # 一次遍历拆分，不在列表头部删除元素，再整体替换原列表的内容
         dedup_datas = []
 
         if datas_fingerprints:
             dedup_datas_fingerprints = []
-            while is_exists:
-                data = datas.pop(0)
-                is_exist = is_exists.pop(0)
-                data_fingerprint = datas_fingerprints.pop(0)
-
+            for data, data_fingerprint, is_exist in zip(
+                datas, datas_fingerprints, is_exists
+            ):
                 if not is_exist:
                     dedup_datas.append(data)
                     dedup_datas_fingerprints.append(data_fingerprint)
@@ -164,20 +181,17 @@ class Dedup:
                     if callback:
                         callback(data)
 
-            datas_fingerprints.extend(dedup_datas_fingerprints)
-            datas.extend(dedup_datas)
+            datas_fingerprints[: len(is_exists)] = dedup_datas_fingerprints
+            datas[: len(is_exists)] = dedup_datas
             return datas, datas_fingerprints
 
         else:
-            while is_exists:
-                data = datas.pop(0)
-                is_exist = is_exists.pop(0)
-
+            for data, is_exist in zip(datas, is_exists):
                 if not is_exist:
                     dedup_datas.append(data)
                 else:
                     if callback:
                         callback(data)
 
-            datas.extend(dedup_datas)
+            datas[: len(is_exists)] = dedup_datas
             return datas
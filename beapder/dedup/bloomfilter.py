@@ -19,6 +19,31 @@ from beapder.utils.redis_lock import RedisLock
 from . import bitarray
 
 
+def _to_bytes(key):
+    if isinstance(key, str):
+        return key.encode("utf-8")
+    else:
+        return str(key).encode("utf-8")
+
+
+_numpy = None
+
+
+def _import_numpy():
+    """
+    numpy 为可选依赖，未安装时批量计算偏移量退化为逐个计算，结果一致
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
 def make_hashfuncs(num_slices, num_bits):
     if num_bits >= (1 << 31):
         fmt_code, chunk_size = "Q", 8
@@ -44,10 +69,7 @@ def make_hashfuncs(num_slices, num_bits):
     salts = tuple(hashfn(hashfn(pack("I", i)).digest()) for i in range(num_salts))
 
     def _make_hashfuncs(key):
-        if isinstance(key, str):
-            key = key.encode("utf-8")
-        else:
-            key = str(key).encode("utf-8")
+        key = _to_bytes(key)
 
         i = 0
         for salt in salts:
@@ -59,13 +81,110 @@ def make_hashfuncs(num_slices, num_bits):
                 if i >= num_slices:
                     return
 
+    _make_hashfuncs.salts = salts
+    _make_hashfuncs.fmt_code = fmt_code
     return _make_hashfuncs
 
 
+def make_batch_hashfuncs(num_slices, bits_per_slice, version=1):
+    """
+    批量计算多个key在位数组中的偏移量
+    @param num_slices: 哈希函数个数k，位数组分为k片
+    @param bits_per_slice: 每片的位数
+    @param version: 哈希格式版本
+        1: 加盐的 md5/sha 系列摘要拆分为k个整数，与 make_hashfuncs 一致
+        2: 一次128位的 blake2b 摘要拆为 h1、h2，第i个哈希为 (h1 + i * h2) mod 2^64 mod bits_per_slice（double hashing）
+    @return: 函数 keys -> 偏移量列表，每个key连续的k个偏移量，第i个已加上第i片的起始位置
+    """
+    if version == 1:
+        return _make_batch_hashfuncs_v1(num_slices, bits_per_slice)
+    elif version == 2:
+        return _make_batch_hashfuncs_v2(num_slices, bits_per_slice)
+    raise ValueError("not support this hash version: %s" % version)
+
+
+def _make_batch_hashfuncs_v1(num_slices, bits_per_slice):
+    make_hashes = make_hashfuncs(num_slices, bits_per_slice)
+    salts = make_hashes.salts
+
+    def _python(keys):
+        offsets = []
+        for key in keys:
+            offset = 0
+            for k in make_hashes(key):
+                offsets.append(offset + k)
+                offset += bits_per_slice
+        return offsets
+
+    def _vectorized(keys):
+        np = _numpy
+        keys = [_to_bytes(key) for key in keys]
+        # 每个盐的摘要按 struct 的本机字节序拆分为整数，拼接后取前k个
+        columns = []
+        for salt in salts:
+            digests = []
+            for key in keys:
+                h = salt.copy()
+                h.update(key)
+                digests.append(h.digest())
+            columns.append(
+                np.frombuffer(
+                    b"".join(digests), dtype="=" + make_hashes.fmt_code
+                ).reshape(len(keys), -1)
+            )
+        hashes = np.hstack(columns)[:, :num_slices].astype(np.uint64)
+        bases = np.arange(num_slices, dtype=np.uint64) * np.uint64(bits_per_slice)
+        return (hashes % np.uint64(bits_per_slice) + bases).ravel().tolist()
+
+    def _batch_hashfuncs(keys):
+        if _import_numpy() and len(keys) > 1:
+            return _vectorized(keys)
+        return _python(keys)
+
+    return _batch_hashfuncs
+
+
+def _make_batch_hashfuncs_v2(num_slices, bits_per_slice):
+    mask = (1 << 64) - 1
+
+    def _digest(key):
+        return hashlib.blake2b(_to_bytes(key), digest_size=16).digest()
+
+    def _python(keys):
+        offsets = []
+        for key in keys:
+            digest = _digest(key)
+            h1 = int.from_bytes(digest[:8], "little")
+            h2 = int.from_bytes(digest[8:], "little")
+            for i in range(num_slices):
+                offsets.append(((h1 + i * h2) & mask) % bits_per_slice + i * bits_per_slice)
+        return offsets
+
+    def _vectorized(keys):
+        np = _numpy
+        hashes = np.frombuffer(
+            b"".join([_digest(key) for key in keys]), dtype="<u8"
+        ).reshape(-1, 2)
+        i = np.arange(num_slices, dtype=np.uint64)
+        # uint64 运算溢出即 mod 2^64
+        offsets = (hashes[:, :1] + i * hashes[:, 1:]) % np.uint64(bits_per_slice)
+        return (offsets + i * np.uint64(bits_per_slice)).ravel().tolist()
+
+    def _batch_hashfuncs(keys):
+        if _import_numpy() and len(keys) > 1:
+            return _vectorized(keys)
+        return _python(keys)
+
+    return _batch_hashfuncs
+
+
 class BloomFilter(object):
     BASE_MEMORY = 1
     BASE_REDIS = 2
 
+    # 新建的filter使用的哈希格式版本，见 make_batch_hashfuncs
+    HASH_VERSION = 2
+
     def __init__(
         self,
         capacity: int,
@@ -73,7 +192,12 @@ class BloomFilter(object):
         bitarray_type=BASE_REDIS,
         name=None,
         redis_url=None,
+        hash_version=None,
     ):
+        """
+        @param hash_version: 新建filter时使用的哈希格式版本，默认 HASH_VERSION。
+            redis中已有的filter使用其记录的版本，无记录但已有数据的为版本1
+        """
         if not (0 < error_rate < 1):
             raise ValueError("Error_Rate must be between 0 and 1.")
         if not capacity > 0:
@@ -92,24 +216,46 @@ class BloomFilter(object):
                 / (num_slices * (math.log(2) ** 2))
             )
         )
-        self._setup(error_rate, num_slices, bits_per_slice, capacity)
-
         if bitarray_type == BloomFilter.BASE_MEMORY:
-            self.bitarray = bitarray.MemoryBitArray(self.num_bits)
+            self.bitarray = bitarray.MemoryBitArray(num_slices * bits_per_slice)
             self.bitarray.setall(False)
+            hash_version = hash_version or self.HASH_VERSION
         elif bitarray_type == BloomFilter.BASE_REDIS:
             assert name, "name can't be None "
             self.bitarray = bitarray.RedisBitArray(name, redis_url)
+            hash_version = self._load_hash_version(hash_version or self.HASH_VERSION)
         else:
             raise ValueError("not support this bitarray type")
 
-    def _setup(self, error_rate, num_slices, bits_per_slice, capacity):
+        self._setup(error_rate, num_slices, bits_per_slice, capacity, hash_version)
+
+    def _load_hash_version(self, hash_version):
+        """
+        读取redis中filter的哈希格式版本，新建的filter记录为 hash_version
+        """
+        redis_db = self.bitarray.redis_db
+        version_key = self.bitarray.name + "_hash_version"
+        version = redis_db.strget(version_key)
+        if version:
+            return int(version)
+
+        # 已有数据但未记录版本的为版本1
+        if redis_db.exists_key(self.bitarray.name):
+            hash_version = 1
+        # 多进程同时新建时以先记录的为准
+        redis_db.strset(version_key, hash_version, nx=True)
+        return int(redis_db.strget(version_key))
+
+    def _setup(self, error_rate, num_slices, bits_per_slice, capacity, hash_version=1):
         self.error_rate = error_rate
         self.num_slices = num_slices
         self.bits_per_slice = bits_per_slice
         self.capacity = capacity
         self.num_bits = num_slices * bits_per_slice
-        self.make_hashes = make_hashfuncs(self.num_slices, self.bits_per_slice)
+        self.hash_version = hash_version
+        self.make_offsets = make_batch_hashfuncs(
+            self.num_slices, self.bits_per_slice, self.hash_version
+        )
 
         self._is_at_capacity = False
         self._check_capacity_time = 0
@@ -120,25 +266,26 @@ class BloomFilter(object):
     def get(self, keys, to_list=False):
         is_list = isinstance(keys, list)
         keys = keys if is_list else [keys]
-        is_exists = []
-
-        offsets = []
-        for key in keys:
-            hashes = self.make_hashes(key)
-            offset = 0
-            for k in hashes:
-                offsets.append(offset + k)
-                offset += self.bits_per_slice
 
-        old_values = self.bitarray.get(offsets)
-        for i in range(0, len(old_values), self.num_slices):
-            is_exists.append(int(all(old_values[i : i + self.num_slices])))
+        is_exists = self.get_by_offsets(self.make_offsets(keys))
 
         if to_list:
             return is_exists
         else:
             return is_exists if is_list else is_exists[0]
 
+    def get_by_offsets(self, offsets):
+        """
+        按 make_offsets 计算好的偏移量检查是否存在，参数相同的filter偏移量相同，可复用
+        @param offsets: 每个key连续的 num_slices 个偏移量
+        @return: list 每个key是否存在
+        """
+        old_values = self.bitarray.get(offsets)
+        return [
+            int(all(old_values[i : i + self.num_slices]))
+            for i in range(0, len(old_values), self.num_slices)
+        ]
+
     @property
     def is_at_capacity(self):
         """
@@ -174,21 +321,21 @@ class BloomFilter(object):
         is_list = isinstance(keys, list)
 
         keys = keys if is_list else [keys]
-        is_added = []
+        is_added = self.add_by_offsets(self.make_offsets(keys))
 
-        offsets = []
-        for key in keys:
-            hashes = self.make_hashes(key)
-            offset = 0
-            for k in hashes:
-                offsets.append(offset + k)
-                offset += self.bits_per_slice
+        return is_added if is_list else is_added[0]
 
+    def add_by_offsets(self, offsets):
+        """
+        按 make_offsets 计算好的偏移量添加
+        @param offsets: 每个key连续的 num_slices 个偏移量
+        @return: list 每个key是否添加成功，已存在的为0
+        """
         old_values = self.bitarray.set(offsets, 1)
-        for i in range(0, len(old_values), self.num_slices):
-            is_added.append(1 ^ int(all(old_values[i : i + self.num_slices])))
-
-        return is_added if is_list else is_added[0]
+        return [
+            1 ^ int(all(old_values[i : i + self.num_slices]))
+            for i in range(0, len(old_values), self.num_slices)
+        ]
 
 
 class ScalableBloomFilter(BaseFilter):
@@ -206,21 +353,36 @@ class ScalableBloomFilter(BaseFilter):
         bitarray_type=BASE_REDIS,
         name=None,
         redis_url=None,
+        hash_version=None,
     ):
 
         if not error_rate or error_rate < 0:
             raise ValueError("Error_Rate must be a decimal less than 0.")
 
         self._setup(
-            initial_capacity, error_rate, name, bitarray_type, redis_url=redis_url
+            initial_capacity,
+            error_rate,
+            name,
+            bitarray_type,
+            redis_url=redis_url,
+            hash_version=hash_version,
         )
 
-    def _setup(self, initial_capacity, error_rate, name, bitarray_type, redis_url):
+    def _setup(
+        self,
+        initial_capacity,
+        error_rate,
+        name,
+        bitarray_type,
+        redis_url,
+        hash_version=None,
+    ):
         self.initial_capacity = initial_capacity
         self.error_rate = error_rate
         self.name = name
         self.bitarray_type = bitarray_type
         self.redis_url = redis_url
+        self.hash_version = hash_version
 
         self.filters = []
 
@@ -238,6 +400,7 @@ class ScalableBloomFilter(BaseFilter):
             bitarray_type=self.bitarray_type,
             name=self.name + str(len(self.filters)) if self.name else self.name,
             redis_url=self.redis_url,
+            hash_version=self.hash_version,
         )
 
         return filter
@@ -293,85 +456,125 @@ class ScalableBloomFilter(BaseFilter):
         if skip_check:
             return current_filter.add(keys)
 
-        else:
-            is_list = isinstance(keys, list)
-
-            keys = keys if is_list else [keys]
-            not_exist_keys = list(set(keys))
-
-            # 检查之前的bloomfilter是否存在
-            # 记录下每级filter存在的key，不存在的key继续向下检查
-            for filter in reversed(self.filters):
-                current_filter_is_exists = filter.get(
-                    not_exist_keys, to_list=True
-                )  # 当前的filter是否存在
-
-                not_exist_keys_temp = []
-
-                for key, is_exist in zip(not_exist_keys, current_filter_is_exists):
-                    if not is_exist:  # 当前filter不存在的key 需要继续向下检查
-                        not_exist_keys_temp.append(key)
-
-                not_exist_keys = not_exist_keys_temp
-
-                if not not_exist_keys:
-                    break
-
-            # 仍有不存在的关键词，记录该关键词
-            if not_exist_keys:
-                current_filter.add(not_exist_keys)
+        is_list = isinstance(keys, list)
+        keys = keys if is_list else [keys]
+        unique_keys = list(dict.fromkeys(keys))
 
-            # 比较key是否已存在, 内部重复的key 若不存在啊则只留其一算为不存在，其他看作已存在
-            for i, key in enumerate(keys):
-                for j, not_exist_key in enumerate(not_exist_keys):
-                    if key == not_exist_key:
-                        keys[i] = 1
-                        not_exist_keys.pop(j)
-                        break
-                else:
-                    keys[i] = 0
+        # 先检查之前的filter，仍不存在的key添加到当前的filter，已在当前filter中的添加失败
+        offsets_cache = {}
+        is_exists, not_exist_indexes = self._probe(
+            unique_keys, self.filters[-2::-1], offsets_cache
+        )
+        if not_exist_indexes:
+            offsets = self._make_offsets(current_filter, unique_keys, offsets_cache)
+            is_added = current_filter.add_by_offsets(
+                self._select_offsets(current_filter, offsets, not_exist_indexes)
+            )
+            for index, added in zip(not_exist_indexes, is_added):
+                is_exists[index] = 1 ^ added
 
-            is_added = keys
-            return is_added if is_list else is_added[0]
+        # 批次内重复的key，若不存在则只有第一个算为不存在，其他看作已存在
+        is_added = self._map_results(
+            keys, unique_keys, [1 ^ is_exist for is_exist in is_exists], 0, 1
+        )
+        return is_added if is_list else is_added[0]
 
     def get(self, keys):
         self.check_filter_capacity()
 
         is_list = isinstance(keys, list)
+        keys = keys if is_list else [keys]
+        unique_keys = list(dict.fromkeys(keys))
 
-        keys = keys if is_list else [keys]  # 最终会修改为 [0, 1, ...] 0表示不存在 1 已存在
-        not_exist_keys = list(set(keys))
-
-        # 检查之前的bloomfilter是否存在
-        # 记录下每级filter存在的key，不存在的key继续向下检查
-        for filter in reversed(self.filters):
-            current_filter_is_exists = filter.get(
-                not_exist_keys, to_list=True
-            )  # 当前的filter是否存在
-
-            not_exist_keys_temp = []
+        is_exists, _ = self._probe(unique_keys, self.filters[::-1], {})
 
-            for checked_key, is_exist in zip(not_exist_keys, current_filter_is_exists):
-                if not is_exist:  # 当前filter不存在的key 需要继续向下检查
-                    not_exist_keys_temp.append(checked_key)
+        # 批次内重复的key，若不存在则只有第一个算为不存在，其他看作已存在
+        is_exists = self._map_results(keys, unique_keys, is_exists, 1, 0)
+        return is_exists if is_list else is_exists[0]
 
-            not_exist_keys = not_exist_keys_temp
+    def _probe(self, keys, filters, offsets_cache):
+        """
+        从新到旧依次在filters中检查keys，已找到的key不再检查之后的filter
+        @return: (is_exists, not_exist_indexes) 每个key是否存在，及不存在的key的下标
+        """
+        is_exists = [0] * len(keys)
+        not_exist_indexes = list(range(len(keys)))
 
-            if not not_exist_keys:
+        for filter in filters:
+            if not not_exist_indexes:
                 break
 
-        # 比较key是否已存在, 内部重复的key 若不存在啊则只留其一算为不存在，其他看作已存在
-        for i, key in enumerate(keys):
-            for j, not_exist_key in enumerate(not_exist_keys):
-                if key == not_exist_key:
-                    keys[i] = 0
-                    not_exist_keys.pop(j)
-                    break
-            else:
-                keys[i] = 1
+            offsets = self._make_offsets(filter, keys, offsets_cache)
+            candidates = not_exist_indexes
+            if len(self.filters) > 1:
+                # 子filter较多时，先只检查每个key的第一个位，为0的key不可能在该filter中，其余的key再检查全部的位
+                num_slices = filter.num_slices
+                first_bits = filter.bitarray.get(
+                    [offsets[index * num_slices] for index in not_exist_indexes]
+                )
+                candidates = [
+                    index
+                    for index, bit in zip(not_exist_indexes, first_bits)
+                    if bit
+                ]
+                if not candidates:
+                    continue
+
+            current_filter_is_exists = filter.get_by_offsets(
+                self._select_offsets(filter, offsets, candidates)
+            )
+            found = False
+            for index, is_exist in zip(candidates, current_filter_is_exists):
+                if is_exist:
+                    is_exists[index] = 1
+                    found = True
+            if found:
+                not_exist_indexes = [
+                    index for index in not_exist_indexes if not is_exists[index]
+                ]
+
+        return is_exists, not_exist_indexes
+
+    @staticmethod
+    def _make_offsets(filter, keys, offsets_cache):
+        """
+        计算keys在filter中的偏移量。各filter的容量、误判率、哈希格式版本相同时偏移量相同，只计算一次
+        """
+        cache_key = (filter.num_slices, filter.bits_per_slice, filter.hash_version)
+        offsets = offsets_cache.get(cache_key)
+        if offsets is None:
+            offsets = offsets_cache[cache_key] = filter.make_offsets(keys)
+        return offsets
+
+    @staticmethod
+    def _select_offsets(filter, offsets, indexes):
+        if len(indexes) * filter.num_slices == len(offsets):
+            return offsets
+
+        num_slices = filter.num_slices
+        selected = []
+        for index in indexes:
+            selected.extend(offsets[index * num_slices : (index + 1) * num_slices])
+        return selected
+
+    @staticmethod
+    def _map_results(keys, unique_keys, results, repeated_result, not_exist_result):
+        """
+        将去重后的key的结果映射回原始的keys
+        @param repeated_result: 批次内重复出现且不存在的key，第二次及之后的结果
+        @param not_exist_result: 不存在的key对应的结果
+        """
+        if len(keys) == len(unique_keys):
+            return results
 
-        is_exists = keys
-        return is_exists if is_list else is_exists[0]
+        result_map = dict(zip(unique_keys, results))
+        mapped = []
+        for key in keys:
+            result = result_map[key]
+            mapped.append(result)
+            if result == not_exist_result:
+                result_map[key] = repeated_result
+        return mapped
 
     @property
     def capacity(self):
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 两级去重。进程内的LRU缓存在前，共享的redis去重库（BloomFilter）在后
+---------
+@author: pikadoramon
+"""
+
+import collections
+import threading
+import time
+from typing import List, Union
+
+from beapder.dedup.basefilter import BaseFilter
+
+
+class LocalCacheFilter(BaseFilter):
+    """
+    缓存只记录已确认存在的key（本进程添加过的，或redis中已存在的），命中缓存的key不再访问redis
+    未命中的key合并为一次批量请求访问redis，添加时同时写入redis及缓存
+    只适用于key添加后不会变化的去重库：命中缓存时不调用去重库的add，ExpireFilter 添加时刷新过期时间的行为会失效；
+    redis中的去重库被清空后，缓存中的key在过期或被淘汰前仍判为存在
+    """
+
+    def __init__(self, filter: BaseFilter, max_size=100000, ttl=None):
+        """
+        @param filter: 共享的去重库
+        @param max_size: 缓存的最大key数，超过时淘汰最久未使用的
+        @param ttl: 缓存有效期 秒，为空时不过期
+        """
+        self.filter = filter
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # {key: 过期时间}
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        # 访问redis的次数，及所有key都命中缓存而免去的访问次数
+        self.remote_calls = 0
+        self.remote_calls_avoided = 0
+
+    def __repr__(self):
+        return "<LocalCacheFilter: {}>".format(self.filter)
+
+    def _lookup(self, keys):
+        """
+        @return: 每个key是否命中缓存
+        """
+        now = time.time()
+        hits = []
+        with self._lock:
+            for key in keys:
+                expire_at = self._cache.get(key, 0)
+                if expire_at == 0:
+                    hits.append(False)
+                elif expire_at and expire_at < now:
+                    del self._cache[key]
+                    hits.append(False)
+                else:
+                    self._cache.move_to_end(key)
+                    hits.append(True)
+
+            hit_count = hits.count(True)
+            self.hits += hit_count
+            self.misses += len(keys) - hit_count
+
+        return hits
+
+    def _remember(self, keys):
+        expire_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            for key in keys:
+                self._cache[key] = expire_at
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _count_remote_call(self, called):
+        with self._lock:
+            if called:
+                self.remote_calls += 1
+            else:
+                self.remote_calls_avoided += 1
+
+    def add(
+        self, keys: Union[List[str], str], *args, **kwargs
+    ) -> Union[List[int], int]:
+        """
+        @return: list / 单个值 (如果数据已存在 返回 0 否则返回 1)
+        """
+        is_list = isinstance(keys, list)
+        keys = keys if is_list else [keys]
+
+        hits = self._lookup(keys)
+        miss_keys = [key for key, hit in zip(keys, hits) if not hit]
+
+        if miss_keys:
+            # 批次内重复的key交给redis去重库按原有规则处理
+            miss_is_added = iter(self.filter.add(miss_keys, *args, **kwargs))
+            self._remember(miss_keys)
+        self._count_remote_call(bool(miss_keys))
+
+        is_added = [0 if hit else next(miss_is_added) for hit in hits]
+        return is_added if is_list else is_added[0]
+
+    def get(self, keys: Union[List[str], str]) -> Union[List[int], int]:
+        """
+        @return: list / 单个值 (如果数据已存在 返回 1 否则返回 0)
+        """
+        is_list = isinstance(keys, list)
+        keys = keys if is_list else [keys]
+
+        hits = self._lookup(keys)
+        # 去掉重复的key后查询，redis中的结果才能作为缓存依据
+        miss_keys = list(dict.fromkeys(key for key, hit in zip(keys, hits) if not hit))
+
+        miss_is_exists = {}
+        if miss_keys:
+            miss_is_exists = dict(zip(miss_keys, self.filter.get(miss_keys)))
+            self._remember([key for key in miss_keys if miss_is_exists[key]])
+        self._count_remote_call(bool(miss_keys))
+
+        # 批次内重复的key，若不存在则只有第一个算为不存在，其他看作已存在
+        is_exists = []
+        for key, hit in zip(keys, hits):
+            if hit:
+                is_exists.append(1)
+            else:
+                is_exists.append(int(bool(miss_is_exists[key])))
+                miss_is_exists[key] = 1
+
+        return is_exists if is_list else is_exists[0]
+
+    def stats(self) -> dict:
+        """
+        缓存命中率及免去的redis访问次数
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0,
+                "remote_calls": self.remote_calls,
+                "remote_calls_avoided": self.remote_calls_avoided,
+            }
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: response的解析结果缓存，html只解析一次，selector、规则的链接提取、bs4共用
+---------
+@author: pikadoramon
+"""
+
+import re
+import threading
+
+from lxml import etree
+from lxml.html import HTMLParser
+
+
+class Document:
+    """
+    html解析为lxml的树，首次使用时解析。bs4无法由lxml的树构建，按features各解析一次后缓存
+    统计当前进程中未释放的文档数及源码大小，用于估算解析结果占用的内存
+    """
+
+    _lock = threading.Lock()
+    _count = 0
+    _size = 0
+
+    def __init__(self, text, base_url=None):
+        self._text = text
+        self._base_url = base_url
+        self._root = None
+        self._soups = {}
+        self._size = 0
+
+    @classmethod
+    def stats(cls):
+        """
+        @return: {"count": 未释放的文档数, "size": 源码字节数}
+        """
+        return {"count": cls._count, "size": cls._size}
+
+    @classmethod
+    def _track(cls, count, size):
+        with cls._lock:
+            cls._count += count
+            cls._size += size
+
+    def _add_size(self, size):
+        if not self._size:
+            self._track(1, size)
+        else:
+            self._track(0, size)
+        self._size += size
+
+    @property
+    def root(self):
+        if self._root is None:
+            # 与 Selector 一致，&nbsp; 转为空格，否则会转为 \xa0
+            text = re.sub("&nbsp;", "\x20", self._text or "")
+            body = text.strip().replace("\x00", "").encode("utf8") or b"<html/>"
+            parser = HTMLParser(recover=True, encoding="utf8", huge_tree=True)
+            root = etree.fromstring(body, parser=parser, base_url=self._base_url)
+            if root is None:
+                root = etree.fromstring(
+                    b"<html/>", parser=parser, base_url=self._base_url
+                )
+
+            self._root = root
+            self._add_size(len(body))
+
+        return self._root
+
+    def soup(self, features="html.parser"):
+        soup = self._soups.get(features)
+        if soup is None:
+            from bs4 import BeautifulSoup
+
+            soup = BeautifulSoup(self._text, features)
+            self._soups[features] = soup
+            self._add_size(len(self._text.encode("utf8")))
+        return soup
+
+    def release(self):
+        """
+        释放解析结果，之后再使用时重新解析
+        """
+        if self._size:
+            self._track(-1, -self._size)
+            self._size = 0
+
+        self._root = None
+        self._soups.clear()
+
+    def __del__(self):
+        self.release()
@@ -1,12 +1,15 @@
+from beapder.utils.lazy_import import lazy_attrs
+
 from ._requests import RequestsDownloader
+from ._requests import RequestsPooledDownloader
 from ._requests import RequestsSessionDownloader
 
-# 下面是非必要依赖
-try:
-    from ._selenium import SeleniumDownloader
-except ModuleNotFoundError:
-    pass
-try:
-    from ._playwright import PlaywrightDownloader
-except ModuleNotFoundError:
-    pass
+# 下面是非必要依赖，使用时才导入
+__getattr__ = lazy_attrs(
+    __name__,
+    {
+        "SeleniumDownloader": "._selenium",
+        "AiohttpDownloader": "._aiohttp",
+        "PlaywrightDownloader": "._playwright",
+    },
+)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 基于aiohttp的异步下载器
+---------
+@author: pikadoramon
+"""
+
+import asyncio
+import datetime
+import time
+
+import aiohttp
+from requests.cookies import RequestsCookieJar
+from requests.models import PreparedRequest
+from requests.models import Response as RequestsResponse
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from yarl import URL
+
+from beapder.network.downloader._requests import RequestsDownloader
+from beapder.network.downloader.base import AsyncDownloader
+from beapder.network.response import CHUNK_SIZE, Response, ResponseTooLarge
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+
+
+class AiohttpDownloader(AsyncDownloader):
+    """
+    每个事件循环一个 ClientSession，连接池上限为 ASYNC_CONCURRENT_REQUESTS，不保留cookie
+    request的参数与requests一致，aiohttp不支持的参数（files、cert、hooks）交给 RequestsDownloader 在线程池中下载
+    """
+
+    FALLBACK_ARGS = {"files", "cert", "hooks"}
+
+    def __init__(self):
+        self._sessions = {}  # 事件循环: ClientSession
+        self._fallback_downloader = RequestsDownloader()
+
+    def _get_session(self):
+        loop = asyncio.get_event_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=setting.ASYNC_CONCURRENT_REQUESTS, ttl_dns_cache=300
+            )
+            session = aiohttp.ClientSession(
+                connector=connector, cookie_jar=aiohttp.DummyCookieJar()
+            )
+            self._sessions[loop] = session
+
+        return session
+
+    @staticmethod
+    def _make_timeout(timeout):
+        if timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        if isinstance(timeout, (tuple, list)):
+            connect_timeout, read_timeout = timeout
+        else:
+            connect_timeout = read_timeout = timeout
+        return aiohttp.ClientTimeout(
+            total=None, sock_connect=connect_timeout, sock_read=read_timeout
+        )
+
+    def _make_kwargs(self, request):
+        requests_kwargs = request.requests_kwargs
+
+        # url 及 params 的编码与requests一致
+        prepared_request = PreparedRequest()
+        prepared_request.prepare_url(request.url, requests_kwargs.get("params"))
+        url = URL(prepared_request.url, encoded=True)
+
+        kwargs = {
+            "headers": requests_kwargs.get("headers"),
+            "data": requests_kwargs.get("data"),
+            "json": requests_kwargs.get("json"),
+            "allow_redirects": requests_kwargs.get("allow_redirects", True),
+            "timeout": self._make_timeout(requests_kwargs.get("timeout")),
+        }
+
+        cookies = requests_kwargs.get("cookies")
+        if cookies:
+            kwargs["cookies"] = (
+                cookies.get_dict() if isinstance(cookies, RequestsCookieJar) else cookies
+            )
+
+        auth = requests_kwargs.get("auth")
+        if auth:
+            kwargs["auth"] = aiohttp.BasicAuth(*auth)
+
+        proxies = requests_kwargs.get("proxies")
+        if proxies:
+            proxy = proxies.get(url.scheme) or proxies.get("http")
+            if proxy:
+                kwargs["proxy"] = proxy if "://" in proxy else "http://" + proxy
+
+        if not requests_kwargs.get("verify", True):
+            kwargs["ssl"] = False
+
+        return url, kwargs
+
+    @staticmethod
+    def _make_response(aio_response, content, elapsed):
+        response = RequestsResponse()
+        response.status_code = aio_response.status
+        response.reason = aio_response.reason
+        response.url = str(aio_response.url)
+
+        # 同名的header与requests一样以逗号拼接
+        headers = CaseInsensitiveDict()
+        for key, value in aio_response.headers.items():
+            headers[key] = headers[key] + ", " + value if key in headers else value
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+
+        cookies = RequestsCookieJar()
+        for name, morsel in aio_response.cookies.items():
+            cookies.set(
+                name,
+                morsel.value,
+                domain=morsel["domain"] or aio_response.url.host,
+                path=morsel["path"] or "/",
+            )
+        response.cookies = cookies
+
+        response._content = content
+        response._content_consumed = True
+        response.elapsed = datetime.timedelta(seconds=elapsed)
+        return response
+
+    @staticmethod
+    async def _read(aio_response, max_body_size):
+        """
+        读取响应体，超过 max_body_size 时中止下载
+        """
+        if not max_body_size:
+            return await aio_response.read()
+
+        if (aio_response.content_length or 0) > max_body_size:
+            raise ResponseTooLarge(
+                "响应体 {} 字节，超过 {} 字节，已中止下载 url: {}".format(
+                    aio_response.content_length, max_body_size, aio_response.url
+                )
+            )
+
+        chunks = []
+        size = 0
+        async for chunk in aio_response.content.iter_chunked(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_body_size:
+                raise ResponseTooLarge(
+                    "响应体超过 {} 字节，已中止下载 url: {}".format(
+                        max_body_size, aio_response.url
+                    )
+                )
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def download(self, request) -> Response:
+        if self.FALLBACK_ARGS & request.requests_kwargs.keys():
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self._fallback_downloader.download, request
+            )
+
+        url, kwargs = self._make_kwargs(request)
+
+        start_time = time.time()
+        async with self._get_session().request(
+            request.method, url, **kwargs
+        ) as aio_response:
+            content = await self._read(aio_response, request.get_max_body_size())
+
+        response = Response(
+            self._make_response(aio_response, content, time.time() - start_time)
+        )
+        if request.trace_id and response.trace_id is None:
+            response.trace_id = request.trace_id
+        return response
+
+    async def close_all(self):
+        session = self._sessions.pop(asyncio.get_event_loop(), None)
+        if session:
+            await session.close()
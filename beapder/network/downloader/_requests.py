@@ -8,11 +8,25 @@ Created on 2022/4/10 5:57 下午
 @email: boris_liu@foxmail.com
 """
 
+from http.cookiejar import DefaultCookiePolicy
+
 import requests
 from requests.adapters import HTTPAdapter
 
 from beapder.network.downloader.base import Downloader
 from beapder.network.response import Response
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+
+
+class BlockAllCookiePolicy(DefaultCookiePolicy):
+    """
+    不保存任何cookie，请求携带的cookie及response.cookies不受影响
+    """
+
+    def set_ok(self, cookie, request):
+        return False
 
 
 class RequestsDownloader(Downloader):
@@ -47,3 +61,45 @@ class RequestsSessionDownloader(Downloader):
         if request.trace_id and response.trace_id is None:
             response.trace_id = request.trace_id
         return response
+
+
+class RequestsPooledDownloader(Downloader):
+    """
+    复用连接的下载器，各线程共用一个session及连接池，相同host的请求复用已建立的TCP/TLS连接
+    session不保存cookie，请求间的cookie互不影响，与 RequestsDownloader 的行为一致
+    """
+
+    POOL_CONNECTIONS = 100  # 缓存连接池的host数，超过时淘汰最早的连接池
+
+    def __init__(self):
+        self._session = requests.Session()
+        self._session.cookies.set_policy(BlockAllCookiePolicy())
+
+        # 每个host的连接池大小与并发数一致，保证每个线程都能复用连接
+        self._adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=max(setting.SPIDER_THREAD_COUNT, 10),
+        )
+        self._session.mount("http://", self._adapter)
+        self._session.mount("https://", self._adapter)
+
+    def _limit_proxy_managers(self):
+        # 每个代理一个连接池，代理频繁更换时淘汰最早的，避免连接池无限增长
+        proxy_managers = self._adapter.proxy_manager
+        while len(proxy_managers) > self.POOL_CONNECTIONS:
+            try:
+                proxy_managers.pop(next(iter(proxy_managers))).clear()
+            except (KeyError, RuntimeError, StopIteration):
+                break
+
+    def download(self, request) -> Response:
+        response = self._session.request(
+            request.method, request.url, **request.requests_kwargs
+        )
+        if request.requests_kwargs.get("proxies"):
+            self._limit_proxy_managers()
+
+        response = Response(response)
+        if request.trace_id and response.trace_id is None:
+            response.trace_id = request.trace_id
+        return response
@@ -39,3 +39,23 @@ class RenderDownloader(Downloader, ABC):
         关闭所有浏览器
         """
         pass
+
+
+class AsyncDownloader(Downloader):
+    @abc.abstractmethod
+    async def download(self, request) -> Response:
+        """
+        在事件循环中下载
+        Args:
+            request: beapder.Request
+
+        Returns: beapder.Response
+
+        """
+        raise NotImplementedError
+
+    async def close_all(self):
+        """
+        关闭当前事件循环中的连接
+        """
+        pass
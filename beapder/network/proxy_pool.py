@@ -5,8 +5,10 @@
 import datetime
 import json
 import os
+import queue
 import random
 import socket
+import threading
 import time
 from urllib import parse
 
@@ -14,8 +16,9 @@ import redis
 import requests
 
 from beapder import setting
-from beapder.utils import tools
+from beapder.utils import metrics, tools
 from beapder.utils.log import log
+from beapder.utils.thread_pool import ThreadPool
 
 # 建立本地缓存代理文件夹
 proxy_path = os.path.join(os.path.dirname(__file__), "proxy_file")
@@ -228,6 +231,7 @@ class ProxyItem(object):
         max_proxy_use_num=10000,
         delay=30,
         use_interval=None,
+        ban_half_life=300,
         **kwargs,
     ):
         """
@@ -237,6 +241,7 @@ class ProxyItem(object):
         :param max_proxy_use_num:
         :param delay:
         :param use_interval: 使用间隔 单位秒 默认不限制
+        :param ban_half_life: 封禁分值的半衰期 秒 默认300
         :param logger: 日志处理器 默认 log.get_logger()
         :param kwargs:
         """
@@ -264,6 +269,20 @@ class ProxyItem(object):
         # 使用时间
         self.use_ts = 0
 
+        # 下载结果统计，用于给代理评分
+        self.success_count = 0
+        self.failure_count = 0
+        # 响应耗时的指数加权平均 秒
+        self.latency = 0
+        # 封禁分值，每次被封加1，按半衰期衰减
+        self.ban_score = 0
+        self.ban_ts = 0
+        self.ban_half_life = ban_half_life
+        # 未同步到redis的统计增量 {"s": 成功数, "f": 失败数, "b": 封禁数, "ls": 耗时和, "ln": 耗时数}
+        self.stats_delta = {}
+        # 上次同步时redis中的统计
+        self.stats_synced = {}
+
         self.proxy_args = self.parse_proxies(self.proxies)
         self.proxy_ip = self.proxy_args["ip"]
         self.proxy_port = self.proxy_args["port"]
@@ -283,14 +302,12 @@ class ProxyItem(object):
     def is_delay(self):
         return self.flag == 1
 
-    def is_valid(self, force=0, type=0):
+    def check_state(self):
         """
-        检测代理是否有效
-            1 有效
+        检查代理的使用状态，不检测网络
+            1 可用
             2 延时使用
             0 无效 直接在代理池删除
-        :param force:
-        :param type:
         :return:
         """
         if self.use_num > self.max_proxy_use_num > 0:
@@ -309,11 +326,36 @@ class ProxyItem(object):
         if self.use_interval:
             if time.time() - self.use_ts < self.use_interval:
                 return 2
-        if not force:
-            if time.time() - self.update_ts < self.check_interval:
-                return 1
+        return 1
+
+    def need_check(self):
+        """
+        是否需要检测网络
+        """
+        return (
+            self.valid_timeout > 0
+            and time.time() - self.update_ts >= self.check_interval
+        )
+
+    def is_valid(self, force=0, type=0):
+        """
+        检测代理是否有效
+            1 有效
+            2 延时使用
+            0 无效 直接在代理池删除
+        :param force:
+        :param type: 0:socket  1:requests
+        :return:
+        """
+        state = self.check_state()
+        if state != 1:
+            return state
+        if not force and not self.need_check():
+            return 1
         if self.valid_timeout > 0:
             ok = check_proxy(
+                ip=self.proxy_ip,
+                port=self.proxy_port,
                 proxies=self.proxies,
                 type=type,
                 timeout=self.valid_timeout,
@@ -324,6 +366,77 @@ class ProxyItem(object):
         self.update_ts = time.time()
         return ok
 
+    def report(self, success=True, latency=None, banned=False):
+        """
+        反馈代理的下载结果
+        :param success: 是否下载成功
+        :param latency: 下载耗时 秒
+        :param banned: 是否被封
+        :return:
+        """
+        if success:
+            self.success_count += 1
+            self._add_delta("s", 1)
+        else:
+            self.failure_count += 1
+            self._add_delta("f", 1)
+
+        if latency is not None:
+            self.latency = tools.ewma(self.latency, latency)
+            self._add_delta("ls", latency)
+            self._add_delta("ln", 1)
+
+        if banned:
+            self.ban()
+            self._add_delta("b", 1)
+
+    def _add_delta(self, field, value):
+        self.stats_delta[field] = self.stats_delta.get(field, 0) + value
+
+    def ban(self, count=1):
+        self.ban_score = self.get_ban_score() + count
+        self.ban_ts = time.time()
+
+    def get_ban_score(self):
+        """
+        衰减后的封禁分值
+        """
+        if not self.ban_score:
+            return 0
+        return self.ban_score * 0.5 ** (
+            (time.time() - self.ban_ts) / self.ban_half_life
+        )
+
+    def score(self, default_latency=1):
+        """
+        代理评分，越高越优先使用
+            平滑后的成功率 / 平均耗时，每个未衰减的封禁分值使评分减半
+        :param default_latency: 无耗时统计时使用的耗时
+        :return:
+        """
+        success_rate = (self.success_count + 1) / (
+            self.success_count + self.failure_count + 2
+        )
+        latency = max(self.latency or default_latency, 0.01)
+        return success_rate * 0.5 ** self.get_ban_score() / latency
+
+    def copy_stats(self, proxy_item):
+        """
+        继承重置前同一代理的统计、标记及使用状态，延迟使用中的代理重置后仍延迟
+        """
+        self.flag = proxy_item.flag
+        self.flag_ts = proxy_item.flag_ts
+        self.delay = proxy_item.delay
+        self.use_num = proxy_item.use_num
+        self.use_ts = proxy_item.use_ts
+        self.success_count = proxy_item.success_count
+        self.failure_count = proxy_item.failure_count
+        self.latency = proxy_item.latency
+        self.ban_score = proxy_item.ban_score
+        self.ban_ts = proxy_item.ban_ts
+        self.stats_delta = proxy_item.stats_delta
+        self.stats_synced = proxy_item.stats_synced
+
     @classmethod
     def parse_proxies(self, proxies):
         """
@@ -361,6 +474,70 @@ class ProxyItem(object):
         }
 
 
+class ReadyProxies(object):
+    """
+    就绪的代理集合，支持O(1)的添加、删除及随机取样，用于 power of two choices 选择代理
+    """
+
+    def __init__(self):
+        self._items = []
+        # {ProxyItem: 在_items中的位置}
+        self._index = {}
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def qsize(self):
+        return len(self._items)
+
+    def put_nowait(self, proxy_item: ProxyItem):
+        with self._not_empty:
+            if proxy_item in self._index:
+                return
+            self._index[proxy_item] = len(self._items)
+            self._items.append(proxy_item)
+            self._not_empty.notify()
+
+    def remove(self, proxy_item: ProxyItem):
+        with self._not_empty:
+            pos = self._index.pop(proxy_item, None)
+            if pos is None:
+                return
+            # 与末尾的交换后删除
+            last = self._items.pop()
+            if last is not proxy_item:
+                self._items[pos] = last
+                self._index[last] = pos
+
+    def sample(self, k=2) -> list:
+        """
+        随机取k个代理，不从集合中删除
+        """
+        with self._not_empty:
+            if len(self._items) <= k:
+                return list(self._items)
+            return random.sample(self._items, k)
+
+    def get_nowait(self) -> ProxyItem:
+        """
+        随机取出一个代理
+        """
+        with self._not_empty:
+            if not self._items:
+                raise queue.Empty
+            proxy_item = random.choice(self._items)
+        self.remove(proxy_item)
+        return proxy_item
+
+    def wait(self, timeout=None) -> bool:
+        """
+        等待至有就绪的代理
+        :return: 是否有就绪的代理
+        """
+        with self._not_empty:
+            if not self._items and timeout:
+                self._not_empty.wait(timeout)
+            return bool(self._items)
+
+
 class ProxyPoolBase(object):
     def __init__(self, *args, **kwargs):
         pass
@@ -370,7 +547,15 @@ class ProxyPoolBase(object):
 
 
 class ProxyPool(ProxyPoolBase):
-    """代理池"""
+    """
+    代理池
+    后台维护线程从 proxy_source_url 拉取代理，并发检测有效性，检测通过的代理放入就绪队列
+    就绪队列中的代理少于 min_ready_size 时补充。get 只从就绪队列中取，不在调用方的线程中检测或拉取代理
+    get 随机取两个就绪的代理，使用评分高的（power of two choices），评分由 report 反馈的成功率、耗时及封禁计算
+    """
+
+    # 取样的代理都暂不可用时逐步扩大取样，最多取样的代理数
+    MAX_SAMPLE_SIZE = 32
 
     def __init__(self, **kwargs):
         """
@@ -379,8 +564,14 @@ class ProxyPool(ProxyPoolBase):
         :param proxy_instance:  提供代理的实例
         :param reset_interval:  代理池重置间隔 最小间隔
         :param reset_interval_max:  代理池重置间隔 最大间隔 默认2分钟
-        :param check_valid: 是否在获取代理时进行检测有效性
+        :param check_valid: 是否检测代理有效性
         :param local_proxy_file_cache_timeout: 本地缓存的代理文件超时时间
+        :param min_ready_size: 就绪的代理少于该数量时补充代理 默认10
+        :param validate_workers: 检测代理有效性的并发数 默认16
+        :param get_timeout: get 无就绪的代理时最多等待的时间 秒 默认5
+        :param share_stats: 是否通过redis在多进程间共享代理的统计 默认 setting.PROXY_STATS_SHARE
+        :param stats_sync_interval: 统计同步到redis的间隔 秒 默认10
+        :param stats_key: 存储统计的redis key 默认 setting.TAB_PROXY_STATS
         :param logger: 日志处理器 默认 log.get_logger()
         :param kwargs: 其他的参数
         """
@@ -412,13 +603,30 @@ class ProxyPool(ProxyPoolBase):
         self.reset_interval_max = kwargs.get("reset_interval_max", 180)
         # 是否监测代理有效性
         self.check_valid = kwargs.get("check_valid", True)
+        # 就绪代理的水位线
+        self.min_ready_size = kwargs.get("min_ready_size", 10)
+        # 检测代理有效性的并发数
+        self.validate_workers = kwargs.get("validate_workers", 16)
+        # get 最多等待的时间
+        self.get_timeout = kwargs.get("get_timeout", 5)
+        # 统计多进程共享
+        self.share_stats = kwargs.get("share_stats", setting.PROXY_STATS_SHARE)
+        self.stats_sync_interval = kwargs.get("stats_sync_interval", 10)
+        self.stats_key = kwargs.get("stats_key") or setting.TAB_PROXY_STATS.format(
+            redis_key=setting.REDIS_KEY or "proxy_pool"
+        )
+        self.last_sync_stats_time = 0
+        self._redisdb = None
 
-        # 代理队列
-        self.proxy_queue = None
-        # {代理id: ProxyItem, ...}
+        # 就绪的代理
+        self.proxy_queue = ReadyProxies()
+        # {代理id: ProxyItem, ...} 当前代理池中的代理，重置后被替换的代理从队列取出时丢弃
         self.proxy_dict = {}
+        self.last_proxy_dict = {}
         # 失效代理队列
         self.invalid_proxy_dict = {}
+        # 检测中的代理id
+        self.validating = set()
 
         self.kwargs = kwargs
 
@@ -431,12 +639,17 @@ class ProxyPool(ProxyPoolBase):
         # 计数 获取代理重试3次仍然失败 次数
         self.no_valid_proxy_times = 0
 
-        # 上次获取代理时间
-        self.last_get_ts = time.time()
-
         # 记录ProxyItem的update_ts 防止由于重置太快导致重复检测有效性
         self.proxy_item_update_ts_dict = {}
 
+        # 后台维护线程及检测代理的线程池
+        self._start_lock = threading.Lock()
+        self._maintainer = None
+        self._maintainer_pid = None
+        self._validate_executor = None
+        self._refill_event = None
+        self._stop_event = None
+
         # 警告
         self.warn_flag = False
 
@@ -451,17 +664,18 @@ class ProxyPool(ProxyPoolBase):
     @property
     def queue_size(self):
         """
-        当前代理池中代理数量
+        当前代理池中就绪的代理数量
         :return:
         """
-        return self.proxy_queue.qsize() if self.proxy_queue is not None else 0
+        return self.proxy_queue.qsize()
 
     def clear(self):
         """
-        清空自己
+        清空自己，就绪队列中的代理不在 proxy_dict 中，取出时丢弃
         :return:
         """
-        self.proxy_queue = None
+        # 重置前的代理，新添加的同一代理继承其统计
+        self.last_proxy_dict = self.proxy_dict
         # {代理ip: ProxyItem, ...}
         self.proxy_dict = {}
         # 清理失效代理集合
@@ -476,97 +690,243 @@ class ProxyPool(ProxyPoolBase):
         }
         return
 
-    def get(self, retry: int = 0) -> dict:
+    def start(self):
         """
-        从代理池中获取代理
-        :param retry:
-        :return:
+        启动后台维护线程，首次 get 时自动启动。fork 后的子进程中重新启动
         """
-        retry += 1
-        if retry > 3:
-            self.no_valid_proxy_times += 1
-            return None
-        if time.time() - self.last_get_ts > 3 * 60:
-            # 3分钟没有获取过 重置一下
+        if self._maintainer_pid == os.getpid():
+            return
+
+        with self._start_lock:
+            if self._maintainer_pid == os.getpid():
+                return
+
+            self._refill_event = threading.Event()
+            self._stop_event = threading.Event()
+            self._validate_executor = ThreadPool(
+                max_workers=self.validate_workers, thread_name_prefix="proxy_validate"
+            )
+            self.validating = set()
+            self._maintainer = threading.Thread(
+                target=self._maintain, name="proxy_pool_maintainer", daemon=True
+            )
+            self._maintainer_pid = os.getpid()
+            self._maintainer.start()
+
+    def close(self):
+        """
+        停止后台维护线程
+        """
+        if self._maintainer_pid != os.getpid():
+            return
+        self._stop_event.set()
+        self._refill_event.set()
+        self._maintainer.join(timeout=10)
+        self._validate_executor.shutdown(wait=False)
+        self._maintainer_pid = None
+
+    def _maintain(self):
+        while not self._stop_event.is_set():
             try:
-                self.reset_proxy_pool()
+                self.reset_proxy_pool(
+                    force=time.time() - self.last_reset_time > self.reset_interval_max
+                )
             except Exception as e:
                 self.logger.exception(e)
-        # 记录获取时间
-        self.last_get_ts = time.time()
-        #
+
+            if (
+                self.share_stats
+                and time.time() - self.last_sync_stats_time >= self.stats_sync_interval
+            ):
+                try:
+                    self.sync_stats()
+                except Exception as e:
+                    self.logger.error("同步代理统计失败: {}".format(e))
+                self.last_sync_stats_time = time.time()
+
+            self._emit_metrics()
+            self._refill_event.wait(timeout=1)
+            self._refill_event.clear()
+
+    def _emit_metrics(self):
+        metrics.emit_store("pool_size", len(self.proxy_dict), classify="proxy_pool")
+        metrics.emit_store("ready_size", self.queue_size, classify="proxy_pool")
+        metrics.emit_store("validating", len(self.validating), classify="proxy_pool")
+
+    def _need_refill(self):
+        """
+        就绪的代理低于水位线，代理源的代理数较少时以其一半为水位线
+        """
+        min_ready_size = min(self.min_ready_size, self.real_max_proxy_count / 2)
+        return self.queue_size < min_ready_size or (
+            self.max_queue_size > 0 and self.queue_size < self.max_queue_size / 2
+        )
+
+    def get(self, timeout=None) -> dict:
+        """
+        从代理池中获取代理，无就绪的代理时最多等待 timeout 秒
+        :param timeout: 默认为 get_timeout，0 为不等待
+        :return: 代理 无可用代理时返回None
+        """
+        self.start()
         self.warn()
-        proxy_item = self.get_random_proxy()
-        if proxy_item:
-            # 不检测
-            if not self.check_valid:
-                # 塞回去
-                proxies = proxy_item.get_proxies()
-                self.put_proxy_item(proxy_item)
-                return proxies
-            else:
-                is_valid = proxy_item.is_valid()
-                if is_valid:
-                    # 记录update_ts
-                    self.proxy_item_update_ts_dict[
-                        proxy_item.proxy_id
-                    ] = proxy_item.update_ts
-                    # 塞回去
-                    proxies = proxy_item.get_proxies()
-                    self.put_proxy_item(proxy_item)
-                    if is_valid == 1:
-                        if proxy_item.use_interval:
-                            proxy_item.use_ts = time.time()
-                        return proxies
-                else:
-                    # 处理失效代理
-                    self.proxy_dict.pop(proxy_item.proxy_id, "")
-                    self.invalid_proxy_dict[
-                        proxy_item.proxy_id
-                    ] = datetime.datetime.now()
+
+        timeout = self.get_timeout if timeout is None else timeout
+        start_time = time.time()
+        deadline = start_time + timeout
+
+        proxies = None
+        while True:
+            if self._need_refill() or self.no_valid_proxy_times >= 5:
+                self._refill_event.set()
+
+            candidates = self.proxy_queue.sample(2)
+            if not candidates:
+                if self.proxy_queue.wait(max(deadline - time.time(), 0)):
+                    continue
+                break
+
+            proxy_item = self._choose(candidates)
+            # 取样的代理暂不可用时扩大取样再选，取样数有上限，仍没有说明大多在延时使用，稍后再取
+            sample_size = len(candidates)
+            while not proxy_item and sample_size < min(
+                self.queue_size, self.MAX_SAMPLE_SIZE
+            ):
+                sample_size = min(sample_size * 4, self.MAX_SAMPLE_SIZE)
+                proxy_item = self._choose(self.proxy_queue.sample(sample_size))
+            if not proxy_item:
+                if time.time() + 0.1 >= deadline:
+                    break
+                time.sleep(0.1)
+                continue
+
+            if proxy_item.use_interval:
+                proxy_item.use_ts = time.time()
+            proxies = proxy_item.get_proxies()
+            break
+
+        if proxies:
+            self.no_valid_proxy_times = 0
         else:
-            try:
-                self.reset_proxy_pool()
-            except Exception as e:
-                self.logger.exception(e)
-        if self.no_valid_proxy_times >= 5:
-            # 解决bug: 当爬虫仅剩一个任务时 由于只有一个线程检测代理 而不可用代理又刚好很多（时间越长越多） 可能出现一直获取不到代理的情况
-            # 导致爬虫烂尾
-            try:
-                self.reset_proxy_pool()
-            except Exception as e:
-                self.logger.exception(e)
-        return self.get(retry)
+            self.no_valid_proxy_times += 1
+            self._refill_event.set()
+
+        metrics.emit_timer("wait_time", time.time() - start_time, classify="proxy_pool")
+        return proxies
 
     get_proxy = get
 
+    def _choose(self, candidates: list) -> ProxyItem:
+        """
+        从取样的代理中选择可用且评分最高的，失效或需要检测的代理移出就绪队列
+        :return: 无可用的代理时返回None
+        """
+        available = []
+        for proxy_item in candidates:
+            # 重置代理池时被替换或已失效的代理
+            if self.proxy_dict.get(proxy_item.proxy_id) is not proxy_item:
+                self.proxy_queue.remove(proxy_item)
+                continue
+
+            state = proxy_item.check_state()
+            if state == 0:
+                self.proxy_queue.remove(proxy_item)
+                self.drop_proxy_item(proxy_item)
+                continue
+
+            if self.check_valid and proxy_item.need_check():
+                # 到了检测间隔的代理后台检测，检测通过后重新放入就绪队列
+                self.proxy_queue.remove(proxy_item)
+                self.validate_proxy_item(proxy_item)
+                continue
+
+            if state == 1:
+                available.append(proxy_item)
+
+        if len(available) < 2:
+            return available[0] if available else None
+
+        # 没有耗时统计的代理按其他代理的耗时计算，不因未使用过而被优先或冷落
+        latencies = [proxy_item.latency for proxy_item in available if proxy_item.latency]
+        default_latency = sum(latencies) / len(latencies) if latencies else 1
+        return max(available, key=lambda x: x.score(default_latency))
+
+    def report(self, proxies, success=True, latency=None, banned=False):
+        """
+        反馈代理的下载结果，只更新本地统计，开启 share_stats 时由后台线程定期同步到redis
+        :param proxies: 使用的代理
+        :param success: 是否下载成功
+        :param latency: 下载耗时 秒
+        :param banned: 是否被封，如响应状态码为 setting.PROXY_BAN_STATUS_CODES
+        :return:
+        """
+        proxy_item = self.get_proxy_item(proxies=proxies)
+        if proxy_item:
+            proxy_item.report(success=success, latency=latency, banned=banned)
+
+    def sync_stats(self):
+        """
+        将本地的统计增量累加到redis的hash表，同时读取其他进程累加的增量合并到本地
+            field 为 {proxy_id}:{s|f|b|ls|ln}，每个进程每次同步一次pipeline往返
+        :return:
+        """
+        proxy_items = list(self.proxy_dict.values())
+        if not proxy_items:
+            return
+
+        if self._redisdb is None:
+            from beapder.db.redisdb import RedisDB
+
+            self._redisdb = RedisDB()
+
+        fields = ("s", "f", "b", "ls", "ln")
+        deltas = []
+        pipe = self._redisdb.get_redis_obj().pipeline(transaction=False)
+        for proxy_item in proxy_items:
+            delta, proxy_item.stats_delta = proxy_item.stats_delta, {}
+            deltas.append(delta)
+            for field in fields:
+                key = "{}:{}".format(proxy_item.proxy_id, field)
+                if field == "ls":
+                    pipe.hincrbyfloat(self.stats_key, key, delta.get(field, 0))
+                else:
+                    pipe.hincrby(self.stats_key, key, delta.get(field, 0))
+        pipe.expire(self.stats_key, 86400)
+        results = pipe.execute()
+
+        for i, proxy_item in enumerate(proxy_items):
+            totals = dict(zip(fields, results[i * len(fields) : (i + 1) * len(fields)]))
+            # 其他进程的增量 = 当前总数 - 上次同步的总数 - 本进程本次的增量
+            others = {
+                field: float(totals[field])
+                - proxy_item.stats_synced.get(field, 0)
+                - deltas[i].get(field, 0)
+                for field in fields
+            }
+            proxy_item.success_count += int(others["s"])
+            proxy_item.failure_count += int(others["f"])
+            if others["ln"] > 0:
+                proxy_item.latency = tools.ewma(
+                    proxy_item.latency, others["ls"] / others["ln"]
+                )
+            # 首次同步时redis中已有的封禁可能已过时，只合并之后新增的
+            if proxy_item.stats_synced and others["b"] > 0:
+                proxy_item.ban(others["b"])
+            proxy_item.stats_synced = {field: float(totals[field]) for field in fields}
+
     def get_random_proxy(self) -> ProxyItem:
         """
         随机获取代理
         :return:
         """
-        if self.proxy_queue is not None:
-            if random.random() < 0.5:
-                # 一半概率检查 这是个高频操作 优化一下
-                if time.time() - self.last_reset_time > self.reset_interval_max:
-                    self.reset_proxy_pool(force=True)
-                else:
-                    min_q_size = (
-                        min(self.max_queue_size / 2, self.real_max_proxy_count / 2)
-                        if self.max_queue_size > 0
-                        else self.real_max_proxy_count / 2
-                    )
-                    if self.proxy_queue.qsize() < min_q_size:
-                        self.reset_proxy_pool()
-            try:
-                return self.proxy_queue.get_nowait()
-            except Exception:
-                pass
-        return None
+        try:
+            return self.proxy_queue.get_nowait()
+        except queue.Empty:
+            return None
 
     def append_proxies(self, proxies_list: list) -> int:
         """
-        添加代理到代理池
+        添加代理到代理池，需检测有效性的代理检测通过后才放入就绪队列
         :param proxies_list:
         :return:
         """
@@ -580,13 +940,19 @@ class ProxyPool(ProxyPoolBase):
                 if proxy_item.proxy_id in self.invalid_proxy_dict:
                     continue
                 if proxy_item.proxy_id not in self.proxy_dict:
+                    old_proxy_item = self.last_proxy_dict.get(proxy_item.proxy_id)
+                    if old_proxy_item:
+                        proxy_item.copy_stats(old_proxy_item)
                     # 补充update_ts
                     if not proxy_item.update_ts:
                         proxy_item.update_ts = self.proxy_item_update_ts_dict.get(
                             proxy_item.proxy_id, 0
                         )
-                    self.put_proxy_item(proxy_item)
                     self.proxy_dict[proxy_item.proxy_id] = proxy_item
+                    if self.check_valid and proxy_item.need_check():
+                        self.validate_proxy_item(proxy_item)
+                    else:
+                        self.put_proxy_item(proxy_item)
                     count += 1
         return count
 
@@ -598,9 +964,51 @@ class ProxyPool(ProxyPoolBase):
         """
         return self.proxy_queue.put_nowait(proxy_item)
 
+    def drop_proxy_item(self, proxy_item: ProxyItem):
+        """
+        处理失效代理
+        """
+        if self.proxy_dict.get(proxy_item.proxy_id) is proxy_item:
+            self.proxy_dict.pop(proxy_item.proxy_id, None)
+        self.invalid_proxy_dict[proxy_item.proxy_id] = datetime.datetime.now()
+
+    def validate_proxy_item(self, proxy_item: ProxyItem):
+        """
+        在后台线程池中检测代理有效性
+        """
+        if proxy_item.proxy_id in self.validating:
+            return
+        self.validating.add(proxy_item.proxy_id)
+        self._validate_executor.submit(self._validate, proxy_item)
+
+    def _validate(self, proxy_item: ProxyItem):
+        try:
+            start_time = time.time()
+            is_valid = proxy_item.is_valid(force=1)
+            metrics.emit_timer(
+                "validate_latency", time.time() - start_time, classify="proxy_pool"
+            )
+            metrics.emit_counter(
+                "valid" if is_valid else "invalid", 1, classify="proxy_pool"
+            )
+
+            if self.proxy_dict.get(proxy_item.proxy_id) is not proxy_item:
+                return
+
+            if is_valid:
+                # 记录update_ts
+                self.proxy_item_update_ts_dict[proxy_item.proxy_id] = proxy_item.update_ts
+                self.put_proxy_item(proxy_item)
+            else:
+                self.drop_proxy_item(proxy_item)
+        except Exception as e:
+            self.logger.exception(e)
+        finally:
+            self.validating.discard(proxy_item.proxy_id)
+
     def reset_proxy_pool(self, force: bool = False):
         """
-        重置代理池
+        重置代理池，由后台维护线程调用
         :param force: 是否强制重置代理池
         :return:
         """
@@ -612,15 +1020,9 @@ class ProxyPool(ProxyPoolBase):
         with self.reset_lock:
             if (
                 force
-                or self.proxy_queue is None
-                or (
-                    self.max_queue_size > 0
-                    and self.proxy_queue.qsize() < self.max_queue_size / 2
-                )
-                or (
-                    self.max_queue_size < 0
-                    and self.proxy_queue.qsize() < self.real_max_proxy_count / 2
-                )
+                or not self.proxy_dict
+                # 检测中的代理检测完后才能判断是否需要补充
+                or (not self.validating and self._need_refill())
                 or self.no_valid_proxy_times >= 5
             ):
                 if time.time() - self.last_reset_time < self.reset_interval:
@@ -629,13 +1031,10 @@ class ProxyPool(ProxyPoolBase):
                         self.logger.debug(
                             "代理池重置的太快了:) {}".format(self.reset_fast_count)
                         )
-                        time.sleep(1)
                 else:
-                    self.clear()
-                    if self.proxy_queue is None:
-                        import queue
-
-                        self.proxy_queue = queue.Queue()
+                    # 强制重置或持续取不到代理时替换全部代理，否则只补充新的代理
+                    if force or self.no_valid_proxy_times >= 5:
+                        self.clear()
                     # TODO 这里获取到的可能重复
                     proxies_list = get_proxy_from_url(**self.kwargs)
                     self.real_max_proxy_count = len(proxies_list)
@@ -677,6 +1076,9 @@ class ProxyPool(ProxyPoolBase):
             self.proxy_dict[proxy_id].flag = flag
             self.proxy_dict[proxy_id].flag_ts = time.time()
             self.proxy_dict[proxy_id].delay = delay
+            if int(flag) == 1:
+                # 延迟使用的代理一般是被封了，延迟结束后降低被选中的概率
+                self.proxy_dict[proxy_id].report(success=False, banned=True)
 
         return True
 
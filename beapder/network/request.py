@@ -8,6 +8,7 @@ Created on 2018-07-25 11:49:08
 @email:  boris_liu@foxmail.com
 """
 
+import asyncio
 import copy
 import os
 import re
@@ -22,11 +23,19 @@ from beapder.utils.load_settings import LoadSettings
 
 setting = LoadSettings()
 import beapder.utils.tools as tools
-from beapder.db.redisdb import RedisDB
 from beapder.network import user_agent
-from beapder.network.downloader.base import Downloader, RenderDownloader
+from beapder.network.downloader.base import (
+    AsyncDownloader,
+    Downloader,
+    RenderDownloader,
+)
 from beapder.network.proxy_pool import ProxyPool
-from beapder.network.response import Response
+from beapder.network.response_cache import (
+    RedisResponseCache,
+    ResponseCache,
+    get_response_cache,
+)
+from beapder.network.validator_store import get_validator_store
 from beapder.utils.log import log
 from beapder.utils.generic import NULL_DEFAULT
 
@@ -44,7 +53,8 @@ class Request:
     user_agent_pool = user_agent
     proxies_pool: ProxyPool = None
 
-    cache_db = None  # redis / pika
+    cache_db = None  # redis，兼容老版本，指定时response缓存于该redis，否则使用 setting.RESPONSE_CACHE
+    _cache_db_response_cache = None  # (cache_db, 对应的RedisResponseCache)
     cached_redis_key = None  # 缓存response的文件文件夹 response_cached:cached_redis_key:md5
     cached_expire_time = 1200  # 缓存过期时间
 
@@ -52,6 +62,7 @@ class Request:
     downloader: Downloader = None
     session_downloader: Downloader = None
     render_downloader: RenderDownloader = None
+    async_downloader: AsyncDownloader = None
 
     __REQUEST_ATTRS__ = {
         # "method",
@@ -89,6 +100,8 @@ class Request:
         render=False,
         render_time=0,
         make_absolute_links=None,
+        max_body_size=None,
+        conditional=None,
     )
 
     _CUSTOM_PROPERTIES_ = {
@@ -115,6 +128,8 @@ class Request:
             render=False,
             render_time=0,
             make_absolute_links=None,
+            max_body_size=None,
+            conditional=None,
             meta=None,
             **kwargs,
     ):
@@ -136,7 +151,9 @@ class Request:
         @param is_abandoned: 当发生异常时是否放弃重试 True/False. 默认False
         @param render: 是否用浏览器渲染
         @param render_time: 渲染时长，即打开网页等待指定时间后再获取源码
-        @param make_absolute_links: 是否转成绝对连接，默认是
+        @param make_absolute_links: 是否转成绝对连接，默认是。为 "selector" 时只转换选取到的链接
+        @param max_body_size: 响应体最大字节数，超过时中止下载，默认为setting中的RESPONSE_MAX_BODY_SIZE
+        @param conditional: 是否携带上次响应的ETag、Last-Modified发送条件请求，默认为setting中的CONDITIONAL_REQUEST_ENABLE
         --
         以下参数与requests参数使用方式一致
         @param method: 请求方式，如POST或GET，默认根据data值是否为空来判断
@@ -179,6 +196,8 @@ class Request:
             if make_absolute_links is not None
             else setting.MAKE_ABSOLUTE_LINKS
         )
+        self.max_body_size = max_body_size
+        self.conditional = conditional
 
         # 自定义属性，不参与序列化
         self.requests_kwargs = {}
@@ -243,6 +262,20 @@ class Request:
     def __lt__(self, other):
         return self.priority < other.priority
 
+    @property
+    def _response_cache(self) -> ResponseCache:
+        cache_db = self.__class__.cache_db
+        if not cache_db:
+            return get_response_cache()
+
+        cached = Request._cache_db_response_cache
+        if not cached or cached[0] is not cache_db:
+            cached = Request._cache_db_response_cache = (
+                cache_db,
+                RedisResponseCache(cache_db),
+            )
+        return cached[1]
+
     @property
     def _proxies_pool(self):
         if not self.__class__.proxies_pool:
@@ -266,6 +299,15 @@ class Request:
 
         return self.__class__.session_downloader
 
+    @property
+    def _async_downloader(self):
+        if not self.__class__.async_downloader:
+            self.__class__.async_downloader = tools.import_cls(
+                setting.ASYNC_DOWNLOADER
+            )()
+
+        return self.__class__.async_downloader
+
     @property
     def _render_downloader(self):
         if not self.__class__.render_downloader:
@@ -333,9 +375,10 @@ class Request:
             else self.callback
         )
 
-    def make_requests_kwargs(self):
+    def make_requests_kwargs(self, wait_proxies=True):
         """
         处理参数
+        @param wait_proxies: 是否阻塞等待代理池的代理，异步下载时为False，由 make_proxies_async 获取
         """
         # 设置超时默认时间
         self.requests_kwargs.setdefault(
@@ -377,9 +420,8 @@ class Request:
             self.custom_ua = True
 
         # 代理
-        proxies = self.requests_kwargs.get("proxies", NULL_DEFAULT)
-        if proxies is NULL_DEFAULT and setting.PROXY_ENABLE and setting.PROXY_EXTRACT_API:
-            while True:
+        if self._use_proxies_pool():
+            while wait_proxies:
                 proxies = self._proxies_pool.get()
                 if proxies:
                     self.requests_kwargs.update(proxies=proxies)
@@ -389,6 +431,32 @@ class Request:
         else:
             self.custom_proxies = True
 
+    def _use_proxies_pool(self):
+        """
+        未指定代理且开启了代理时，从代理池获取代理
+        """
+        return (
+            self.requests_kwargs.get("proxies", NULL_DEFAULT) is NULL_DEFAULT
+            and setting.PROXY_ENABLE
+            and setting.PROXY_EXTRACT_API
+        )
+
+    async def make_proxies_async(self):
+        """
+        异步下载时从代理池获取代理，不阻塞事件循环。暂无可用代理时让出事件循环，稍后再取
+        """
+        if not self._use_proxies_pool():
+            return
+
+        while True:
+            proxies = self._proxies_pool.get(timeout=0)
+            if proxies:
+                self.requests_kwargs.update(proxies=proxies)
+                break
+            else:
+                log.debug("暂无可用代理 ...")
+                await asyncio.sleep(0.1)
+
     def get_response(self, save_cached=False):
         """
         获取带有selector功能的response
@@ -396,35 +464,8 @@ class Request:
         @return:
         """
         self.make_requests_kwargs()
-
-        log.debug(
-            """
-                -------------- %srequest for ----------------
-                url  = %s
-                method = %s
-                args = %s
-                depth = %d
-                """
-            % (
-                ""
-                if not self.parser_name
-                else "%s.%s "
-                     % (
-                         self.parser_name,
-                         (
-                                 self.callback
-                                 and callable(self.callback)
-                                 and getattr(self.callback, "__name__")
-                                 or self.callback
-                         )
-                         or "parse",
-                     ),
-                self.url,
-                self.method,
-                self.requests_kwargs,
-                self.meta.get("depth", 0)
-            )
-        )
+        self.make_conditional_headers()
+        self._log_request()
 
         # def hooks(response, *args, **kwargs):
         #     print(response.url)
@@ -444,12 +485,181 @@ class Request:
             response = self._downloader.download(self)
 
         response.make_absolute_links = self.make_absolute_links
+        # 流式下载时响应体在读取时才下载，响应头的长度超限时提前中止
+        response.max_body_size = self.get_max_body_size()
+        response.check_body_size()
+        response = self._deal_not_modified(response)
+
+        if save_cached:
+            self.save_cached(response, expire_time=self.__class__.cached_expire_time)
+
+        return response
+
+    def _log_request(self):
+        # 每个请求都会执行，未开启debug时跳过参数的拼接
+        if log.is_debug():
+            log.debug(
+                """
+                    -------------- %srequest for ----------------
+                    url  = %s
+                    method = %s
+                    args = %s
+                    depth = %d
+                    """,
+                ""
+                if not self.parser_name
+                else "%s.%s "
+                % (
+                    self.parser_name,
+                    (
+                        self.callback
+                        and callable(self.callback)
+                        and getattr(self.callback, "__name__")
+                        or self.callback
+                    )
+                    or "parse",
+                ),
+                self.url,
+                self.method,
+                self.requests_kwargs,
+                self.meta.get("depth", 0),
+            )
+
+    async def get_response_async(self, save_cached=False):
+        """
+        异步获取带有selector功能的response，使用 ASYNC_DOWNLOADER 下载
+        浏览器渲染及session方式的请求仍使用同步的下载器，在线程池中执行
+        @param save_cached: 保存缓存 方便调试时不用每次都重新下载
+        @return:
+        """
+        use_session = (
+            setting.USE_SESSION if self.use_session is None else self.use_session
+        )
+        if self.render or use_session:
+            return await asyncio.get_event_loop().run_in_executor(
+                None, self.get_response, save_cached
+            )
+
+        self.make_requests_kwargs(wait_proxies=False)
+        await self.make_proxies_async()
+        self.make_conditional_headers()
+        self._log_request()
+
+        response = await self._async_downloader.download(self)
+        response.make_absolute_links = self.make_absolute_links
+        response.max_body_size = self.get_max_body_size()
+        response = self._deal_not_modified(response)
 
         if save_cached:
             self.save_cached(response, expire_time=self.__class__.cached_expire_time)
 
         return response
 
+    @classmethod
+    async def close_async_downloader(cls):
+        """
+        关闭当前事件循环中异步下载器的连接
+        """
+        if cls.async_downloader:
+            await cls.async_downloader.close_all()
+
+    def get_max_body_size(self) -> int:
+        if self.max_body_size is None:
+            return setting.RESPONSE_MAX_BODY_SIZE
+        return self.max_body_size
+
+    def is_conditional(self) -> bool:
+        """
+        是否发送条件请求，仅GET、HEAD请求有效，浏览器渲染的请求不发送
+        """
+        conditional = (
+            setting.CONDITIONAL_REQUEST_ENABLE
+            if self.conditional is None
+            else self.conditional
+        )
+        return (
+            bool(conditional)
+            and (self.method or "GET").upper() in ("GET", "HEAD")
+            and not self.render
+        )
+
+    @property
+    def _validator_store(self):
+        return get_validator_store(self.__class__.cached_redis_key or "test")
+
+    def make_conditional_headers(self):
+        """
+        携带上次响应的ETag、Last-Modified。重试的请求不携带，解析失败时可重新下载完整的响应
+        开启了 RESPONSE_CACHED_ENABLE 时304以缓存的响应回放，只在缓存仍存在时携带缓存的响应的校验信息，
+        缓存过期后重新下载完整的响应
+        自定义的 If-None-Match、If-Modified-Since 优先
+        """
+        if self.retry_times:
+            # 重试时可能是同一个request对象，去掉上次下载时携带的校验信息
+            headers = self.requests_kwargs.get("headers") or {}
+            custom_headers = self.__dict__.get("headers") or {}
+            for name in ("If-None-Match", "If-Modified-Since"):
+                if name in headers and name not in custom_headers:
+                    del headers[name]
+            return
+
+        if not self.is_conditional():
+            return
+
+        if setting.RESPONSE_CACHED_ENABLE:
+            metadata = self._response_cache.get_metadata(self._cached_redis_key)
+            validators = metadata and (metadata["etag"], metadata["last_modified"])
+        else:
+            validators = self._validator_store.get(self.fingerprint)
+        if not validators:
+            return
+
+        etag, last_modified = validators
+        headers = self.requests_kwargs.get("headers") or {}
+        header_names = {name.lower() for name in headers}
+        conditional_headers = {}
+        if etag and "if-none-match" not in header_names:
+            conditional_headers["If-None-Match"] = etag
+        if last_modified and "if-modified-since" not in header_names:
+            conditional_headers["If-Modified-Since"] = last_modified
+
+        if conditional_headers:
+            # 复制一份，不修改序列化的headers
+            self.requests_kwargs["headers"] = dict(headers, **conditional_headers)
+
+    def _deal_not_modified(self, response):
+        """
+        服务器返回304时标记 response.not_modified，开启了 RESPONSE_CACHED_ENABLE 且有缓存时返回缓存的响应
+        """
+        if response.status_code != 304:
+            return response
+
+        if setting.RESPONSE_CACHED_ENABLE:
+            cached_response = self._response_cache.get(self._cached_redis_key)
+            if cached_response:
+                response.close()
+                cached_response.make_absolute_links = self.make_absolute_links
+                response = cached_response
+
+        response.not_modified = True
+        return response
+
+    def save_validators(self, response):
+        """
+        记录响应的ETag、Last-Modified，下次请求时发送条件请求
+        """
+        if (
+            not self.is_conditional()
+            or response.status_code != 200
+            or getattr(response, "not_modified", False)
+        ):
+            return
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validator_store.set(self.fingerprint, etag, last_modified)
+
     def get_params(self):
         return self.requests_kwargs.get("params")
 
@@ -511,13 +721,6 @@ class Request:
 
         return tools.get_md5(*args)
 
-    @property
-    def _cache_db(self):
-        if not self.__class__.cache_db:
-            self.__class__.cache_db = RedisDB()  # .from_url(setting.pika_spider_1_uri)
-
-        return self.__class__.cache_db
-
     @property
     def _cached_redis_key(self):
         if self.__class__.cached_redis_key:
@@ -529,13 +732,16 @@ class Request:
 
     def save_cached(self, response, expire_time=1200):
         """
-        使用redis保存response 用于调试 不用每回都下载
+        保存response到 setting.RESPONSE_CACHE 指定的缓存 用于调试 不用每回都下载
         @param response:
         @param expire_time: 过期时间
         @return:
         """
+        # 条件请求未修改的响应没有响应体，不缓存
+        if getattr(response, "not_modified", False):
+            return
 
-        self._cache_db.strset(self._cached_redis_key, response.to_dict, ex=expire_time)
+        self._response_cache.set(self._cached_redis_key, response, expire_time)
 
     def get_response_from_cached(self, save_cached=True):
         """
@@ -551,17 +757,16 @@ class Request:
         @param: save_cached 当无缓存 直接下载 下载完是否保存缓存
         @return:
         """
-        response_dict = self._cache_db.strget(self._cached_redis_key)
-        if not response_dict:
+        response_obj = self._response_cache.get(self._cached_redis_key)
+        if not response_obj:
             log.info("无response缓存  重新下载")
             response_obj = self.get_response(save_cached=save_cached)
         else:
-            response_dict = eval(response_dict)
-            response_obj = Response.from_dict(response_dict)
+            response_obj.make_absolute_links = self.make_absolute_links
         return response_obj
 
     def del_response_cached(self):
-        self._cache_db.clear(self._cached_redis_key)
+        self._response_cache.delete(self._cached_redis_key)
 
     @classmethod
     def from_dict(cls, request_dict):
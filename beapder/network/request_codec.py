@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: request 序列化编解码器。用于request在redis任务队列、失败队列中的存储
+---------
+@author: pikadoramon
+"""
+
+import ast
+
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+import beapder.utils.tools as tools
+
+
+class RequestCodec:
+    """
+    request 编解码器基类
+    encode 将 request.to_dict 编码为可写入redis的bytes/str， decode 为其逆过程
+    loads 会自动识别老版本以 str(request.to_dict) 形式存储的数据，兼容已存在的任务
+    """
+
+    # 取出老版本数据时是否迁移为当前编码
+    migrate_legacy = True
+
+    def encode(self, request_dict):
+        raise NotImplementedError
+
+    def decode(self, data):
+        raise NotImplementedError
+
+    def dumps(self, request):
+        return self.encode(request.to_dict)
+
+    def loads(self, data):
+        """
+        解码redis中取出的request，返回request_dict
+        @param data: bytes 或 str
+        @return: dict
+        """
+        if self.is_legacy(data):
+            return self.decode_legacy(data)
+        return self.decode(data)
+
+    @staticmethod
+    def is_legacy(data):
+        """
+        是否为老版本 str(request.to_dict) 形式的数据
+        """
+        if isinstance(data, str):
+            return data[:1] == "{"
+        return data[:1] == b"{"
+
+    @staticmethod
+    def decode_legacy(data):
+        # to_dict 中非字面量的值已序列化为字符串，只需解析字面量
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return ast.literal_eval(data)
+
+
+class ReprRequestCodec(RequestCodec):
+    """
+    老版本的编码方式 str(request.to_dict)，解码时只解析字面量
+    """
+
+    migrate_legacy = False
+
+    def encode(self, request_dict):
+        return str(request_dict).encode("utf-8")
+
+    def decode(self, data):
+        return self.decode_legacy(data)
+
+
+class MsgpackRequestCodec(RequestCodec):
+    """
+    msgpack编码，带版本号的二进制帧: MAGIC(1 byte) + VERSION(1 byte) + payload
+    MAGIC 为 0xc1，msgpack与utf-8均未使用该字节，可与老版本的数据区分
+    """
+
+    MAGIC = b"\xc1"
+    VERSION = 1
+    HEADER = MAGIC + bytes([VERSION])
+
+    # msgpack 扩展类型
+    EXT_TUPLE = 1
+    EXT_SET = 2
+    EXT_PICKLE = 3
+
+    def __init__(self):
+        try:
+            import msgpack
+        except Exception as e:
+            raise Exception(
+                "使用 MsgpackRequestCodec 需要安装msgpack\ncommand: pip install msgpack"
+            )
+
+        self._msgpack = msgpack
+        self._packer_kwargs = dict(
+            use_bin_type=True, strict_types=True, default=self._default
+        )
+
+    def _default(self, obj):
+        # strict_types=True 时 tuple、set 及 dict/list/str 的子类均会进入此处
+        if isinstance(obj, tuple):
+            return self._msgpack.ExtType(
+                self.EXT_TUPLE, self._msgpack.packb(list(obj), **self._packer_kwargs)
+            )
+        elif isinstance(obj, (set, frozenset)):
+            return self._msgpack.ExtType(
+                self.EXT_SET, self._msgpack.packb(list(obj), **self._packer_kwargs)
+            )
+        elif isinstance(obj, dict):
+            return dict(obj)
+        elif isinstance(obj, list):
+            return list(obj)
+        elif isinstance(obj, str):
+            return str(obj)
+        elif isinstance(obj, bool):
+            return bool(obj)
+        elif isinstance(obj, int):
+            return int(obj)
+        elif isinstance(obj, float):
+            return float(obj)
+        elif isinstance(obj, bytes):
+            return bytes(obj)
+        else:
+            return self._msgpack.ExtType(self.EXT_PICKLE, tools.dumps_obj(obj))
+
+    def _ext_hook(self, code, data):
+        if code == self.EXT_TUPLE:
+            return tuple(self._unpackb(data))
+        elif code == self.EXT_SET:
+            return set(self._unpackb(data))
+        elif code == self.EXT_PICKLE:
+            return tools.loads_obj(data)
+        return self._msgpack.ExtType(code, data)
+
+    def _unpackb(self, data):
+        return self._msgpack.unpackb(
+            data, raw=False, strict_map_key=False, ext_hook=self._ext_hook
+        )
+
+    def encode(self, request_dict):
+        return self.HEADER + self._msgpack.packb(request_dict, **self._packer_kwargs)
+
+    def decode(self, data):
+        if isinstance(data, str):
+            raise ValueError(
+                "MsgpackRequestCodec 需要bytes类型的数据，请使用 RedisDB(decode_responses=False) 读取"
+            )
+
+        if data[:1] != self.MAGIC:
+            raise ValueError("未知的request编码格式: %r" % data[:20])
+
+        version = data[1]
+        if version != self.VERSION:
+            raise ValueError("不支持的request编码版本: %s" % version)
+
+        return self._unpackb(data[2:])
+
+
+_request_codec = None
+
+
+def get_request_codec() -> RequestCodec:
+    """
+    获取 setting.REQUEST_CODEC 指定的编解码器，进程内单例
+    """
+    global _request_codec
+    if _request_codec is None:
+        _request_codec = tools.import_cls(setting.REQUEST_CODEC)()
+
+    return _request_codec
@@ -8,24 +8,39 @@ Created on 2018-07-26 11:40:28
 @email:  boris_liu@foxmail.com
 """
 
+import codecs
 import datetime
+import itertools
 import os
 import re
 import tempfile
 import webbrowser
-from urllib.parse import urlparse, urlunparse, urljoin
 
-from bs4 import UnicodeDammit, BeautifulSoup
+from requests.compat import chardet
 from requests.cookies import RequestsCookieJar
+from requests.exceptions import RequestException
 from requests.models import Response as res
+from requests.utils import stream_decode_response_unicode
 from w3lib.encoding import http_content_type_encoding, html_body_declared_encoding
 
 from beapder import setting
-from beapder.network.selector import Selector
-from beapder.utils.log import log
-from scrapy.spiders.crawl import CrawlSpider
+from beapder.network.document import Document
+from beapder.network.selector import AbsoluteLinks, AbsoluteLinksSelector, Selector
 
 FAIL_ENCODING = "ISO-8859-1"
+CHUNK_SIZE = 64 * 1024
+
+# 转为绝对链接的方式，selector：不修改网页源码，只转换选取的链接
+MAKE_ABSOLUTE_LINKS_SELECTOR = "selector"
+
+# BOM: 编码，utf-32 的BOM以 utf-16 的BOM开头，需先判断
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
 
 # html 源码中的特殊字符，需要删掉，否则会影响etree的构建
 SPECIAL_CHARACTERS = [
@@ -38,6 +53,12 @@ SPECIAL_CHARACTER_PATTERNS = [
 ]
 
 
+class ResponseTooLarge(RequestException):
+    """
+    响应体超过 max_body_size，已中止下载
+    """
+
+
 class Response(res):
     def __init__(self, response, make_absolute_links=None):
         """
@@ -54,14 +75,26 @@ class Response(res):
             if make_absolute_links is not None
             else setting.MAKE_ABSOLUTE_LINKS
         )
+        self._cached_links_maker = None
 
         self._cached_selector = None
         self._cached_text = None
         self._cached_json = None
+        self._cached_document = None
 
         self._encoding = None
 
+        # 响应体最大字节数，超过时中止下载，0为不限制
+        self.max_body_size = self.__dict__.get(
+            "max_body_size", setting.RESPONSE_MAX_BODY_SIZE
+        )
+        # 猜测编码时预读的响应体开头，之后读取响应体时先返回这部分，再从预读时的生成器继续读取
+        self._peeked = self.__dict__.get("_peeked", b"")
+        self._body_stream = self.__dict__.get("_body_stream")
+
         self.encoding_errors = "strict"  # strict / replace / ignore
+        # 条件请求时页面未修改，服务器返回了304
+        self.not_modified = self.__dict__.get("not_modified", False)
         self.browser = self.driver = None
 
         # 这里属于beapder定义字段
@@ -144,16 +177,21 @@ class Response(res):
         self.__dict__["_cached_selector"] = None
         self.__dict__["_cached_text"] = None
         self.__dict__["_cached_json"] = None
+        self.release_document()
 
     @property
     def encoding(self):
         """
-        编码优先级：自定义编码 > header中编码 > 页面编码 > 根据content猜测的编码
+        编码优先级：自定义编码 > json的header中编码 > BOM > 页面编码 > header中编码 > utf-8 > 根据content猜测的编码
+        前面的判断成立时不再用chardet猜测
         """
         self._encoding = (
             self._encoding
             or self._headers_encoding()
+            or self._bom_encoding()
             or self._body_declared_encoding()
+            or self._headers_charset()
+            or self._utf8_encoding()
             or self.apparent_encoding
         )
         return self._encoding
@@ -179,17 +217,159 @@ class Response(res):
                 else None
             )
 
+    def _headers_charset(self):
+        """
+        headers中的charset，如 Content-Type: text/html; charset=gbk
+        """
+        content_type = self.headers.get("Content-Type") or self.headers.get(
+            "content-type"
+        )
+        if content_type:
+            return http_content_type_encoding(content_type)
+
+    def _bom_encoding(self):
+        head = self._head_content()
+        for bom, encoding in BOM_ENCODINGS:
+            if head.startswith(bom):
+                return encoding
+
+    def _utf8_encoding(self):
+        """
+        响应体开头为合法的utf-8时返回utf-8，结尾可为截断的字符
+        """
+        try:
+            codecs.getincrementaldecoder("utf-8")().decode(self._head_content())
+        except UnicodeDecodeError:
+            return None
+        return "utf-8"
+
     def _body_declared_encoding(self):
         """
         从html xml等获取<meta charset="编码">
         """
 
-        return html_body_declared_encoding(self.content)
+        return html_body_declared_encoding(self._head_content())
+
+    @property
+    def apparent_encoding(self):
+        """
+        根据响应体开头的 RESPONSE_ENCODING_DETECT_SIZE 个字节猜测编码
+        """
+        if chardet is None:
+            return "utf-8"
+        return chardet.detect(self._head_content())["encoding"]
+
+    def _head_content(self):
+        """
+        响应体的开头部分，用于猜测编码。响应体未读取时只预读这部分
+        """
+        size = setting.RESPONSE_ENCODING_DETECT_SIZE
+        if self._content is False and self._body_stream is not None:
+            return self._peeked[:size]
+
+        if (
+            self._content is False
+            and not self._content_consumed
+            and self.raw is not None
+        ):
+            self.check_body_size()
+            # 预读与之后的读取共用一个生成器，生成器被回收时会释放连接
+            self._body_stream = super(Response, self).iter_content(CHUNK_SIZE)
+            peeked = []
+            peeked_size = 0
+            for chunk in self._body_stream:
+                peeked.append(chunk)
+                peeked_size += len(chunk)
+                if peeked_size >= size:
+                    break
+            self._peeked = b"".join(peeked)
+            return self._peeked[:size]
+
+        return (self.content or b"")[:size]
+
+    def check_body_size(self):
+        """
+        响应头的 Content-Length 超过 max_body_size 时中止下载，不读取响应体
+        """
+        content_length = self.headers.get("Content-Length")
+        if (
+            self.max_body_size
+            and content_length
+            and content_length.isdigit()
+            and int(content_length) > self.max_body_size
+        ):
+            self.close()
+            raise ResponseTooLarge(
+                "响应体 {} 字节，超过 {} 字节，已中止下载 url: {}".format(
+                    content_length, self.max_body_size, self.url
+                ),
+                response=self,
+            )
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        """
+        同 requests 的 iter_content，先返回预读的部分，累计超过 max_body_size 时中止下载
+        content 也通过此方法读取
+        """
+        if self._content is not False:
+            return super(Response, self).iter_content(chunk_size, decode_unicode)
+
+        chunks = self._iter_body(
+            self._body_stream or super(Response, self).iter_content(chunk_size)
+        )
+        if decode_unicode:
+            chunks = stream_decode_response_unicode(chunks, self)
+        return chunks
+
+    def _iter_body(self, chunks):
+        self.check_body_size()
+
+        peeked, self._peeked = self._peeked, b""
+        size = 0
+        for chunk in itertools.chain((peeked,) if peeked else (), chunks):
+            size += len(chunk)
+            if self.max_body_size and size > self.max_body_size:
+                self.close()
+                raise ResponseTooLarge(
+                    "响应体超过 {} 字节，已中止下载 url: {}".format(
+                        self.max_body_size, self.url
+                    ),
+                    response=self,
+                )
+            yield chunk
+
+    def save_to(self, file, chunk_size=CHUNK_SIZE):
+        """
+        分块将响应体写入文件，适用于下载大文件，不占用内存。读取后不可再访问 content、text
+        @param file: 文件路径 或 以二进制写方式打开的文件对象
+        @param chunk_size: 每次读取的字节数
+        @return: 写入的字节数
+        """
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "wb") as f:
+                return self.save_to(f, chunk_size)
+
+        return self.stream_to(file.write, chunk_size)
+
+    def stream_to(self, callback, chunk_size=CHUNK_SIZE):
+        """
+        分块读取响应体，每块调用一次 callback(chunk)。读取后不可再访问 content、text
+        @param callback: 处理每块响应体的方法
+        @param chunk_size: 每次读取的字节数
+        @return: 读取的字节数
+        """
+        size = 0
+        for chunk in self.iter_content(chunk_size):
+            callback(chunk)
+            size += len(chunk)
+        return size
 
     def _get_unicode_html(self, html):
         if not html or not isinstance(html, bytes):
             return html
 
+        from bs4 import UnicodeDammit
+
         converted = UnicodeDammit(html, is_html=True)
         if not converted.unicode_markup:
             raise Exception(
@@ -200,58 +380,27 @@ class Response(res):
         html = converted.unicode_markup
         return html
 
+    @property
+    def _links_maker(self):
+        """
+        以当前url为base_url的链接转换器，url只解析一次
+        """
+        if (
+            self._cached_links_maker is None
+            or self._cached_links_maker.base_url != self.url
+        ):
+            self._cached_links_maker = AbsoluteLinks(self.url)
+        return self._cached_links_maker
+
     def _make_absolute(self, link):
         """Makes a given link absolute."""
-        try:
-
-            link = link.strip()
-
-            # Parse the link with stdlib.
-            parsed = urlparse(link)._asdict()
-
-            # If link is relative, then join it with base_url.
-            if not parsed["netloc"]:
-                return urljoin(self.url, link)
-
-            # Link is absolute; if it lacks a scheme, add one from base_url.
-            if not parsed["scheme"]:
-                parsed["scheme"] = urlparse(self.url).scheme
-
-                # Reconstruct the URL to incorporate the new scheme.
-                parsed = (v for v in parsed.values())
-                return urlunparse(parsed)
-
-        except Exception as e:
-            log.error(
-                "Invalid URL <{}> can't make absolute_link. exception: {}".format(
-                    link, e
-                )
-            )
-
-        # Link is absolute and complete with scheme; nothing to be done here.
-        return link
+        return self._links_maker(link)
 
     def _absolute_links(self, text):
-        regexs = [
-            r'(<a.*?href\s*?=\s*?["\'])(.+?)(["\'])',  # a
-            r'(<img.*?src\s*?=\s*?["\'])(.+?)(["\'])',  # img
-            r'(<link.*?href\s*?=\s*?["\'])(.+?)(["\'])',  # css
-            r'(<script.*?src\s*?=\s*?["\'])(.+?)(["\'])',  # js
-        ]
-
-        for regex in regexs:
-
-            def replace_href(text):
-                # html = text.group(0)
-                link = text.group(2)
-                absolute_link = self._make_absolute(link)
-
-                # return re.sub(regex, r'\1{}\3'.format(absolute_link), html) # 使用正则替换，个别字符不支持。如该网址源代码http://permit.mep.gov.cn/permitExt/syssb/xxgk/xxgk!showImage.action?dataid=0b092f8115ff45c5a50947cdea537726
-                return text.group(1) + absolute_link + text.group(3)
-
-            text = re.sub(regex, replace_href, text, flags=re.S | re.I)
-
-        return text
+        """
+        一次遍历将a、link的href及img、script的src转为绝对链接
+        """
+        return self._links_maker.sub(text)
 
     def _del_special_character(self, text):
         """
@@ -304,7 +453,7 @@ class Response(res):
                 self._cached_text = self._get_unicode_html(self.content)
 
             if self._cached_text:
-                if self.make_absolute_links:
+                if self._is_make_absolute_text():
                     self._cached_text = self._absolute_links(self._cached_text)
                 self._cached_text = self._del_special_character(self._cached_text)
 
@@ -313,10 +462,48 @@ class Response(res):
     @text.setter
     def text(self, html):
         self._cached_text = html
-        if self.make_absolute_links:
+        if self._is_make_absolute_text():
             self._cached_text = self._absolute_links(self._cached_text)
         self._cached_text = self._del_special_character(self._cached_text)
-        self._cached_selector = Selector(self.text)
+        self.release_document()
+        self._cached_selector = self._make_selector()
+
+    def _is_make_absolute_text(self):
+        return (
+            self.make_absolute_links
+            and self.make_absolute_links != MAKE_ABSOLUTE_LINKS_SELECTOR
+        )
+
+    def _make_selector(self):
+        selector_cls = (
+            AbsoluteLinksSelector
+            if self.make_absolute_links == MAKE_ABSOLUTE_LINKS_SELECTOR
+            else Selector
+        )
+        return selector_cls(root=self.document, type="html")
+
+    @property
+    def _document(self):
+        if self._cached_document is None:
+            self._cached_document = Document(self.text, base_url=self.url)
+        return self._cached_document
+
+    @property
+    def document(self):
+        """
+        解析后的lxml树，只解析一次，selector、规则的链接提取共用
+        """
+        return self._document.root
+
+    def release_document(self):
+        """
+        释放解析结果（lxml的树、selector、bs4），处理完response后调用，之后再使用时重新解析
+        """
+        self.__dict__["_cached_selector"] = None
+        document = self.__dict__.get("_cached_document")
+        if document is not None:
+            document.release()
+            self.__dict__["_cached_document"] = None
 
     @property
     def json(self, **kwargs):
@@ -328,6 +515,9 @@ class Response(res):
 
     @property
     def content(self):
+        if self._content is False and self._body_stream is not None:
+            # 已预读，requests 的 content 不能接着预读的位置读取
+            self._content = b"".join(self.iter_content(CHUNK_SIZE))
         content = super(Response, self).content
         return content
 
@@ -342,12 +532,14 @@ class Response(res):
     @property
     def selector(self):
         if self._cached_selector is None:
-            self._cached_selector = Selector(self.text)
+            self._cached_selector = self._make_selector()
         return self._cached_selector
 
     def bs4(self, features="html.parser"):
-        soup = BeautifulSoup(self.text, features)
-        return soup
+        """
+        bs4无法由lxml的树构建，同一features只解析一次
+        """
+        return self._document.soup(features)
 
     def extract(self):
         return self.selector.get()
@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: response 缓存。用于开发解析时回放已下载的响应，及增量抓取
+          RedisResponseCache 存于redis，按过期时间淘汰；SqliteResponseCache 存于本地文件，超过大小时淘汰最久未使用的缓存
+---------
+@author: pikadoramon
+"""
+
+import ast
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+from requests.structures import CaseInsensitiveDict
+
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+import beapder.utils.tools as tools
+from beapder.db.redisdb import RedisDB
+from beapder.network.response import Response
+from beapder.utils.log import log
+
+
+class ResponseCodec:
+    """
+    response 二进制编码，带版本号及压缩方式的帧: MAGIC(1 byte) + VERSION(1 byte) + COMPRESSION(1 byte) + payload
+    payload 为msgpack编码的 url、状态码、响应头、cookie、编码、耗时、响应体，按 COMPRESSION 压缩
+    以 { 开头的为老版本 str(response.to_dict) 形式存储的数据，仍可读取
+    """
+
+    MAGIC = b"\xc1"
+    VERSION = 1
+
+    COMPRESSIONS = {"": 0, "gzip": 1, "zstd": 2}
+
+    def __init__(self, compression="gzip", level=None):
+        """
+        @param compression: 压缩方式 gzip、zstd，空为不压缩
+        @param level: 压缩级别，默认 gzip 为6，zstd 为3
+        """
+        import msgpack
+
+        compression = compression or ""
+        if compression not in self.COMPRESSIONS:
+            raise ValueError("不支持的压缩方式: %s" % compression)
+
+        self._msgpack = msgpack
+        self._compression = compression
+        self._level = level
+        self._header = self.MAGIC + bytes(
+            [self.VERSION, self.COMPRESSIONS[compression]]
+        )
+        if compression == "zstd":
+            self._zstd()
+
+    @staticmethod
+    def _zstd():
+        try:
+            import zstandard
+        except Exception as e:
+            raise Exception(
+                "使用 zstd 压缩需要安装zstandard\ncommand: pip install zstandard"
+            )
+        return zstandard
+
+    def compress(self, data):
+        if self._compression == "gzip":
+            return gzip.compress(data, compresslevel=self._level or 6)
+        elif self._compression == "zstd":
+            return self._zstd().ZstdCompressor(level=self._level or 3).compress(data)
+        return data
+
+    def decompress(self, data, compression):
+        if compression == self.COMPRESSIONS["gzip"]:
+            return gzip.decompress(data)
+        elif compression == self.COMPRESSIONS["zstd"]:
+            return self._zstd().ZstdDecompressor().decompress(data)
+        elif compression == self.COMPRESSIONS[""]:
+            return data
+        raise ValueError("未知的压缩方式: %s" % compression)
+
+    def encode(self, response):
+        response_dict = {
+            "url": response.url,
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "cookies": response.cookies.get_dict(),
+            "encoding": response.encoding,
+            "elapsed": response.elapsed.microseconds,
+            "_content": response.content,
+        }
+        payload = self._msgpack.packb(response_dict, use_bin_type=True)
+        return self._header + self.compress(payload)
+
+    def decode(self, data):
+        """
+        @param data: bytes 或 str
+        @return: Response
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+
+        if data[:1] == b"{":
+            # 老版本数据均为字面量，不执行其中的代码
+            response_dict = ast.literal_eval(data.decode("utf-8"))
+        else:
+            if data[:1] != self.MAGIC:
+                raise ValueError("未知的response编码格式: %r" % data[:20])
+            if data[1] != self.VERSION:
+                raise ValueError("不支持的response编码版本: %s" % data[1])
+
+            response_dict = self._msgpack.unpackb(
+                self.decompress(data[3:], data[2]), raw=False
+            )
+
+        return self.to_response(response_dict)
+
+    @staticmethod
+    def to_response(response_dict):
+        # 与下载的响应一致，响应头不区分大小写
+        response_dict["headers"] = CaseInsensitiveDict(response_dict["headers"])
+        return Response.from_dict(response_dict)
+
+    @staticmethod
+    def metadata(response):
+        """
+        条件请求所需的元数据
+        @return: {"etag": str, "last_modified": str}
+        """
+        return {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+
+
+class ResponseCache:
+    """
+    response 缓存基类，key 一般为 Request._cached_redis_key
+    """
+
+    def __init__(self, compression=None):
+        if compression is None:
+            compression = setting.RESPONSE_CACHE_COMPRESSION
+        self._codec = ResponseCodec(compression)
+
+    def get(self, key):
+        """
+        @return: Response，无缓存或已过期时返回None
+        """
+        raise NotImplementedError
+
+    def set(self, key, response, expire_time=None):
+        """
+        @param expire_time: 过期时间 秒，为空或0时不过期
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def get_metadata(self, key):
+        """
+        缓存的响应的 ETag 及 Last-Modified，用于条件请求
+        @return: {"etag": str, "last_modified": str}，无缓存时返回None
+        """
+        response = self.get(key)
+        return response and self._codec.metadata(response)
+
+    def close(self):
+        pass
+
+
+class RedisResponseCache(ResponseCache):
+    """
+    缓存于redis，每条缓存对应一个str类型的key，按过期时间淘汰
+    """
+
+    def __init__(self, redisdb=None, compression=None):
+        """
+        @param redisdb: RedisDB，默认使用setting中的redis
+        """
+        super(RedisResponseCache, self).__init__(compression)
+        if redisdb and redisdb._decode_responses:
+            # 编码后的response为二进制，使用同一redis的不解码的连接
+            redisdb = RedisDB(
+                ip_ports=redisdb._ip_ports,
+                db=redisdb._db,
+                user_pass=redisdb._user_pass,
+                url=redisdb._url,
+                decode_responses=False,
+                service_name=redisdb._service_name,
+                max_connections=redisdb._max_connections,
+                **redisdb._kwargs,
+            )
+        self._redisdb = redisdb or RedisDB(decode_responses=False)
+
+    def get(self, key):
+        data = self._redisdb.strget(key)
+        if not data:
+            return None
+        return self._codec.decode(data)
+
+    def set(self, key, response, expire_time=None):
+        self._redisdb.strset(key, self._codec.encode(response), ex=expire_time or None)
+
+    def delete(self, key):
+        self._redisdb.clear(key)
+
+
+class SqliteResponseCache(ResponseCache):
+    """
+    缓存于本地sqlite文件，ETag、Last-Modified 单独存储，读取元数据时无需解码响应
+    总大小超过 max_size 时，按访问时间淘汰最久未使用的缓存至 max_size 的90%
+    """
+
+    EVICT_RATIO = 0.9
+
+    def __init__(self, path=None, max_size=None, compression=None):
+        """
+        @param path: sqlite文件路径，默认为 setting.RESPONSE_CACHE_PATH
+        @param max_size: 最大占用的字节数，0为不限制，默认为 setting.RESPONSE_CACHE_MAX_SIZE
+        @param compression: 压缩方式，默认为 setting.RESPONSE_CACHE_COMPRESSION
+        """
+        super(SqliteResponseCache, self).__init__(compression)
+        self._path = path or setting.RESPONSE_CACHE_PATH
+        self._max_size = setting.RESPONSE_CACHE_MAX_SIZE if max_size is None else max_size
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._size = 0
+
+    @property
+    def conn(self):
+        # 多进程时各进程使用各自的连接
+        if self._pid != os.getpid():
+            dirname = os.path.dirname(self._path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+
+            conn = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    size INTEGER,
+                    expire_at REAL,
+                    accessed_at REAL,
+                    data BLOB
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS response_cache_accessed_at ON response_cache (accessed_at)"
+            )
+            conn.commit()
+
+            self._conn = conn
+            self._pid = os.getpid()
+            self._size = self._total_size()
+
+        return self._conn
+
+    def _total_size(self):
+        return self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM response_cache"
+        ).fetchone()[0]
+
+    def get(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT data, expire_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            data, expire_at = row
+            if expire_at and expire_at < time.time():
+                self._delete(key)
+                return None
+
+            self.conn.execute(
+                "UPDATE response_cache SET accessed_at = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.conn.commit()
+
+        return self._codec.decode(data)
+
+    def get_metadata(self, key):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT etag, last_modified, expire_at FROM response_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+        if not row or (row[2] and row[2] < time.time()):
+            return None
+        return {"etag": row[0], "last_modified": row[1]}
+
+    def set(self, key, response, expire_time=None):
+        data = self._codec.encode(response)
+        metadata = self._codec.metadata(response)
+        now = time.time()
+
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT size FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    response.url,
+                    metadata["etag"],
+                    metadata["last_modified"],
+                    len(data),
+                    now + expire_time if expire_time else None,
+                    now,
+                    data,
+                ),
+            )
+            self.conn.commit()
+            self._size += len(data) - (row[0] if row else 0)
+
+            if self._max_size and self._size > self._max_size:
+                self._evict()
+
+    def _evict(self):
+        """
+        先删除过期的，仍超过大小时删除最久未使用的。其他进程也会写入，淘汰前重新统计大小
+        """
+        conn = self.conn
+        conn.execute(
+            "DELETE FROM response_cache WHERE expire_at IS NOT NULL AND expire_at < ?",
+            (time.time(),),
+        )
+        self._size = self._total_size()
+
+        target = self._max_size * self.EVICT_RATIO
+        evicted = 0
+        while self._size > target:
+            rows = conn.execute(
+                "SELECT key, size FROM response_cache ORDER BY accessed_at LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+
+            keys = []
+            for key, size in rows:
+                keys.append((key,))
+                self._size -= size
+                if self._size <= target:
+                    break
+
+            conn.executemany("DELETE FROM response_cache WHERE key = ?", keys)
+            evicted += len(keys)
+
+        conn.commit()
+        log.debug("response缓存超过%s字节，淘汰%s条", self._max_size, evicted)
+
+    def _delete(self, key):
+        row = self.conn.execute(
+            "SELECT size FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row:
+            self.conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self.conn.commit()
+            self._size -= row[0]
+
+    def delete(self, key):
+        with self._lock:
+            self._delete(key)
+
+    def close(self):
+        with self._lock:
+            if self._conn and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+_response_cache = None
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    获取 setting.RESPONSE_CACHE 指定的response缓存，进程内单例
+    """
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = tools.import_cls(setting.RESPONSE_CACHE)()
+
+    return _response_cache
@@ -8,6 +8,7 @@ Created on 2018-10-08 15:33:37
 @email:  boris_liu@foxmail.com
 """
 import re
+from urllib.parse import urljoin, urlsplit
 
 import parsel
 import six
@@ -17,6 +18,79 @@ from parsel import SelectorList as ParselSelectorList
 from parsel import selector
 from w3lib.html import replace_entities as w3lib_replace_entities
 
+from beapder.utils.log import log
+
+# 需要转为绝对链接的 标签: 属性
+LINK_ATTRS = {"a": "href", "img": "src", "link": "href", "script": "src"}
+
+# 一次匹配上述标签的链接属性，分组为 (标签开头至引号, 引号, 链接)
+LINK_PATTERN = re.compile(
+    r"""(<(?:(?:a|link)(?:\s[^>]*?)?\shref|(?:img|script)(?:\s[^>]*?)?\ssrc)\s*=\s*(["']))(.*?)\2""",
+    re.S | re.I,
+)
+
+
+class AbsoluteLinks:
+    """
+    将链接转为绝对链接，base_url 只解析一次，常见的链接形式不调用 urljoin
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url or ""
+        base = urlsplit(self.base_url)
+        self._scheme = base.scheme
+        self._origin = (
+            "{}://{}".format(base.scheme, base.netloc)
+            if base.scheme and base.netloc
+            else None
+        )
+        # base_url 所在的目录，相对路径直接拼接
+        self._directory = "{}{}".format(
+            self._origin, base.path[: base.path.rfind("/") + 1] or "/"
+        )
+
+    def __call__(self, link):
+        link = link.strip()
+        if link.startswith(("http://", "https://")):
+            return link
+
+        if self._origin:
+            if link.startswith("//"):
+                return self._scheme + ":" + link
+            # 含 ./ ../ 的路径需要urljoin处理
+            if "/." not in link:
+                if link.startswith("/"):
+                    return self._origin + link
+                # 如 a/b.html，不含 ?a=1、#a、.、javascript: 等
+                if (
+                    link
+                    and link[0] not in "?#."
+                    and ":" not in link.split("/", 1)[0]
+                ):
+                    return self._directory + link
+
+        try:
+            return urljoin(self.base_url, link)
+        except Exception as e:
+            log.error(
+                "Invalid URL <{}> can't make absolute_link. exception: {}".format(
+                    link, e
+                )
+            )
+            return link
+
+    def sub(self, text):
+        """
+        将html中a、link标签的href及img、script标签的src转为绝对链接
+        """
+        return LINK_PATTERN.sub(self._replace, text)
+
+    def _replace(self, match):
+        link = match.group(3)
+        if not link:
+            return match.group(0)
+        return match.group(1) + self(link) + match.group(2)
+
 
 def extract_regex(regex, text, replace_entities=True, flags=0):
     """Extract a list of unicode strings from the given text/encoding using the following policies:
@@ -65,7 +139,8 @@ def create_root_node(text, parser_cls, base_url=None):
     return root
 
 
-if parsel.__version__ < "1.7.0":
+# 版本号按数字比较，字符串比较时 "1.10.0" < "1.7.0"
+if tuple(map(int, parsel.__version__.split(".")[:2])) < (1, 7):
     selector.create_root_node = create_root_node
 
 
@@ -155,3 +230,29 @@ class Selector(ParselSelector):
         return extract_regex(
             regex, self.get(), replace_entities=replace_entities, flags=flags
         )
+
+
+class AbsoluteLinksSelector(Selector):
+    """
+    选取结果为 a、link 的href 或 img、script 的src 时，转为绝对链接，不修改网页源码
+    需指定 base_url，如 AbsoluteLinksSelector(text, base_url=url)
+    """
+
+    # 选取的属性值可取到所在的元素及属性名
+    _lxml_smart_strings = True
+
+    def xpath(self, query, namespaces=None, **kwargs):
+        result = super(AbsoluteLinksSelector, self).xpath(query, namespaces, **kwargs)
+        for sel in result:
+            root = sel.root
+            if not getattr(root, "is_attribute", False):
+                continue
+
+            element = root.getparent()
+            if (
+                element is not None
+                and LINK_ATTRS.get(element.tag) == root.attrname
+                and element.base
+            ):
+                sel.root = AbsoluteLinks(element.base)(root)
+        return result
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 条件请求的校验信息存储。按request指纹记录上次响应的 ETag、Last-Modified，重新抓取时携带
+          If-None-Match、If-Modified-Since，页面未修改时服务器返回304，不再下载及解析响应体
+---------
+@author: pikadoramon
+"""
+
+import os
+import sqlite3
+import threading
+
+from beapder.utils.load_settings import LoadSettings
+
+setting = LoadSettings()
+import beapder.utils.tools as tools
+from beapder.db.redisdb import RedisDB
+
+
+class ValidatorStore:
+    """
+    校验信息存储基类，校验信息为 (etag, last_modified)，没有的项为None
+    """
+
+    def __init__(self, redis_key):
+        self._redis_key = redis_key
+
+    def get(self, fingerprint):
+        """
+        @return: (etag, last_modified)，无记录时返回None
+        """
+        raise NotImplementedError
+
+    def set(self, fingerprint, etag=None, last_modified=None):
+        raise NotImplementedError
+
+    def delete(self, fingerprint):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class RedisValidatorStore(ValidatorStore):
+    """
+    存于redis的hash表 TAB_VALIDATORS，field为request指纹，value为 etag\\nlast_modified
+    """
+
+    SEP = "\n"
+
+    def __init__(self, redis_key, redisdb=None):
+        super(RedisValidatorStore, self).__init__(redis_key)
+        self._redisdb = redisdb or RedisDB()
+        self._tab_validators = setting.TAB_VALIDATORS.format(redis_key=redis_key)
+
+    def get(self, fingerprint):
+        value = self._redisdb.hget(self._tab_validators, fingerprint)
+        if not value:
+            return None
+
+        etag, _, last_modified = value.partition(self.SEP)
+        return etag or None, last_modified or None
+
+    def set(self, fingerprint, etag=None, last_modified=None):
+        self._redisdb.hset(
+            self._tab_validators,
+            fingerprint,
+            (etag or "") + self.SEP + (last_modified or ""),
+        )
+
+    def delete(self, fingerprint):
+        self._redisdb.hdel(self._tab_validators, fingerprint)
+
+
+class SqliteValidatorStore(ValidatorStore):
+    """
+    存于本地sqlite文件 CONDITIONAL_REQUEST_STORE_PATH，不同爬虫按 redis_key 区分
+    """
+
+    def __init__(self, redis_key, path=None):
+        super(SqliteValidatorStore, self).__init__(redis_key)
+        self._path = path or setting.CONDITIONAL_REQUEST_STORE_PATH
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    @property
+    def conn(self):
+        # 多进程时各进程使用各自的连接
+        if self._pid != os.getpid():
+            dirname = os.path.dirname(self._path)
+            if dirname:
+                os.makedirs(dirname, exist_ok=True)
+
+            conn = sqlite3.connect(self._path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS validators (
+                    redis_key TEXT,
+                    fingerprint TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    PRIMARY KEY (redis_key, fingerprint)
+                ) WITHOUT ROWID
+                """
+            )
+            conn.commit()
+
+            self._conn = conn
+            self._pid = os.getpid()
+
+        return self._conn
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified FROM validators WHERE redis_key = ? AND fingerprint = ?",
+                (self._redis_key, fingerprint),
+            ).fetchone()
+
+    def set(self, fingerprint, etag=None, last_modified=None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO validators VALUES (?, ?, ?, ?)",
+                (self._redis_key, fingerprint, etag, last_modified),
+            )
+            self.conn.commit()
+
+    def delete(self, fingerprint):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM validators WHERE redis_key = ? AND fingerprint = ?",
+                (self._redis_key, fingerprint),
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._pid = None
+
+
+_validator_stores = {}
+_validator_stores_lock = threading.Lock()
+
+
+def get_validator_store(redis_key) -> ValidatorStore:
+    """
+    获取 setting.CONDITIONAL_REQUEST_STORE 指定的校验信息存储，每个redis_key一个实例
+    """
+    store = _validator_stores.get(redis_key)
+    if store is None:
+        with _validator_stores_lock:
+            store = _validator_stores.get(redis_key)
+            if store is None:
+                store = tools.import_cls(setting.CONDITIONAL_REQUEST_STORE)(redis_key)
+                _validator_stores[redis_key] = store
+
+    return store
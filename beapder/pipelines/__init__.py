@@ -15,8 +15,12 @@ from typing import Dict, List, Tuple
 class BasePipeline(metaclass=abc.ABCMeta):
     """
     pipeline 是单线程的，批量保存数据的操作，不建议在这里写网络请求代码，如下载图片等
+    thread_safe 为 True 时，不同表的数据会在导出线程池中并发调用 save_items/update_items
     """
 
+    # 是否可被多个线程同时调用
+    thread_safe = False
+
     @abc.abstractmethod
     def save_items(self, table, items: List[Dict]) -> bool:
         """
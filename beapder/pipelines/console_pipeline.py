@@ -18,6 +18,8 @@ class ConsolePipeline(BasePipeline):
     pipeline 是单线程的，批量保存数据的操作，不建议在这里写网络请求代码，如下载图片等
     """
 
+    thread_safe = True
+
     def save_items(self, table, items: List[Dict]) -> bool:
         """
         保存数据
@@ -15,6 +15,8 @@ from beapder.utils.log import log
 
 
 class MongoPipeline(BasePipeline):
+    thread_safe = True  # 连接池 线程安全
+
     def __init__(self):
         self._to_db = None
 
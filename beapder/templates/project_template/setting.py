@@ -38,21 +38,55 @@
 #
 # # 爬虫相关
 # # COLLECTOR
-# COLLECTOR_TASK_COUNT = 32  # 每次获取任务数量，追求速度推荐32
+# # 本地任务队列最多缓存的任务数（高水位）。低于低水位（SPIDER_THREAD_COUNT）时补充任务，单次获取数量根据消费速度自适应
+# COLLECTOR_TASK_COUNT = 32  # 每次获取任务的最大数量，追求速度推荐32
+#
+# # request在redis中的编解码器，可自定义，需继承 beapder.network.request_codec.RequestCodec
+# # 老版本 str(request.to_dict) 格式的任务会被自动识别，并在取出时迁移为当前格式
+# REQUEST_CODEC = "beapder.network.request_codec.MsgpackRequestCodec"
+# # REQUEST_CODEC = "beapder.network.request_codec.ReprRequestCodec"
+#
+# # 分布式任务队列，可自定义，需继承 beapder.core.task_queue.TaskQueue
+# TASK_QUEUE = "beapder.core.task_queue.ZSetTaskQueue"  # 有序集合
+# # TASK_QUEUE = "beapder.core.task_queue.StreamTaskQueue"  # Redis Streams 消费组，需要redis>=6.2
+# # TASK_QUEUE = "beapder.core.task_queue.ShardedZSetTaskQueue"  # 分片的有序集合，适用于大量进程消费同一个爬虫的任务
+# # StreamTaskQueue 的优先级分级，priority <= 分级值的任务存入对应的stream，大于最后一个值的存入最后一个stream，越靠前越先下发
+# TASK_QUEUE_STREAM_PRIORITY_LEVELS = [100, 300]
+# # ShardedZSetTaskQueue 的分片数及分片依据 fingerprint（request指纹，分布均匀）或 domain（同域名的任务在同一分片）
+# TASK_QUEUE_SHARD_COUNT = 8
+# TASK_QUEUE_SHARD_BY = "fingerprint"
 #
 # # SPIDER
 # SPIDER_THREAD_COUNT = 1  # 爬虫并发数，追求速度推荐32
-# # 下载时间间隔 单位秒。 支持随机 如 SPIDER_SLEEP_TIME = [2, 5] 则间隔为 2~5秒之间的随机数，包含2和5
+# # 爬虫进程数，大于1时另起子进程解析，每个进程 SPIDER_THREAD_COUNT 个线程。适用于解析耗CPU的爬虫，需要系统支持fork
+# SPIDER_PROCESS_COUNT = 1
+# # 下载时间间隔 单位秒，间隔期间线程阻塞，限速推荐使用 DOMAIN_DOWNLOAD_DELAY。 支持随机 如 SPIDER_SLEEP_TIME = [2, 5] 则间隔为 2~5秒之间的随机数，包含2和5
 # SPIDER_SLEEP_TIME = 0
+# # 按域名（或代理）调度下载，所在域名不可下载的任务暂存，线程先处理其他域名的任务，不阻塞等待。以下均未开启时不调度
+# DOMAIN_CONCURRENT_REQUESTS = 0  # 同一域名同时下载的请求数，0为不限制
+# DOMAIN_DOWNLOAD_DELAY = 0  # 同一域名两次下载的最小间隔 单位毫秒
+# DOMAIN_SLOT_BY = "domain"  # 限速依据 domain：域名；proxy：request指定的代理，未指定代理时按域名
+# # 根据响应延迟自动调整各域名的下载间隔，间隔不小于 DOMAIN_DOWNLOAD_DELAY
+# AUTOTHROTTLE_ENABLE = False
+# AUTOTHROTTLE_START_DELAY = 5000  # 初始下载间隔 毫秒
+# AUTOTHROTTLE_MAX_DELAY = 60000  # 最大下载间隔 毫秒
+# AUTOTHROTTLE_TARGET_CONCURRENCY = 1  # 期望每个域名平均同时进行的请求数
 # SPIDER_MAX_RETRY_TIMES = 10  # 每个请求最大重试次数
 # KEEP_ALIVE = False  # 爬虫是否常驻
 
 # 下载
-# DOWNLOADER = "beapder.network.downloader.RequestsDownloader"
+# DOWNLOADER = "beapder.network.downloader.RequestsPooledDownloader"  # 复用连接，不保存cookie
+# # DOWNLOADER = "beapder.network.downloader.RequestsDownloader"  # 每个请求新建连接
 # SESSION_DOWNLOADER = "beapder.network.downloader.RequestsSessionDownloader"
 # RENDER_DOWNLOADER = "beapder.network.downloader.SeleniumDownloader"
 # # RENDER_DOWNLOADER="beapder.network.downloader.PlaywrightDownloader"
-# MAKE_ABSOLUTE_LINKS = True  # 自动转成绝对连接
+# # 下载方式 thread：每个线程同步下载；asyncio：事件循环异步下载，SPIDER_THREAD_COUNT 为解析线程数，需要 pip install "beapder[async]"
+# DOWNLOAD_ENGINE = "thread"
+# ASYNC_DOWNLOADER = "beapder.network.downloader.AiohttpDownloader"
+# ASYNC_CONCURRENT_REQUESTS = 1000  # 异步下载时同时进行的请求数
+# MAKE_ABSOLUTE_LINKS = True  # 自动转成绝对连接，为 "selector" 时不修改网页源码，只转换xpath、css选取到的链接
+# RESPONSE_MAX_BODY_SIZE = 0  # 响应体最大字节数，超过时中止下载并抛出 ResponseTooLarge，0为不限制
+# RESPONSE_ENCODING_DETECT_SIZE = 65536  # 猜测编码时使用的响应体字节数，响应体未读取时只预读这部分
 
 # # 浏览器渲染
 # WEBDRIVER = dict(
@@ -110,17 +144,33 @@
 # ITEM_UPLOAD_BATCH_MAX_SIZE = 1000
 # # item入库时间间隔
 # ITEM_UPLOAD_INTERVAL = 1
+# # item导出线程数，不同pipeline、不同表的数据并发导出；未声明thread_safe的pipeline同一时间只导出一个表。1为依次导出
+# ITEM_EXPORT_THREAD_COUNT = 4
 # # 内存任务队列最大缓存的任务数，默认不限制；仅对AirSpider有效。
 # TASK_MAX_CACHED_SIZE = 0
 #
-# # 下载缓存 利用redis缓存，但由于内存大小限制，所以建议仅供开发调试代码时使用，防止每次debug都需要网络请求
+# # 下载缓存 默认利用redis缓存，但由于内存大小限制，所以建议仅供开发调试代码时使用，防止每次debug都需要网络请求
 # RESPONSE_CACHED_ENABLE = False  # 是否启用下载缓存 成本高的数据或容易变需求的数据，建议设置为True
-# RESPONSE_CACHED_EXPIRE_TIME = 3600  # 缓存时间 秒
+# RESPONSE_CACHED_EXPIRE_TIME = 3600  # 缓存时间 秒，0为不过期
 # RESPONSE_CACHED_USED = False  # 是否使用缓存 补采数据时可设置为True
+# RESPONSE_CACHE = "beapder.network.response_cache.RedisResponseCache"
+# # RESPONSE_CACHE = "beapder.network.response_cache.SqliteResponseCache"  # 本地文件，适用于回放大量的响应
+# RESPONSE_CACHE_COMPRESSION = "gzip"  # 压缩方式 gzip、zstd（需安装zstandard），空字符串为不压缩
+# RESPONSE_CACHE_PATH = "response_cache.db"  # SqliteResponseCache 的文件路径
+# RESPONSE_CACHE_MAX_SIZE = 1024 * 1024 * 1024  # SqliteResponseCache 最大占用的字节数，超过时淘汰最久未使用的缓存，0为不限制
+#
+# # 条件请求 重新抓取时携带上次响应的ETag、Last-Modified，页面未修改时服务器返回304，交由parser的not_modified处理，默认不解析
+# # 同时开启 RESPONSE_CACHED_ENABLE 时，只在有缓存时发送条件请求，304的响应替换为缓存的响应，缓存过期后重新下载完整的响应
+# CONDITIONAL_REQUEST_ENABLE = False
+# CONDITIONAL_REQUEST_STORE = "beapder.network.validator_store.RedisValidatorStore"  # redis的hash表
+# # CONDITIONAL_REQUEST_STORE = "beapder.network.validator_store.SqliteValidatorStore"  # 本地sqlite文件
+# CONDITIONAL_REQUEST_STORE_PATH = "validators.db"  # SqliteValidatorStore 的文件路径
 #
 # # 设置代理
 # PROXY_EXTRACT_API = None  # 代理提取API ，返回的代理分割符为\r\n
 # PROXY_ENABLE = True
+# PROXY_BAN_STATUS_CODES = [403, 407, 429]  # 视为代理被封的响应状态码，被封的代理降低被选中的概率
+# PROXY_STATS_SHARE = False  # 代理的成功率、耗时等统计是否通过redis在多进程间共享，由代理池后台线程定期同步
 #
 # # 随机headers
 # RANDOM_HEADERS = True
@@ -140,6 +190,7 @@
 # REQUEST_FILTER_SETTING = dict(
 #     filter_type=3,  # 永久去重（BloomFilter） = 1 、内存去重（MemoryFilter） = 2、 临时去重（ExpireFilter）= 3、 轻量去重（LiteFilter）= 4
 #     expire_time=2592000,  # 过期时间1个月
+#     local_cache_size=0,  # 进程内缓存的已存在的request指纹数，命中的不再访问redis，0为不缓存。仅BloomFilter有效
 # )
 #
 # # 报警 支持钉钉、飞书、企业微信、邮件
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 延迟导入。渲染、influxdb、execjs、mongo、mysql、bs4 等可选的依赖导入耗时，首次使用时才导入
+---------
+@author: pikadoramon
+"""
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    首次访问属性时才导入的模块
+    如 execjs = LazyModule("execjs")，之后 execjs.compile(...) 时导入 execjs
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        if self._module is None:
+            self.__dict__["_module"] = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, item):
+        return getattr(self._load(), item)
+
+    def __repr__(self):
+        return "<lazy module {!r}>".format(self.__name__)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_attrs(package, attrs):
+    """
+    生成模块级的 __getattr__，访问 attrs 中的名称时才导入对应的模块
+    用法：__getattr__ = lazy_attrs(__name__, {"AiohttpDownloader": "._aiohttp"})
+    @param package: 所在模块名，相对导入以此为基准
+    @param attrs: {名称: 模块}
+    @return:
+    """
+
+    def __getattr__(name):
+        module = attrs.get(name)
+        if module is None:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(package, name)
+            )
+
+        value = getattr(importlib.import_module(module, package), name)
+        # 之后直接从模块取，不再经过 __getattr__
+        setattr(sys.modules[package], name, value)
+        return value
+
+    return __getattr__
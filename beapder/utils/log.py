@@ -222,6 +222,28 @@ for STOP_LOG in STOP_LOGS:
 # 日志级别大小关系为：CRITICAL > ERROR > WARNING > INFO > DEBUG
 
 
+class LazyMessage:
+    """
+    延迟生成的日志参数，日志真正输出时才调用 func 生成内容，日志级别未开启时不产生任何开销
+    用法：log.debug("datas: %s", LazyMessage(tools.dumps_json, datas, indent=16))
+    """
+
+    __slots__ = ("func", "args", "kwargs")
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+    __repr__ = __str__
+
+
+lazy = LazyMessage
+
+
 class Log:
     log = None
 
@@ -232,6 +254,12 @@ class Log:
 
         return wrapper
 
+    def is_debug(self):
+        """
+        是否输出debug日志，用于跳过只有debug时才需要的开销较大的计算
+        """
+        return self.isEnabledFor(logging.DEBUG)
+
     def __getattr__(self, name):
         # 调用log时再初始化，为了加载最新的setting
         if self.__class__.log is None:
@@ -8,14 +8,15 @@ import string
 import threading
 import time
 from collections import Counter
-from typing import Any
-
-from influxdb import InfluxDBClient
+from typing import TYPE_CHECKING, Any
 
 from beapder import setting
 from beapder.utils.log import log
 from beapder.utils.tools import aio_wrap, ensure_float, ensure_int
 
+if TYPE_CHECKING:
+    from influxdb import InfluxDBClient
+
 _inited_pid = None
 # this thread should stop running in the forked process
 _executor = concurrent.futures.ThreadPoolExecutor(
@@ -52,7 +53,7 @@ class MetricsEmitter:
         """
         self.pending_points = queue.Queue()
         self.batch_size = batch_size
-        self.influxdb: InfluxDBClient = influxdb
+        self.influxdb: "InfluxDBClient" = influxdb
         self.tagkv = {}
         self.max_timer_seq = max_timer_seq
         self.lock = threading.Lock()
@@ -375,6 +376,8 @@ def init(
     ):
         return
 
+    from influxdb import InfluxDBClient
+
     influxdb_client = InfluxDBClient(
         host=influxdb_host,
         port=influxdb_port,
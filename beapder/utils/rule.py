@@ -20,7 +20,6 @@ import re
 from urllib.parse import urlparse, urljoin
 
 import jsonpath
-from lxml.html import fromstring
 from weakref import WeakKeyDictionary
 from w3lib.url import canonicalize_url
 import logging
@@ -32,7 +31,6 @@ _re_type = type(re.compile("", 0))
 _re_url = re.compile("^(https?|ftp)://[^\s/$.?#<;:].[^\s#<;:]*$")
 
 _ITERABLE_SINGLE_VALUES = dict, str, bytes
-resp_doc_weakdict_ref = WeakKeyDictionary()
 resp_json_weakdict_ref = WeakKeyDictionary()
 
 
@@ -121,14 +119,11 @@ def _extract_links(extractor, response, values):
             if len(link) > 0:
                 links.extend(link)
     elif extractor == 'lxml':
-        if response in resp_doc_weakdict_ref:
-            doc = resp_doc_weakdict_ref[response]
-        else:
-            if response.text[:20].find("?xml") > -1:
-                logger.warning("not support xml " + response.url)
-                return links
-            doc = fromstring(response.text)
-            resp_doc_weakdict_ref[response] = doc
+        if response.text[:20].find("?xml") > -1:
+            logger.warning("not support xml " + response.url)
+            return links
+        # 与 response.selector 共用解析结果
+        doc = response.document
         for value in values:
             link = doc.xpath(value)
             link = arg_to_iter(link)
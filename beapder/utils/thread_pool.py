@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 工作线程为守护线程的线程池
+---------
+@author: pikadoramon
+"""
+
+import os
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class ThreadPool(ThreadPoolExecutor):
+    """
+    用法同 ThreadPoolExecutor
+    ThreadPoolExecutor 在主线程退出（解释器进入关闭流程）后不再接受任务，而爬虫的主线程通常在 spider.start() 后即退出，
+    后台线程中使用的线程池需用此类代替。工作线程按需创建，最多 max_workers 个
+    继承 ThreadPoolExecutor 仅为了可作为事件循环的默认executor
+    """
+
+    def __init__(self, max_workers=None, thread_name_prefix="thread_pool"):
+        self._max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._thread_name_prefix = thread_name_prefix
+        self._work_queue = queue.SimpleQueue()
+        self._idle_semaphore = threading.Semaphore(0)
+        self._threads = []
+        self._shutdown = False
+        self._shutdown_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        with self._shutdown_lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+
+            future = Future()
+            self._work_queue.put((future, fn, args, kwargs))
+
+            # 没有空闲的线程时新建
+            if (
+                not self._idle_semaphore.acquire(timeout=0)
+                and len(self._threads) < self._max_workers
+            ):
+                thread = threading.Thread(
+                    target=self._worker,
+                    name="{}_{}".format(self._thread_name_prefix, len(self._threads)),
+                    daemon=True,
+                )
+                thread.start()
+                self._threads.append(thread)
+
+            return future
+
+    def _worker(self):
+        while True:
+            work_item = self._work_queue.get()
+            if work_item is None:
+                return
+
+            future, fn, args, kwargs = work_item
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = fn(*args, **kwargs)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+
+            del work_item, future
+            self._idle_semaphore.release()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        with self._shutdown_lock:
+            self._shutdown = True
+            for _ in self._threads:
+                self._work_queue.put(None)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
@@ -46,7 +46,6 @@ from beapder.utils.load_settings import LoadSettings
 setting = LoadSettings()
 
 from beapder.db.redisdb import RedisDB
-from beapder.utils.email_sender import EmailSender
 from beapder.utils.log import log
 from beapder.utils.decorators import (LazyProperty,
                                       Singleton,
@@ -55,10 +54,9 @@ from beapder.utils.decorators import (LazyProperty,
                                       func_timeout,
                                       log_function_time,
                                       run_safe_model)
-try:
-    import execjs  # pip install PyExecJS
-except Exception as e:
-    pass
+from beapder.utils.lazy_import import LazyModule
+
+execjs = LazyModule("execjs")  # pip install PyExecJS，使用时才导入
 
 os.environ["EXECJS_RUNTIME"] = "Node"  # 设置使用node执行js
 
@@ -2361,6 +2359,8 @@ def email_warning(
     if isinstance(email_receiver, str):
         email_receiver = [email_receiver]
 
+    from beapder.utils.email_sender import EmailSender
+
     with EmailSender(
             username=email_sender, password=email_password, smtpserver=email_smtpserver
     ) as email:
@@ -2606,6 +2606,19 @@ def ensure_float(n):
     return float(n)
 
 
+def ewma(average, value, alpha=0.3):
+    """
+    指数加权移动平均
+    >>> ewma(0, 10)
+    10
+    >>> ewma(10, 20, alpha=0.5)
+    15.0
+    """
+    if not average:
+        return value
+    return alpha * value + (1 - alpha) * average
+
+
 def import_cls(cls_info):
     module, class_name = cls_info.rsplit(".", 1)
     cls = importlib.import_module(module).__getattribute__(class_name)
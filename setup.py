@@ -51,6 +51,7 @@ requires = [
     "influxdb>=5.3.1",
     "pyperclip>=1.8.2",
     "terminal-layout>=2.1.3",
+    "msgpack>=1.0.0",
 ]
 
 render_requires = [
@@ -59,12 +60,17 @@ render_requires = [
     "selenium>=3.141.0",
 ]
 
+async_requires = [
+    "aiohttp>=3.8.0",
+]
+
 all_requires = [
     "bitarray>=1.5.3",
+    "numpy>=1.16.0",
     "PyExecJS>=1.5.1",
     "pymongo>=3.10.1",
     "redis-py-cluster>=2.1.0",
-] + render_requires
+] + render_requires + async_requires
 
 setuptools.setup(
     name="beapder",
@@ -77,7 +83,11 @@ setuptools.setup(
     long_description=long_description,
     long_description_content_type="text/markdown",
     install_requires=requires,
-    extras_require={"all": all_requires, "render": render_requires},
+    extras_require={
+        "all": all_requires,
+        "render": render_requires,
+        "async": async_requires,
+    },
     entry_points={"console_scripts": ["beapder = beapder.commands.cmdline:execute"]},
     url="https://github.com/pikadoramon/beapder.git",
     packages=packages,
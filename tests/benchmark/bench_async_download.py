@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: AirSpider 同步下载（RequestsDownloader，每个并发一个线程） 与 asyncio异步下载（AiohttpDownloader） 的对比
+          本地aiohttp服务每个请求延迟 SERVER_DELAY 秒返回，模拟慢速站点，两种方式均为 CONCURRENCY 个并发
+          需要 pip install "beapder[async]"
+          python tests/benchmark/bench_async_download.py
+---------
+@author: pikadoramon
+"""
+
+import asyncio
+import multiprocessing
+import resource
+import threading
+import time
+
+from aiohttp import web
+
+import beapder
+from beapder.utils.load_settings import LoadSettings
+
+REQUEST_COUNT = 5000
+CONCURRENCY = 1000
+SERVER_DELAY = 0.1
+PORT = 18765
+HTML = "<html><head><title>bench</title></head><body>{}</body></html>".format(
+    "<p>hello</p>" * 100
+)
+
+
+def run_server():
+    async def handle(request):
+        await asyncio.sleep(SERVER_DELAY)
+        return web.Response(text=HTML, content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/{page}", handle)
+    web.run_app(app, port=PORT, backlog=4096, print=None, access_log=None)
+
+
+class BenchSpider(beapder.AirSpider):
+    def start_requests(self):
+        for i in range(REQUEST_COUNT):
+            yield beapder.Request("http://127.0.0.1:%s/%s" % (PORT, i))
+
+    def validate(self, request, response):
+        if response.status_code != 200:
+            raise Exception("response code not 200")
+
+    def parse(self, request, response):
+        self.count += 1
+        self.max_threads = max(self.max_threads, threading.active_count())
+
+
+def bench(engine, result_queue):
+    BenchSpider.__custom_setting__ = dict(
+        DOWNLOAD_ENGINE=engine,
+        ASYNC_CONCURRENT_REQUESTS=CONCURRENCY,
+        TASK_MAX_CACHED_SIZE=REQUEST_COUNT,
+        PROXY_ENABLE=False,
+        SPIDER_MAX_RETRY_TIMES=0,
+        LOG_LEVEL="INFO",
+    )
+    # 同步下载时每个并发一个线程，异步下载时为解析线程数
+    settings = LoadSettings()
+    settings.update(
+        "SPIDER_THREAD_COUNT", CONCURRENCY if engine == "thread" else 4, "instance"
+    )
+    spider = BenchSpider.from_settings(settings)
+    spider.count = spider.max_threads = 0
+
+    start = time.time()
+    spider.start()
+    spider.join()
+    cost = time.time() - start - 3  # 减去 all_thread_is_done 的3秒检查时间
+
+    result_queue.put(
+        (
+            spider.count,
+            cost,
+            spider.max_threads,
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        )
+    )
+
+
+def main():
+    server = multiprocessing.Process(target=run_server, daemon=True)
+    server.start()
+    time.sleep(1)
+
+    print(
+        "requests={} concurrency={} server_delay={}s".format(
+            REQUEST_COUNT, CONCURRENCY, SERVER_DELAY
+        )
+    )
+    print(
+        "{:<10}{:>10}{:>12}{:>10}{:>12}".format(
+            "engine", "done", "req/s", "threads", "max rss MB"
+        )
+    )
+    for engine in ("thread", "asyncio"):
+        result_queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=bench, args=(engine, result_queue))
+        process.start()
+        count, cost, max_threads, max_rss = result_queue.get()
+        process.join()
+        print(
+            "{:<10}{:>10}{:>12.0f}{:>10}{:>12.1f}".format(
+                engine, count, count / cost, max_threads, max_rss
+            )
+        )
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
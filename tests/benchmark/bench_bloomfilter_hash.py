@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 布隆过滤器批量计算偏移量的性能对比 逐个key计算 与 numpy批量计算，及哈希格式版本1、2
+          内存位数组无需依赖，redis位数组需本地redis: python tests/benchmark/bench_bloomfilter_hash.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder.db.redisdb import RedisDB
+from beapder.dedup import bloomfilter
+from beapder.dedup.bloomfilter import BloomFilter, make_batch_hashfuncs
+from beapder.utils.tools import get_md5
+
+REDIS_URL = "redis://localhost:6379/0"
+NAME = "bench_bloomfilter_hash"
+BATCH_SIZE = 10000
+BATCH_COUNT = 5
+CAPACITY = 10000000
+ERROR_RATE = 0.00001
+
+
+def make_keys(batch):
+    return [
+        get_md5("https://www.example.com/detail/{}/{}".format(batch, i))
+        for i in range(BATCH_SIZE)
+    ]
+
+
+def use_numpy(enable):
+    bloomfilter._numpy = None if enable else False
+
+
+def bench_hash(version, vectorized, batches):
+    use_numpy(vectorized)
+    bloom_filter = BloomFilter(CAPACITY, ERROR_RATE, BloomFilter.BASE_MEMORY)
+    make_offsets = make_batch_hashfuncs(
+        bloom_filter.num_slices, bloom_filter.bits_per_slice, version
+    )
+    start = time.perf_counter()
+    for keys in batches:
+        make_offsets(keys)
+    return BATCH_SIZE * len(batches) / (time.perf_counter() - start)
+
+
+def bench_add(bitarray_type, version, vectorized, batches):
+    use_numpy(vectorized)
+    bloom_filter = BloomFilter(
+        CAPACITY, ERROR_RATE, bitarray_type, NAME, REDIS_URL, hash_version=version
+    )
+    start = time.perf_counter()
+    for keys in batches:
+        bloom_filter.add(keys)
+    return BATCH_SIZE * len(batches) / (time.perf_counter() - start)
+
+
+def clear():
+    RedisDB(url=REDIS_URL).clear([NAME, NAME + "_hash_version"])
+
+
+def main():
+    if not bloomfilter._import_numpy():
+        print("numpy 未安装，只测试逐个key计算")
+
+    batches = [make_keys(i) for i in range(BATCH_COUNT)]
+    cases = [(1, False), (1, True), (2, False), (2, True)]
+
+    print("{:<24}{:>16}".format("hash", "keys/s"))
+    for version, vectorized in cases:
+        print(
+            "{:<24}{:>16.0f}".format(
+                "v{} {}".format(version, "numpy" if vectorized else "python"),
+                bench_hash(version, vectorized, batches),
+            )
+        )
+
+    print()
+    print("{:<24}{:>16}{:>16}".format("add", "memory keys/s", "redis keys/s"))
+    for version, vectorized in cases:
+        memory = bench_add(BloomFilter.BASE_MEMORY, version, vectorized, batches)
+        clear()
+        redis = bench_add(BloomFilter.BASE_REDIS, version, vectorized, batches[:1])
+        clear()
+        print(
+            "{:<24}{:>16.0f}{:>16.0f}".format(
+                "v{} {}".format(version, "numpy" if vectorized else "python"),
+                memory,
+                redis,
+            )
+        )
+
+    use_numpy(True)
+
+
+if __name__ == "__main__":
+    main()
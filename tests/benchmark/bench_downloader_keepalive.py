@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 本地TLS服务下 RequestsDownloader（每个请求新建连接） 与 RequestsPooledDownloader（复用连接） 的吞吐及延迟
+          python tests/benchmark/bench_downloader_keepalive.py
+---------
+@author: pikadoramon
+"""
+
+import datetime
+import os
+import ssl
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+
+from beapder import Request
+from beapder.network.downloader import RequestsDownloader, RequestsPooledDownloader
+
+THREAD_COUNT = 8
+REQUEST_COUNT = 2000
+BODY = b"<html><body>" + b"<p>hello</p>" * 200 + b"</body></html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_cert(cert_dir):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.utcnow()
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+
+    cert_file = os.path.join(cert_dir, "cert.pem")
+    key_file = os.path.join(cert_dir, "key.pem")
+    with open(cert_file, "wb") as f:
+        f.write(cert.public_bytes(serialization.Encoding.PEM))
+    with open(key_file, "wb") as f:
+        f.write(
+            key.private_bytes(
+                serialization.Encoding.PEM,
+                serialization.PrivateFormat.TraditionalOpenSSL,
+                serialization.NoEncryption(),
+            )
+        )
+    return cert_file, key_file
+
+
+def start_server(cert_dir):
+    cert_file, key_file = make_cert(cert_dir)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert_file, key_file)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch(downloader, url):
+    request = Request(url, proxies={})
+    request.make_requests_kwargs()
+
+    start = time.perf_counter()
+    response = downloader.download(request)
+    response.content
+    response.close()
+    return time.perf_counter() - start
+
+
+def bench(downloader, url):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREAD_COUNT) as executor:
+        latencies = sorted(executor.map(lambda _: fetch(downloader, url), range(REQUEST_COUNT)))
+    cost = time.perf_counter() - start
+    return (
+        REQUEST_COUNT / cost,
+        latencies[len(latencies) // 2] * 1000,
+        latencies[int(len(latencies) * 0.99)] * 1000,
+    )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as cert_dir:
+        server = start_server(cert_dir)
+        url = "https://127.0.0.1:%s/" % server.server_port
+
+        print("requests={} threads={}".format(REQUEST_COUNT, THREAD_COUNT))
+        print("{:<28}{:>10}{:>10}{:>10}".format("downloader", "req/s", "p50 ms", "p99 ms"))
+        for downloader in (RequestsDownloader(), RequestsPooledDownloader()):
+            print(
+                "{:<28}{:>10.0f}{:>10.2f}{:>10.2f}".format(
+                    downloader.__class__.__name__, *bench(downloader, url)
+                )
+            )
+
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
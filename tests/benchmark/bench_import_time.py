@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: import beapder 的启动耗时，每次在新的子进程中导入，取中位数，并列出累计耗时最多的模块
+          python tests/benchmark/bench_import_time.py [次数]
+---------
+@author: pikadoramon
+"""
+
+import statistics
+import subprocess
+import sys
+
+ROUNDS = 10
+TOP = 15
+
+# 可选的依赖，只有使用到对应功能时才应导入
+HEAVY_MODULES = (
+    "scrapy",
+    "twisted",
+    "aiohttp",
+    "influxdb",
+    "execjs",
+    "pymongo",
+    "pymysql",
+    "MySQLdb",
+    "bs4",
+    "selenium",
+    "playwright",
+)
+
+TIMER = """
+import sys, time
+start = time.perf_counter()
+import beapder
+cost = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(cost, ",".join(heavy))
+""".format(
+    heavy=HEAVY_MODULES
+)
+
+
+def import_cost():
+    output = subprocess.check_output([sys.executable, "-c", TIMER], text=True)
+    cost, _, heavy = output.strip().partition(" ")
+    return float(cost), heavy
+
+
+def import_profile():
+    """
+    -X importtime 的结果，按累计耗时排序
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import beapder"],
+        stderr=subprocess.PIPE,
+        text=True,
+    ).stderr
+
+    modules = []
+    # import time:  self [us] | cumulative | imported package
+    for line in output.splitlines()[1:]:
+        self_us, cumulative_us, name = line.split(":", 1)[1].split("|")
+        modules.append((int(cumulative_us), int(self_us), name.strip()))
+    return sorted(modules, reverse=True)
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else ROUNDS
+
+    costs = []
+    heavy = ""
+    for _ in range(rounds):
+        cost, heavy = import_cost()
+        costs.append(cost)
+
+    print(
+        "import beapder: median {:.1f}ms, min {:.1f}ms, max {:.1f}ms ({} rounds)".format(
+            statistics.median(costs) * 1000, min(costs) * 1000, max(costs) * 1000, rounds
+        )
+    )
+    print("heavy modules imported: {}".format(heavy or "none"))
+
+    print("\n{:>12}{:>12}  {}".format("cumulative", "self", "module"))
+    for cumulative_us, self_us, name in import_profile()[:TOP]:
+        print("{:>10.1f}ms{:>10.1f}ms  {}".format(cumulative_us / 1000, self_us / 1000, name))
+
+
+if __name__ == "__main__":
+    main()
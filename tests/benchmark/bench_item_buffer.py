@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: ItemBuffer 入库前的去重、按表分拣 及 Dedup.filter_exist_data 耗时
+          对比原 list.pop(0) 的实现与单次遍历的实现
+          python tests/benchmark/bench_item_buffer.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder import Item, setting
+from beapder.buffer.item_buffer import ItemBuffer
+from beapder.dedup import Dedup
+
+COUNTS = [1000, 10000, 100000]
+TABLE_COUNT = 4
+
+
+class NewsItem(Item):
+    pass
+
+
+def make_items(count):
+    items = []
+    for i in range(count):
+        item = NewsItem(id=i, title="title %s" % i, url="https://example.com/%s" % i)
+        item.table_name = "news_%s" % (i % TABLE_COUNT)
+        items.append(item)
+    return items
+
+
+def legacy_dedup_items(dedup, items, items_fingerprints):
+    is_exists = dedup.get(items_fingerprints)
+
+    dedup_items = []
+    dedup_items_fingerprints = []
+    while is_exists:
+        item = items.pop(0)
+        items_fingerprint = items_fingerprints.pop(0)
+        is_exist = is_exists.pop(0)
+
+        if not is_exist:
+            dedup_items.append(item)
+            dedup_items_fingerprints.append(items_fingerprint)
+
+    return dedup_items, dedup_items_fingerprints
+
+
+def legacy_pick_items(item_tables, items):
+    datas_dict = {}
+    while items:
+        item = items.pop(0)
+        item_name = item.item_name
+        table_name = item_tables.get(item_name)
+        if not table_name:
+            table_name = item.table_name
+            item_tables[item_name] = table_name
+
+        if table_name not in datas_dict:
+            datas_dict[table_name] = []
+
+        datas_dict[table_name].append(item.to_dict)
+
+    return datas_dict
+
+
+def legacy_filter_exist_data(dedup, datas, datas_fingerprints):
+    is_exists = dedup.get(datas_fingerprints)
+
+    dedup_datas = []
+    dedup_datas_fingerprints = []
+    while is_exists:
+        data = datas.pop(0)
+        is_exist = is_exists.pop(0)
+        data_fingerprint = datas_fingerprints.pop(0)
+
+        if not is_exist:
+            dedup_datas.append(data)
+            dedup_datas_fingerprints.append(data_fingerprint)
+
+    datas_fingerprints.extend(dedup_datas_fingerprints)
+    datas.extend(dedup_datas)
+    return datas, datas_fingerprints
+
+
+def timeit(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def bench(item_buffer, dedup, count):
+    items = make_items(count)
+    fingerprints = [item.fingerprint for item in items]
+
+    # 一半的数据已存在
+    dedup.dedup.datas.clear()
+    dedup.add(fingerprints[::2])
+
+    # 按表分拣时 item.table_name 在各item上，不使用缓存
+    item_buffer._item_tables.clear()
+
+    results = {}
+    results["dedup_items"] = (
+        timeit(legacy_dedup_items, dedup, list(items), list(fingerprints)),
+        timeit(item_buffer._ItemBuffer__dedup_items, list(items), list(fingerprints)),
+    )
+    results["pick_items"] = (
+        timeit(legacy_pick_items, {}, list(items)),
+        timeit(item_buffer._ItemBuffer__pick_items, list(items)),
+    )
+    results["filter_exist_data"] = (
+        timeit(legacy_filter_exist_data, dedup, list(items), list(fingerprints)),
+        timeit(
+            lambda: dedup.filter_exist_data(
+                list(items), datas_fingerprints=list(fingerprints)
+            )
+        ),
+    )
+    return results
+
+
+def main():
+    setting.ITEM_PIPELINES = ["beapder.pipelines.console_pipeline.ConsolePipeline"]
+    setting.ITEM_FILTER_ENABLE = True
+    ItemBuffer.dedup = Dedup(Dedup.LiteFilter)
+    item_buffer = ItemBuffer(redis_key="bench_item_buffer")
+
+    print(
+        "{:<20}{:>10}{:>14}{:>14}{:>10}".format(
+            "step", "items", "pop(0) s", "one pass s", "speedup"
+        )
+    )
+    for count in COUNTS:
+        for step, (legacy_cost, cost) in bench(
+            item_buffer, ItemBuffer.dedup, count
+        ).items():
+            print(
+                "{:<20}{:>10}{:>14.4f}{:>14.4f}{:>9.1f}x".format(
+                    step, count, legacy_cost, cost, legacy_cost / cost
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: ItemBuffer 多pipeline、多表导出耗时 依次导出 与 线程池并发导出
+          pipeline 每次保存固定耗时，模拟导出为瓶颈的场景
+          python tests/benchmark/bench_item_export.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder import Item, setting
+from beapder.buffer.item_buffer import ItemBuffer
+from beapder.pipelines import BasePipeline
+
+TABLE_COUNT = 4
+ITEM_COUNT = 1000
+BATCH_COUNT = 5
+SAVE_COST = 0.05  # 每次保存的耗时 秒
+
+
+class SlowMysqlPipeline(BasePipeline):
+    thread_safe = True
+
+    def save_items(self, table, items):
+        time.sleep(SAVE_COST)
+        return True
+
+
+class SlowMongoPipeline(SlowMysqlPipeline):
+    pass
+
+
+class SlowCsvPipeline(BasePipeline):
+    # 非线程安全，同一时间只导出一个表
+    def save_items(self, table, items):
+        time.sleep(SAVE_COST)
+        return True
+
+
+class NewsItem(Item):
+    pass
+
+
+def put_items(item_buffer):
+    for i in range(ITEM_COUNT):
+        item = NewsItem(id=i, title="title %s" % i)
+        item.table_name = "news_%s" % (i % TABLE_COUNT)
+        item_buffer.put_item(item)
+
+
+def bench(thread_count):
+    setting.ITEM_EXPORT_THREAD_COUNT = thread_count
+    item_buffer = ItemBuffer(redis_key="bench_item_export")
+
+    start = time.perf_counter()
+    for _ in range(BATCH_COUNT):
+        put_items(item_buffer)
+        item_buffer.flush()
+    cost = time.perf_counter() - start
+
+    stats = item_buffer.get_export_stats()
+    item_buffer.close()
+    return cost, stats
+
+
+def main():
+    setting.ITEM_PIPELINES = [
+        "__main__.SlowMysqlPipeline",
+        "__main__.SlowMongoPipeline",
+        "__main__.SlowCsvPipeline",
+    ]
+
+    print(
+        "pipelines={} tables={} batches={} save_cost={}s".format(
+            len(setting.ITEM_PIPELINES), TABLE_COUNT, BATCH_COUNT, SAVE_COST
+        )
+    )
+    print("{:<16}{:>12}{:>14}".format("threads", "cost s", "items/s"))
+    for thread_count in (1, 4, 8):
+        cost, stats = bench(thread_count)
+        print(
+            "{:<16}{:>12.3f}{:>14.0f}".format(
+                thread_count, cost, ITEM_COUNT * BATCH_COUNT / cost
+            )
+        )
+    print("export latency per pipeline:", stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: debug日志在INFO级别下的开销 立即格式化 与 LazyMessage 延迟格式化
+          模拟 ItemBuffer 每批入库时打印的 item 日志 及 每个请求下载前打印的请求日志
+          python tests/benchmark/bench_lazy_log.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+import beapder.utils.tools as tools
+from beapder import Request
+from beapder.utils.log import lazy, log
+
+BATCH_SIZES = [100, 1000, 5000]
+REPEAT = 20
+
+
+def make_datas(count):
+    return [
+        {"id": i, "title": "title %s" % i, "url": "https://example.com/%s" % i}
+        for i in range(count)
+    ]
+
+
+def eager_batch_log(table, datas):
+    log.debug(
+        """
+        -------------- item 批量入库 --------------
+        表名: %s
+        datas: %s
+            """
+        % (table, tools.dumps_json(datas, indent=16))
+    )
+
+
+def lazy_batch_log(table, datas):
+    log.debug(
+        """
+        -------------- item 批量入库 --------------
+        表名: %s
+        datas: %s
+            """,
+        table,
+        lazy(tools.dumps_json, datas, indent=16),
+    )
+
+
+def eager_request_log(request):
+    log.debug(
+        """
+            -------------- %srequest for ----------------
+            url  = %s
+            method = %s
+            args = %s
+            """
+        % (request.parser_name, request.url, request.method, request.requests_kwargs)
+    )
+
+
+def lazy_request_log(request):
+    if log.is_debug():
+        log.debug(
+            """
+                -------------- %srequest for ----------------
+                url  = %s
+                method = %s
+                args = %s
+                """,
+            request.parser_name,
+            request.url,
+            request.method,
+            request.requests_kwargs,
+        )
+
+
+def cpu_time(func, *args):
+    start = time.process_time()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.process_time() - start) / REPEAT
+
+
+def main():
+    log.setLevel("INFO")
+
+    print("{:<24}{:>10}{:>14}{:>14}".format("log", "batch", "eager ms", "lazy ms"))
+    for batch_size in BATCH_SIZES:
+        datas = make_datas(batch_size)
+        print(
+            "{:<24}{:>10}{:>14.3f}{:>14.3f}".format(
+                "item batch",
+                batch_size,
+                cpu_time(eager_batch_log, "news", datas) * 1000,
+                cpu_time(lazy_batch_log, "news", datas) * 1000,
+            )
+        )
+
+        requests = [
+            Request(
+                "https://example.com/%s" % i,
+                parser_name="BenchSpider",
+                headers={"User-Agent": "beapder"},
+                params={"page": i},
+            )
+            for i in range(batch_size)
+        ]
+        print(
+            "{:<24}{:>10}{:>14.3f}{:>14.3f}".format(
+                "request",
+                batch_size,
+                cpu_time(lambda: [eager_request_log(r) for r in requests]) * 1000,
+                cpu_time(lambda: [lazy_request_log(r) for r in requests]) * 1000,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
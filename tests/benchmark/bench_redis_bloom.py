@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: redis布隆过滤器读写位的性能对比 每个位一条SETBIT/GETBIT的pipeline、合并为BITFIELD命令、
+          打包偏移量的lua脚本 BITS_SCRIPT
+          需本地redis: python tests/benchmark/bench_redis_bloom.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder.db import redisdb
+from beapder.db.redisdb import RedisDB
+from beapder.dedup.bloomfilter import BloomFilter
+from beapder.utils.tools import get_md5
+
+REDIS_URL = "redis://localhost:6379/0"
+NAME = "bench_redis_bloom"
+BATCH_SIZE = 1000
+BATCH_COUNT = 20
+CAPACITY = 100000000
+ERROR_RATE = 0.00001
+
+
+def pipeline_setbit(redis, table, offsets, value):
+    # 旧实现：每个位一条SETBIT
+    pipe = redis.get_redis_obj().pipeline()
+    pipe.multi()
+    for offset in offsets:
+        pipe.setbit(table, offset, value)
+    return pipe.execute()
+
+
+def pipeline_getbit(redis, table, offsets):
+    pipe = redis.get_redis_obj().pipeline(transaction=False)
+    for offset in offsets:
+        pipe.getbit(table, offset)
+    return pipe.execute()
+
+
+def bitfield_setbit(redis, table, offsets, value, chunk_size=4096):
+    pipe = redis.get_redis_obj().pipeline()
+    pipe.multi()
+    for i in range(0, len(offsets), chunk_size):
+        args = []
+        for offset in offsets[i : i + chunk_size]:
+            args.extend(("SET", "u1", offset, value))
+        pipe.execute_command("BITFIELD", table, *args)
+    return [value for values in pipe.execute() for value in values]
+
+
+def bitfield_getbit(redis, table, offsets, chunk_size=4096):
+    pipe = redis.get_redis_obj().pipeline(transaction=False)
+    for i in range(0, len(offsets), chunk_size):
+        args = []
+        for offset in offsets[i : i + chunk_size]:
+            args.extend(("GET", "u1", offset))
+        pipe.execute_command("BITFIELD", table, *args)
+    return [value for values in pipe.execute() for value in values]
+
+
+def bench(func, batches):
+    start = time.perf_counter()
+    for offsets in batches:
+        func(offsets)
+    return BATCH_SIZE * len(batches) / (time.perf_counter() - start)
+
+
+def main():
+    redis = RedisDB(url=REDIS_URL)
+    bloom_filter = BloomFilter(CAPACITY, ERROR_RATE, BloomFilter.BASE_MEMORY)
+    batches = [
+        bloom_filter.make_offsets(
+            [get_md5("https://www.example.com/{}/{}".format(i, j)) for j in range(BATCH_SIZE)]
+        )
+        for i in range(BATCH_COUNT)
+    ]
+    print(
+        "batch {} keys, k={}, {} bits/batch".format(
+            BATCH_SIZE, bloom_filter.num_slices, len(batches[0])
+        )
+    )
+
+    print("{:<24}{:>12}{:>16}{:>16}".format("method", "cmds/batch", "set keys/s", "get keys/s"))
+    cases = [("pipeline", None), ("bitfield", 4096)] + [
+        ("lua", size) for size in (1024, 4096, 16384)
+    ]
+    for method, chunk_size in cases:
+        redis.clear(NAME)
+        if method == "pipeline":
+            set_func = lambda offsets: pipeline_setbit(redis, NAME, offsets, 1)
+            get_func = lambda offsets: pipeline_getbit(redis, NAME, offsets)
+            commands = len(batches[0])
+        elif method == "bitfield":
+            set_func = lambda offsets: bitfield_setbit(redis, NAME, offsets, 1)
+            get_func = lambda offsets: bitfield_getbit(redis, NAME, offsets)
+            commands = -(-len(batches[0]) // chunk_size)
+        else:
+            redisdb.BITS_SCRIPT_CHUNK_SIZE = chunk_size
+            set_func = lambda offsets: redis.setbit(NAME, offsets, 1)
+            get_func = lambda offsets: redis.getbit(NAME, offsets)
+            commands = -(-len(batches[0]) // chunk_size)
+
+        print(
+            "{:<24}{:>12}{:>16.0f}{:>16.0f}".format(
+                method if not chunk_size else "{} chunk={}".format(method, chunk_size),
+                commands,
+                bench(set_func, batches),
+                bench(get_func, batches),
+            )
+        )
+
+    redis.clear(NAME)
+
+
+if __name__ == "__main__":
+    main()
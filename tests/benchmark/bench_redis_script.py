@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: lua脚本调用方式性能对比 每次register_script 与 预计算sha的LuaScript
+          需本地redis: python tests/benchmark/bench_redis_script.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder.db.redisdb import RedisDB, TASK_LEASE_SCRIPT
+
+REDIS_URL = "redis://localhost:6379/0"
+TABLE = "bench_redis_script:z_requests"
+TASK_COUNT = 1000
+FETCH_COUNT = 1  # 取少量数据，突出脚本调用本身的开销
+DURATION = 3
+
+
+def register_per_call(redis):
+    # 旧实现：每次调用都重新注册脚本
+    cmd = redis.register_script(TASK_LEASE_SCRIPT.script)
+    return cmd(keys=[TABLE], args=["-inf", "+inf", 0, 1000, 0, FETCH_COUNT])
+
+
+def cached_script(redis):
+    return TASK_LEASE_SCRIPT(
+        redis, keys=[TABLE], args=["-inf", "+inf", 0, 1000, 0, FETCH_COUNT]
+    )
+
+
+def bench(redis, func):
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < DURATION:
+        func(redis)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    db = RedisDB.from_url(REDIS_URL)
+    db.clear(TABLE)
+    db.zadd(TABLE, ["task_{}".format(i) for i in range(TASK_COUNT)], 0)
+
+    # 直接使用redis客户端，排除RedisDB连接检测的影响
+    redis = db.get_redis_obj()
+    for name, func in (
+        ("register_script per call", register_per_call),
+        ("LuaScript (EVALSHA)", cached_script),
+    ):
+        print("{:<28}{:>12.0f} ops/s".format(name, bench(redis, func)))
+
+    db.clear(TABLE)
+
+
+if __name__ == "__main__":
+    main()
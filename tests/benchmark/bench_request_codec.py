@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: request 编解码器性能对比 str/eval 与 msgpack
+          python tests/benchmark/bench_request_codec.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder import Request
+from beapder.network.request_codec import MsgpackRequestCodec, ReprRequestCodec
+
+COUNT = 20000
+
+
+def make_requests(count):
+    return [
+        Request(
+            "https://www.example.com/list?page={}&keyword=beapder".format(i),
+            callback="parse_detail",
+            priority=i % 300,
+            headers={
+                "Referer": "https://www.example.com/",
+                "Accept-Language": "zh-CN,zh;q=0.9",
+            },
+            timeout=(5, 22),
+            page=i,
+            category="news",
+        )
+        for i in range(count)
+    ]
+
+
+def bench(codec, requests):
+    request_dicts = [request.to_dict for request in requests]
+
+    start = time.perf_counter()
+    datas = [codec.encode(request_dict) for request_dict in request_dicts]
+    encode_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for data in datas:
+        codec.loads(data)
+    decode_cost = time.perf_counter() - start
+
+    avg_bytes = sum(len(data) for data in datas) / len(datas)
+    return len(datas) / encode_cost, len(datas) / decode_cost, avg_bytes
+
+
+def main():
+    requests = make_requests(COUNT)
+
+    print("{:<24}{:>16}{:>16}{:>16}".format("codec", "encode ops/s", "decode ops/s", "bytes/request"))
+    for codec in (ReprRequestCodec(), MsgpackRequestCodec()):
+        encode_ops, decode_ops, avg_bytes = bench(codec, requests)
+        print(
+            "{:<24}{:>16.0f}{:>16.0f}{:>16.1f}".format(
+                codec.__class__.__name__, encode_ops, decode_ops, avg_bytes
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
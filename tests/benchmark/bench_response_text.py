@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: Response.text 耗时（猜测编码、转绝对链接、删除特殊字符）
+          对比原 chardet 猜测全文编码 + 4次正则替换 与 当前实现
+          python tests/benchmark/bench_response_text.py [html文件所在目录]
+          未指定目录时使用生成的网页
+---------
+@author: pikadoramon
+"""
+
+import os
+import re
+import sys
+import time
+from urllib.parse import urljoin, urlparse, urlunparse
+
+from requests.compat import chardet
+from w3lib.encoding import html_body_declared_encoding
+
+from beapder.network.response import Response
+
+ROUNDS = 3
+
+
+class LegacyResponse(Response):
+    """
+    原实现：页面编码及chardet均使用全部响应体，每个链接解析一次url，每种标签一次正则替换
+    """
+
+    def _legacy_encoding(self):
+        self._encoding = (
+            self._encoding
+            or self._headers_encoding()
+            or html_body_declared_encoding(self.content)
+            or chardet.detect(self.content)["encoding"]
+        )
+        return self._encoding
+
+    encoding = property(_legacy_encoding, Response.encoding.fset)
+
+    def _make_absolute(self, link):
+        link = link.strip()
+        parsed = urlparse(link)._asdict()
+        if not parsed["netloc"]:
+            return urljoin(self.url, link)
+        if not parsed["scheme"]:
+            parsed["scheme"] = urlparse(self.url).scheme
+            return urlunparse(parsed.values())
+        return link
+
+    def _absolute_links(self, text):
+        regexs = [
+            r'(<a.*?href\s*?=\s*?["\'])(.+?)(["\'])',
+            r'(<img.*?src\s*?=\s*?["\'])(.+?)(["\'])',
+            r'(<link.*?href\s*?=\s*?["\'])(.+?)(["\'])',
+            r'(<script.*?src\s*?=\s*?["\'])(.+?)(["\'])',
+        ]
+        for regex in regexs:
+
+            def replace_href(text):
+                return text.group(1) + self._make_absolute(text.group(2)) + text.group(3)
+
+            text = re.sub(regex, replace_href, text, flags=re.S | re.I)
+        return text
+
+
+def make_pages(count=50):
+    pages = []
+    for i in range(count):
+        links = "".join(
+            '<li><a class="item" href="/news/{0}/{1}.html">新闻标题{1}</a>'
+            '<img src="img/{1}.png"><a href="https://other.com/{1}">外链</a></li>'.format(
+                i, j
+            )
+            for j in range(300)
+        )
+        html = (
+            '<html><head><link href="/static/main.css" rel="stylesheet">'
+            '<script src="//cdn.example.com/app.js"></script><script src="../js/list.js"></script></head>'
+            "<body><ul>{}</ul></body></html>".format(links)
+        )
+        # 不声明编码，原实现需chardet猜测全文
+        pages.append(html.encode("gbk"))
+    return pages
+
+
+def load_pages(path):
+    pages = []
+    for root, _, files in os.walk(path):
+        for file in files:
+            if file.endswith((".html", ".htm")):
+                with open(os.path.join(root, file), "rb") as f:
+                    pages.append(f.read())
+    return pages
+
+
+def make_response(response_cls, page):
+    response = response_cls.from_dict(
+        {
+            "_content": page,
+            "cookies": {},
+            "encoding": None,
+            "headers": {"Content-Type": "text/html"},
+            "status_code": 200,
+            "elapsed": 0,
+            "url": "https://www.example.com/list/index.html",
+        }
+    )
+    response.make_absolute_links = True
+    return response
+
+
+def bench(response_cls, pages):
+    texts = []
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        texts = [make_response(response_cls, page).text for page in pages]
+    return (time.perf_counter() - start) / ROUNDS, texts
+
+
+def main():
+    if len(sys.argv) > 1:
+        pages = load_pages(sys.argv[1])
+        corpus = sys.argv[1]
+    else:
+        pages = make_pages()
+        corpus = "generated"
+
+    size = sum(len(page) for page in pages)
+    print("corpus={} pages={} size={:.1f}MB".format(corpus, len(pages), size / 1e6))
+
+    legacy_cost, legacy_texts = bench(LegacyResponse, pages)
+    cost, texts = bench(Response, pages)
+    diff = sum(1 for a, b in zip(legacy_texts, texts) if a != b)
+
+    print("{:<12}{:>12}{:>12}".format("impl", "cost s", "MB/s"))
+    print("{:<12}{:>12.3f}{:>12.1f}".format("legacy", legacy_cost, size / 1e6 / legacy_cost))
+    print("{:<12}{:>12.3f}{:>12.1f}".format("current", cost, size / 1e6 / cost))
+    print("speedup {:.1f}x, pages with different text {}".format(legacy_cost / cost, diff))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: ScalableBloomFilter 批量 add/get 的性能对比 旧实现（嵌套循环映射结果、每个子filter重新计算哈希）
+          与 下标映射、复用偏移量、按第一个位预筛子filter
+          内存位数组: python tests/benchmark/bench_scalable_bloomfilter.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder.dedup.bloomfilter import ScalableBloomFilter
+from beapder.utils.tools import get_md5
+
+CAPACITY = 200000
+BATCH_SIZES = (1000, 10000, 100000)
+FILTER_COUNTS = (1, 8, 32)
+# 旧实现为O(n^2)，超过该批次大小不测
+LEGACY_MAX_BATCH_SIZE = 10000
+
+
+def legacy_get(bloomfilter, keys):
+    # 旧实现
+    keys = list(keys)
+    not_exist_keys = list(set(keys))
+    for filter in reversed(bloomfilter.filters):
+        current_filter_is_exists = filter.get(not_exist_keys, to_list=True)
+        not_exist_keys = [
+            key
+            for key, is_exist in zip(not_exist_keys, current_filter_is_exists)
+            if not is_exist
+        ]
+        if not not_exist_keys:
+            break
+
+    for i, key in enumerate(keys):
+        for j, not_exist_key in enumerate(not_exist_keys):
+            if key == not_exist_key:
+                keys[i] = 0
+                not_exist_keys.pop(j)
+                break
+        else:
+            keys[i] = 1
+    return keys
+
+
+def legacy_add(bloomfilter, keys):
+    keys = list(keys)
+    not_exist_keys = list(set(keys))
+    for filter in reversed(bloomfilter.filters):
+        current_filter_is_exists = filter.get(not_exist_keys, to_list=True)
+        not_exist_keys = [
+            key
+            for key, is_exist in zip(not_exist_keys, current_filter_is_exists)
+            if not is_exist
+        ]
+        if not not_exist_keys:
+            break
+
+    if not_exist_keys:
+        bloomfilter.filters[-1].add(not_exist_keys)
+
+    for i, key in enumerate(keys):
+        for j, not_exist_key in enumerate(not_exist_keys):
+            if key == not_exist_key:
+                keys[i] = 1
+                not_exist_keys.pop(j)
+                break
+        else:
+            keys[i] = 0
+    return keys
+
+
+def make_filter(filter_count):
+    bloomfilter = ScalableBloomFilter(
+        initial_capacity=CAPACITY, bitarray_type=ScalableBloomFilter.BASE_MEMORY
+    )
+    # 每个历史子filter存入少量key
+    for i in range(filter_count - 1):
+        bloomfilter.filters[-1].add(make_keys("old{}".format(i), 100))
+        bloomfilter.filters.append(bloomfilter.create_filter())
+    return bloomfilter
+
+
+def make_keys(prefix, count):
+    return [get_md5("{}/{}".format(prefix, i)) for i in range(count)]
+
+
+def bench(func, bloomfilter, keys):
+    start = time.perf_counter()
+    func(bloomfilter, keys)
+    return len(keys) / (time.perf_counter() - start)
+
+
+def main():
+    print(
+        "{:<10}{:>8}{:>16}{:>16}{:>16}{:>16}".format(
+            "batch", "filters", "legacy add/s", "add/s", "legacy get/s", "get/s"
+        )
+    )
+    for filter_count in FILTER_COUNTS:
+        for batch_size in BATCH_SIZES:
+            # 一半为已存在的key，一半为新key，新key中有重复
+            keys = make_keys("old0", min(batch_size // 2, 100)) + make_keys(
+                "new", batch_size // 4
+            ) * 2
+            keys += make_keys("fill", batch_size - len(keys))
+
+            results = []
+            for legacy, new in (
+                (legacy_add, lambda f, k: f.add(k)),
+                (legacy_get, lambda f, k: f.get(k)),
+            ):
+                if batch_size <= LEGACY_MAX_BATCH_SIZE:
+                    results.append(bench(legacy, make_filter(filter_count), keys))
+                else:
+                    results.append(float("nan"))
+                results.append(bench(new, make_filter(filter_count), keys))
+
+            print(
+                "{:<10}{:>8}{:>16.0f}{:>16.0f}{:>16.0f}{:>16.0f}".format(
+                    batch_size, filter_count, *results
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 解析耗CPU的爬虫 单进程多线程 与 多进程 的吞吐对比， 需要本地redis
+          下载中间件直接返回本地构造的response，只考察解析的开销
+          REDISDB_IP_PORTS=localhost:6379 python tests/benchmark/bench_spider_process.py
+---------
+@author: pikadoramon
+"""
+
+import os
+import re
+import time
+
+from lxml import etree
+
+import beapder
+from beapder import Item, setting
+from beapder.db.redisdb import RedisDB
+from beapder.network.response import Response
+from beapder.pipelines import BasePipeline
+
+PAGE_COUNT = 400
+THREAD_COUNT = 4
+REDIS_KEY = "bench:spider_process"
+STAT_KEY = REDIS_KEY + ":stat"
+
+HTML = "<html><body><table>{}</table></body></html>".format(
+    "".join(
+        '<tr><td class="id">{0}</td><td><a href="/detail/{0}">title {0}</a></td>'
+        "<td>{1}</td></tr>".format(i, "price: %s.%s" % (i, i % 100))
+        for i in range(300)
+    )
+)
+
+
+class StatPipeline(BasePipeline):
+    """
+    记录入库的数量及最后一次入库的时间，各进程共用redis统计
+    """
+
+    thread_safe = True
+
+    def __init__(self):
+        self._redis = RedisDB()
+
+    def save_items(self, table, items):
+        self._redis.hincrby(STAT_KEY, "count", len(items))
+        self._redis.hset(STAT_KEY, "last_time", time.time())
+        return True
+
+
+class PageItem(Item):
+    pass
+
+
+class BenchSpider(beapder.Spider):
+    def start_requests(self):
+        for i in range(PAGE_COUNT):
+            yield beapder.Request("https://example.com/list?page=%s" % i)
+
+    def download_midware(self, request):
+        return request, Response.from_text(HTML, url=request.url)
+
+    def parse(self, request, response):
+        rows = etree.HTML(response.text).xpath("//tr")
+        total = 0
+        for row in rows:
+            price = row.xpath("./td[3]/text()")[0]
+            total += sum(float(x) for x in re.findall(r"\d+\.\d+", price))
+            row.xpath("./td/a/@href")
+
+        yield PageItem(url=request.url, row_count=len(rows), total=total)
+
+
+def bench(process_count):
+    redis = RedisDB()
+    for key in redis.getkeys(REDIS_KEY + "*"):
+        redis.clear(key)
+
+    BenchSpider.__custom_setting__ = dict(
+        SPIDER_THREAD_COUNT=THREAD_COUNT,
+        SPIDER_PROCESS_COUNT=process_count,
+        LOG_LEVEL="INFO",
+    )
+    spider = BenchSpider(redis_key=REDIS_KEY, delete_keys=True)
+
+    start = time.time()
+    spider.start()
+    spider.join()
+
+    count = int(redis.hget(STAT_KEY, "count") or 0)
+    last_time = float(redis.hget(STAT_KEY, "last_time") or start)
+    assert count == PAGE_COUNT, (count, PAGE_COUNT)
+    return count / (last_time - start)
+
+
+def main():
+    setting.ITEM_PIPELINES = ["__main__.StatPipeline"]
+    setting.ITEM_UPLOAD_INTERVAL = 0.1
+
+    cpu_count = os.cpu_count()
+    print(
+        "pages={} threads/process={} cpus={}".format(PAGE_COUNT, THREAD_COUNT, cpu_count)
+    )
+    print("{:<12}{:>12}{:>10}".format("processes", "pages/s", "scaling"))
+    base = None
+    for process_count in sorted({1, 2, 4, cpu_count}):
+        pages_per_second = bench(process_count)
+        base = base or pages_per_second
+        print(
+            "{:<12}{:>12.1f}{:>9.2f}x".format(
+                process_count, pages_per_second, pages_per_second / base
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 任务租约性能对比 逐条ZINCRBY 与 ZADD XX 批量修改分数
+          需本地redis: python tests/benchmark/bench_task_lease.py
+---------
+@author: pikadoramon
+"""
+
+import time
+
+from beapder.db.redisdb import RedisDB, LuaScript
+
+REDIS_URL = "redis://localhost:6379/0"
+TABLE = "bench_task_lease:z_requests"
+TASK_COUNT = 1000
+ROUNDS = 200
+
+# 旧实现：每个任务一条ZINCRBY
+ZINCRBY_LEASE_SCRIPT = LuaScript(
+    """
+    local datas = redis.call('zrangebyscore', KEYS[1], ARGV[1], ARGV[2], 'withscores', 'limit', 0, ARGV[4])
+    local real_datas = {}
+    for i=1, #datas, 2 do
+       table.insert(real_datas, datas[i])
+       redis.call('zincrby', KEYS[1], ARGV[3] - datas[i+1], datas[i])
+    end
+    return real_datas
+    """
+)
+
+
+def zincrby_lease(db, score):
+    return ZINCRBY_LEASE_SCRIPT(
+        db.get_redis_obj(), keys=[TABLE], args=["-inf", "+inf", score, TASK_COUNT]
+    )
+
+
+def zadd_xx_lease(db, score):
+    return db.lease_tasks(TABLE, "-inf", "+inf", score, count=TASK_COUNT, with_scores=False)
+
+
+def zadd_xx_lease_with_scores(db, score):
+    return db.lease_tasks(TABLE, "-inf", "+inf", score, count=TASK_COUNT)
+
+
+def server_usec(db):
+    # 服务端执行脚本的总耗时
+    stats = db.get_redis_obj().info("commandstats").get("cmdstat_evalsha", {})
+    return stats.get("usec", 0)
+
+
+def main():
+    db = RedisDB.from_url(REDIS_URL)
+    db.clear(TABLE)
+    db.zadd(TABLE, ["task_{}".format(i) for i in range(TASK_COUNT)], 0)
+
+    print("lease {} tasks x {} rounds".format(TASK_COUNT, ROUNDS))
+    print(
+        "{:<28}{:>14}{:>16}{:>14}".format(
+            "", "ms/lease", "server ms/lease", "tasks/s"
+        )
+    )
+    for name, func in (
+        ("ZINCRBY per task", zincrby_lease),
+        ("ZADD XX batch", zadd_xx_lease),
+        ("ZADD XX batch with scores", zadd_xx_lease_with_scores),
+    ):
+        usec = server_usec(db)
+        start = time.perf_counter()
+        for i in range(ROUNDS):
+            assert len(func(db, i)) == TASK_COUNT
+        cost = time.perf_counter() - start
+        usec = server_usec(db) - usec
+        print(
+            "{:<28}{:>14.2f}{:>16.2f}{:>14.0f}".format(
+                name,
+                cost / ROUNDS * 1000,
+                usec / ROUNDS / 1000,
+                TASK_COUNT * ROUNDS / cost,
+            )
+        )
+
+    db.clear(TABLE)
+
+
+if __name__ == "__main__":
+    main()
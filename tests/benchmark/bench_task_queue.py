@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 任务队列吞吐对比 有序集合、分片的有序集合 与 Redis Streams， 需要本地redis（>=6.2）
+          多个进程同时取任务、确认完成，模拟多个爬虫消费同一个任务队列
+          REDISDB_IP_PORTS=localhost:6379 python tests/benchmark/bench_task_queue.py
+---------
+@author: pikadoramon
+"""
+
+import multiprocessing
+import time
+
+from beapder.core.task_queue import (
+    ShardedZSetTaskQueue,
+    StreamTaskQueue,
+    ZSetTaskQueue,
+)
+from beapder.db.redisdb import RedisDB
+
+TASK_COUNT = 100000
+WORKER_COUNT = 8
+LEASE_COUNT = 32  # 每次取任务的数量，与 COLLECTOR_TASK_COUNT 一致
+PUT_BATCH = 1000
+REDIS_KEY = "bench:task_queue"
+
+
+def clear():
+    redis = RedisDB()
+    for key in redis.getkeys(REDIS_KEY + "*"):
+        redis.clear(key)
+
+
+def put_tasks(task_queue):
+    datas = [
+        b"\xc1\x01" + ("https://www.example.com/list?page=%s" % i).encode() * 4
+        for i in range(TASK_COUNT)
+    ]
+    prioritys = [300 if i % 10 else 100 for i in range(TASK_COUNT)]
+    shard_keys = [str(i) for i in range(TASK_COUNT)]
+
+    start = time.perf_counter()
+    for i in range(0, TASK_COUNT, PUT_BATCH):
+        task_queue.put(
+            datas[i : i + PUT_BATCH],
+            prioritys[i : i + PUT_BATCH],
+            shard_keys[i : i + PUT_BATCH],
+        )
+    return time.perf_counter() - start
+
+
+def consume(task_queue_cls):
+    task_queue = task_queue_cls(REDIS_KEY)
+    count = 0
+    while True:
+        tasks = task_queue.lease(LEASE_COUNT)
+        if not tasks:
+            return count
+
+        task_queue.ack([handle for handle, _ in tasks])
+        count += len(tasks)
+
+
+def bench(task_queue_cls):
+    clear()
+    put_cost = put_tasks(task_queue_cls(REDIS_KEY))
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(WORKER_COUNT) as pool:
+        counts = pool.map(consume, [task_queue_cls] * WORKER_COUNT)
+    consume_cost = time.perf_counter() - start
+
+    assert sum(counts) == TASK_COUNT, (sum(counts), TASK_COUNT)
+    clear()
+    return TASK_COUNT / put_cost, TASK_COUNT / consume_cost
+
+
+def main():
+    print(
+        "tasks={} workers={} lease_count={}".format(
+            TASK_COUNT, WORKER_COUNT, LEASE_COUNT
+        )
+    )
+    print("{:<24}{:>16}{:>20}".format("task queue", "put tasks/s", "lease+ack tasks/s"))
+    for task_queue_cls in (ZSetTaskQueue, ShardedZSetTaskQueue, StreamTaskQueue):
+        put_ops, consume_ops = bench(task_queue_cls)
+        print(
+            "{:<24}{:>16.0f}{:>20.0f}".format(
+                task_queue_cls.__name__, put_ops, consume_ops
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试布隆过滤器批量计算偏移量及哈希格式版本
+---------
+@author: pikadoramon
+"""
+
+import unittest
+
+from redis import Redis
+
+from beapder.dedup import bloomfilter
+from beapder.dedup.bloomfilter import (
+    BloomFilter,
+    make_batch_hashfuncs,
+    make_hashfuncs,
+)
+
+
+def legacy_offsets(num_slices, bits_per_slice, keys):
+    make_hashes = make_hashfuncs(num_slices, bits_per_slice)
+    offsets = []
+    for key in keys:
+        offset = 0
+        for k in make_hashes(key):
+            offsets.append(offset + k)
+            offset += bits_per_slice
+    return offsets
+
+
+class TestBatchHashfuncs(unittest.TestCase):
+    keys = ["key%s" % i for i in range(100)] + [123, "中文"]
+
+    def batch_offsets(self, num_slices, bits_per_slice, version, vectorized):
+        numpy = bloomfilter._import_numpy()
+        if vectorized and not numpy:
+            self.skipTest("numpy not installed")
+        bloomfilter._numpy = numpy if vectorized else False
+        try:
+            return make_batch_hashfuncs(num_slices, bits_per_slice, version)(self.keys)
+        finally:
+            bloomfilter._numpy = None
+
+    def test_version_1(self):
+        # 覆盖 H、I、Q 三种拆分方式
+        for bits_per_slice in (1000, 100000, 1 << 31):
+            expected = legacy_offsets(17, bits_per_slice, self.keys)
+            for vectorized in (False, True):
+                self.assertEqual(
+                    self.batch_offsets(17, bits_per_slice, 1, vectorized), expected
+                )
+
+    def test_version_2(self):
+        for bits_per_slice in (1000, 239620, 1 << 33):
+            offsets = self.batch_offsets(17, bits_per_slice, 2, False)
+            self.assertEqual(len(offsets), 17 * len(self.keys))
+            for i, offset in enumerate(offsets):
+                self.assertEqual(offset // bits_per_slice, i % 17)
+            self.assertEqual(self.batch_offsets(17, bits_per_slice, 2, True), offsets)
+
+
+class TestHashVersion(unittest.TestCase):
+    name = "test_bloomfilter_hash"
+
+    def clear(self):
+        redis = Redis.from_url("redis://@localhost:6379/0")
+        keys = redis.keys(self.name + "*")
+        if keys:
+            redis.delete(*keys)
+
+    def setUp(self):
+        self.clear()
+
+    def tearDown(self):
+        self.clear()
+
+    def test_redis_version(self):
+        bloom_filter = BloomFilter(10000, name=self.name)
+        self.assertEqual(bloom_filter.hash_version, BloomFilter.HASH_VERSION)
+        self.assertEqual(bloom_filter.add(["a", "b", "a"]), [1, 1, 0])
+        # 已记录版本的filter沿用记录的版本
+        self.assertEqual(
+            BloomFilter(10000, name=self.name, hash_version=1).hash_version,
+            BloomFilter.HASH_VERSION,
+        )
+
+        self.clear()
+        bloom_filter = BloomFilter(10000, name=self.name, hash_version=1)
+        bloom_filter.add(["a", "b"])
+        Redis.from_url("redis://@localhost:6379/0").delete(self.name + "_hash_version")
+        bloom_filter = BloomFilter(10000, name=self.name)
+        self.assertEqual(bloom_filter.hash_version, 1)
+        self.assertEqual(bloom_filter.get(["a", "b", "c"]), [1, 1, 0])
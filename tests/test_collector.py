@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试Collector自适应预取 水位、消费速率、单次取任务的数量
+---------
+@author: pikadoramon
+"""
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from beapder import Request
+from beapder.core import collector as collector_module
+from beapder.core.collector import Collector
+from beapder.network.request_codec import get_request_codec
+from beapder.utils import load_settings
+
+
+class FakeTaskQueue:
+    """
+    记录每次lease的数量，有多少给多少
+    """
+
+    def __init__(self, count=1000):
+        self.count = count
+        self.lease_sizes = []
+        self._codec = get_request_codec()
+
+    def lease(self, count):
+        self.lease_sizes.append(count)
+        count = min(count, self.count)
+        self.count -= count
+        return [
+            (
+                "handle%s" % i,
+                self._codec.dumps(Request("https://example.com/%s" % i)),
+            )
+            for i in range(count)
+        ]
+
+    def get_count(self):
+        return self.count
+
+
+class TestCollector(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(
+            load_settings._config.attr,
+            SPIDER_THREAD_COUNT=8,
+            COLLECTOR_TASK_COUNT=32,
+            DOWNLOAD_ENGINE="thread",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_collector(self, task_count=1000):
+        task_queue = FakeTaskQueue(task_count)
+        with mock.patch.object(
+            collector_module, "get_task_queue", return_value=task_queue
+        ):
+            collector = Collector("test:collector")
+        collector._Collector__init_watermark()
+        return collector, task_queue
+
+    def consume(self, collector, count):
+        for _ in range(count):
+            self.assertIsNotNone(collector.get_request())
+
+    def test_watermark(self):
+        collector, _ = self.make_collector()
+        self.assertEqual(collector.get_stats()["high_watermark"], 32)
+        self.assertEqual(collector.get_stats()["low_watermark"], 8)
+
+        # 线程数多于 COLLECTOR_TASK_COUNT 时，高水位至少能供每个线程一个任务
+        with mock.patch.dict(load_settings._config.attr, SPIDER_THREAD_COUNT=64):
+            collector, _ = self.make_collector()
+        self.assertEqual(collector.get_stats()["high_watermark"], 64)
+        self.assertEqual(collector.get_stats()["low_watermark"], 32)
+
+        # 异步下载按同时进行的请求数计算
+        with mock.patch.dict(
+            load_settings._config.attr,
+            DOWNLOAD_ENGINE="asyncio",
+            ASYNC_CONCURRENT_REQUESTS=100,
+        ):
+            collector, _ = self.make_collector()
+        self.assertEqual(collector.get_stats()["high_watermark"], 100)
+        self.assertEqual(collector.get_stats()["low_watermark"], 50)
+
+    def test_fill_to_high_watermark(self):
+        collector, task_queue = self.make_collector()
+
+        # 尚无消费数据，直接补满到高水位
+        collector._Collector__input_data()
+        self.assertEqual(task_queue.lease_sizes, [32])
+        self.assertEqual(collector.get_stats()["queue_depth"], 32)
+        self.assertEqual(collector.get_stats()["fetch_size"], 32)
+        self.assertTrue(collector.is_collector_task())
+
+        # 低水位到高水位之间补充时，只补空出的部分
+        self.consume(collector, 30)
+        collector._Collector__input_data()
+        self.assertEqual(task_queue.lease_sizes, [32, 30])
+        self.assertEqual(collector.get_stats()["queue_depth"], 32)
+
+    def test_wait_above_low_watermark(self):
+        collector, task_queue = self.make_collector()
+        collector._Collector__input_data()
+
+        # 高于低水位时不取任务，消费到低水位后被唤醒
+        thread = threading.Thread(target=collector._Collector__input_data)
+        start = time.time()
+        thread.start()
+        self.consume(collector, 23)
+        time.sleep(0.2)
+        self.assertEqual(task_queue.lease_sizes, [32])
+
+        self.consume(collector, 1)
+        thread.join()
+        self.assertLess(time.time() - start, 1)
+        self.assertEqual(len(task_queue.lease_sizes), 2)
+        self.assertEqual(collector.get_stats()["queue_depth"], 32)
+
+    def test_drain_rate(self):
+        collector, _ = self.make_collector()
+        collector._Collector__input_data()
+
+        # 统计间隔不足0.1秒时不更新
+        self.consume(collector, 10)
+        collector._Collector__update_drain_rate()
+        self.assertEqual(collector.get_stats()["drain_rate"], 0)
+
+        collector._last_stat_time = time.time() - 1
+        collector._Collector__update_drain_rate()
+        self.assertAlmostEqual(collector.get_stats()["drain_rate"], 10, places=1)
+
+        # 指数加权平均 10 * 0.7 + 20 * 0.3
+        self.consume(collector, 20)
+        collector._last_stat_time = time.time() - 1
+        collector._Collector__update_drain_rate()
+        self.assertAlmostEqual(collector.get_stats()["drain_rate"], 13, places=1)
+
+    def test_fetch_size_by_drain_rate(self):
+        collector, task_queue = self.make_collector()
+        get_fetch_size = collector._Collector__get_fetch_size
+
+        # 取回的任务需覆盖取任务的耗时及 PREFETCH_HORIZON 内的消费
+        collector._drain_rate = 10
+        collector._fetch_latency = 0.5
+        self.assertEqual(get_fetch_size(0), 15)
+
+        # 不超过高水位
+        self.assertEqual(get_fetch_size(20), 12)
+        collector._drain_rate = 100
+        self.assertEqual(get_fetch_size(0), 32)
+
+        # 消费很慢时每次至少取1个
+        collector._drain_rate = 0.01
+        self.assertEqual(get_fetch_size(8), 1)
+
+        # 消费加快时单次取的数量随之变大
+        collector._drain_rate = 4
+        collector._fetch_latency = 0
+        collector._last_stat_time = time.time()
+        collector._Collector__input_data()
+        collector._consumed_count = 24
+        collector._last_stat_time = time.time() - 1
+        collector._Collector__input_data()
+        self.assertEqual(task_queue.lease_sizes[0], 4)
+        self.assertGreater(task_queue.lease_sizes[1], 4)
+        self.assertLessEqual(task_queue.lease_sizes[1], 28)
+
+    def test_empty_task_queue(self):
+        collector, task_queue = self.make_collector(task_count=0)
+        collector._Collector__input_data()
+
+        self.assertEqual(task_queue.lease_sizes, [32])
+        self.assertEqual(collector.get_stats()["fetch_size"], 0)
+        self.assertFalse(collector.is_collector_task())
+        self.assertIsNone(collector.get_request())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试条件请求
+---------
+@author: pikadoramon
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from beapder import Request
+from beapder.network.response_cache import SqliteResponseCache
+from beapder.network.validator_store import SqliteValidatorStore, get_validator_store
+from beapder.utils import load_settings
+
+ETAG = '"v1"'
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.send_header("ETag", ETAG)
+            self.end_headers()
+            return
+
+        body = b"<html>hello</html>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", ETAG)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestConditionalRequest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%s/page" % cls.server.server_port
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def tearDown(self):
+        get_validator_store("test").delete(Request(self.url).fingerprint)
+
+    def test_not_modified(self):
+        request = Request(self.url, conditional=True, proxies={})
+        response = request.get_response()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.not_modified)
+        request.save_validators(response)
+
+        request = Request(self.url, conditional=True, proxies={})
+        response = request.get_response()
+        self.assertEqual(response.status_code, 304)
+        self.assertTrue(response.not_modified)
+        # 携带的校验信息不参与序列化
+        self.assertNotIn("headers", request.to_dict)
+
+        # 同一个request对象重试时不再携带上次的校验信息
+        request.retry_times = 1
+        self.assertEqual(request.get_response().status_code, 200)
+
+        # 重试的请求及未开启条件请求的请求完整下载
+        request = Request(self.url, conditional=True, retry_times=1, proxies={})
+        self.assertEqual(request.get_response().status_code, 200)
+        self.assertEqual(Request(self.url, proxies={}).get_response().status_code, 200)
+
+    def test_response_cache(self):
+        cache = SqliteResponseCache(os.path.join(tempfile.mkdtemp(), "cache.db"))
+        self.addCleanup(cache.close)
+        with mock.patch.dict(
+            load_settings._config.attr, RESPONSE_CACHED_ENABLE=True
+        ), mock.patch(
+            "beapder.network.request.get_response_cache", return_value=cache
+        ):
+            request = Request(self.url, conditional=True, proxies={})
+            response = request.get_response()
+            request.save_validators(response)
+            request.save_cached(response, expire_time=0.5)
+
+            # 304 以缓存的响应回放，且不覆盖缓存
+            request = Request(self.url, conditional=True, proxies={})
+            response = request.get_response()
+            self.assertTrue(response.not_modified)
+            self.assertEqual(response.content, b"<html>hello</html>")
+            request.save_cached(response)
+            self.assertEqual(
+                cache.get(request._cached_redis_key).content, b"<html>hello</html>"
+            )
+
+            # 缓存过期后不携带校验信息，重新下载完整的响应
+            time.sleep(0.6)
+            request = Request(self.url, conditional=True, proxies={})
+            response = request.get_response()
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(response.not_modified)
+            self.assertEqual(response.content, b"<html>hello</html>")
+
+            # 服务器返回的无响应体的304不缓存
+            response.status_code = 304
+            response.not_modified = True
+            request.save_cached(response)
+            self.assertIsNone(cache.get(request._cached_redis_key))
+
+    def test_sqlite_store(self):
+        path = os.path.join(tempfile.mkdtemp(), "validators.db")
+        store = SqliteValidatorStore("test", path)
+        store.set("a", ETAG, None)
+        self.assertEqual(store.get("a"), (ETAG, None))
+        self.assertIsNone(SqliteValidatorStore("other", path).get("a"))
+        store.delete("a")
+        self.assertIsNone(store.get("a"))
+        store.close()
@@ -1,8 +1,11 @@
+import time
 import unittest
 
 from redis import Redis
 
 from beapder.dedup import Dedup
+from beapder.dedup.bloomfilter import ScalableBloomFilter
+from beapder.utils.tools import get_md5
 
 
 class TestDedup(unittest.TestCase):
@@ -102,3 +105,85 @@ class TestDedup(unittest.TestCase):
         self.datas = ["xxx", "bbb", "ccc"]
         dedup.filter_exist_data(self.datas)
         self.assertEqual(self.datas, ["ccc"])
+
+    def test_filter_exist_data_with_fingerprints(self):
+        dedup = Dedup(Dedup.LiteFilter)
+        dedup.add(["fp_xxx", "fp_bbb"])
+
+        datas = [{"id": "xxx"}, {"id": "ccc"}, {"id": "bbb"}, {"id": "ddd"}]
+        datas_fingerprints = ["fp_xxx", "fp_ccc", "fp_bbb", "fp_ddd"]
+        exist_datas = []
+        result = dedup.filter_exist_data(
+            datas, datas_fingerprints=datas_fingerprints, callback=exist_datas.append
+        )
+
+        # 原列表被修改为去重后的数据
+        self.assertEqual(result, (datas, datas_fingerprints))
+        self.assertEqual(datas, [{"id": "ccc"}, {"id": "ddd"}])
+        self.assertEqual(datas_fingerprints, ["fp_ccc", "fp_ddd"])
+        self.assertEqual(exist_datas, [{"id": "xxx"}, {"id": "bbb"}])
+
+    def test_scalable_bloomfilter(self):
+        bloomfilter = ScalableBloomFilter(
+            initial_capacity=1000, bitarray_type=ScalableBloomFilter.BASE_MEMORY
+        )
+        bloomfilter.filters[-1].add(["a", "b"])
+        bloomfilter.filters.append(bloomfilter.create_filter())
+        bloomfilter.filters[-1].add("c")
+        bloomfilter.filters.append(bloomfilter.create_filter())
+
+        # 批次内重复且不存在的key，只有第一个算为不存在
+        self.assertEqual(
+            bloomfilter.get(["a", "x", "c", "x", "a", "y"]), [1, 0, 1, 1, 1, 0]
+        )
+        self.assertEqual(bloomfilter.add(["a", "x", "x", "z", "c"]), [0, 1, 0, 1, 0])
+        self.assertEqual(bloomfilter.filters[-1].get(["x", "z", "a", "c"]), [1, 1, 0, 0])
+        self.assertEqual(bloomfilter.add("x"), 0)
+        self.assertEqual(bloomfilter.get("y"), 0)
+        self.assertEqual(bloomfilter.get(["x", "y", "z"]), [1, 0, 1])
+
+    def test_local_cache(self):
+        dedup = Dedup(
+            Dedup.BloomFilter,
+            absolute_name=self.absolute_name,
+            local_cache_size=2,
+        )
+
+        self.assertEqual(dedup.add(self.datas), [1, 1, 0])
+        # 命中本地缓存，不访问redis
+        self.assertEqual(dedup.add(["xxx", "bbb"]), [0, 0])
+        self.assertEqual(dedup.get(self.data), 0)
+        self.assertEqual(dedup.get([self.data, self.data, "xxx"]), [0, 1, 1])
+        self.assertEqual(
+            dedup.stats(),
+            {
+                "size": 2,
+                "hits": 3,
+                "misses": 6,
+                "hit_rate": 1 / 3,
+                "remote_calls": 3,
+                "remote_calls_avoided": 1,
+            },
+        )
+
+        # 超过缓存大小时淘汰，仍以redis为准
+        self.assertEqual(dedup.add(["ccc", "ddd", "xxx"]), [1, 1, 0])
+        self.assertEqual(dedup.get(["xxx", "bbb", "eee"]), [1, 1, 0])
+        self.assertEqual(Dedup(Dedup.LiteFilter).stats(), {})
+
+    def test_local_cache_expire_filter(self):
+        dedup = Dedup(
+            Dedup.ExpireFilter,
+            expire_time=10,
+            absolute_name=self.absolute_name,
+            local_cache_size=2,
+        )
+        self.assertEqual(dedup.stats(), {})
+
+        # 过期时间按最后一次添加计算，重复添加时刷新redis中的时间
+        redis = Redis.from_url("redis://@localhost:6379/0", decode_responses=True)
+        self.assertEqual(dedup.add("xxx"), 1)
+        score = redis.zscore(self.absolute_name, get_md5("xxx"))
+        time.sleep(1.1)
+        self.assertEqual(dedup.add("xxx"), 0)
+        self.assertGreater(redis.zscore(self.absolute_name, get_md5("xxx")), score)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试下载器
+---------
+@author: pikadoramon
+"""
+
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from beapder import Request
+from beapder.network.downloader import RequestsPooledDownloader
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # 返回请求携带的cookie 及 客户端端口，端口相同说明复用了连接
+        body = "{}|{}".format(
+            self.headers.get("Cookie", ""), self.client_address[1]
+        ).encode()
+        self.send_response(200)
+        if self.path == "/set":
+            self.send_header("Set-Cookie", "session=1; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestRequestsPooledDownloader(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%s" % cls.server.server_port
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.downloader = RequestsPooledDownloader()
+
+    def download(self, path, **kwargs):
+        request = Request(self.url + path, proxies={}, **kwargs)
+        request.make_requests_kwargs()
+        return self.downloader.download(request)
+
+    def test_cookie_isolation(self):
+        response = self.download("/set")
+        self.assertEqual(response.cookies.get("session"), "1")
+
+        # 上个请求返回的cookie不会带到下个请求
+        self.assertEqual(self.download("/").text.split("|")[0], "")
+        self.assertEqual(
+            self.download("/", cookies={"a": "1"}).text.split("|")[0], "a=1"
+        )
+        self.assertEqual(self.download("/").text.split("|")[0], "")
+
+    def test_keep_alive(self):
+        ports = {self.download("/").text.split("|")[1] for _ in range(5)}
+        self.assertEqual(len(ports), 1)
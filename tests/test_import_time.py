@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试 import beapder 的启动耗时及不导入可选的依赖
+---------
+@author: pikadoramon
+"""
+
+import subprocess
+import sys
+import unittest
+
+# 本机约 0.2s，留足余量，避免机器负载高时误报
+IMPORT_TIME_BUDGET = 1.5
+
+HEAVY_MODULES = (
+    "scrapy",
+    "twisted",
+    "aiohttp",
+    "influxdb",
+    "execjs",
+    "pymongo",
+    "pymysql",
+    "MySQLdb",
+    "bs4",
+    "selenium",
+    "playwright",
+)
+
+CODE = """
+import sys, time
+start = time.perf_counter()
+import beapder
+print(time.perf_counter() - start)
+print(",".join(name for name in {heavy!r} if name in sys.modules))
+""".format(
+    heavy=HEAVY_MODULES
+)
+
+
+class TestImportTime(unittest.TestCase):
+    def run_import(self):
+        output = subprocess.check_output([sys.executable, "-c", CODE], text=True)
+        cost, heavy = output.split("\n")[:2]
+        return float(cost), heavy
+
+    def test_import_time(self):
+        # 取多次中最快的一次，排除偶发的抖动
+        cost = min(self.run_import()[0] for _ in range(3))
+        self.assertLess(cost, IMPORT_TIME_BUDGET)
+
+    def test_heavy_modules_not_imported(self):
+        self.assertEqual(self.run_import()[1], "")
+
+    def test_lazy_downloader(self):
+        from beapder.network import downloader
+
+        self.assertIs(
+            downloader.RequestsDownloader,
+            downloader._requests.RequestsDownloader,
+        )
+        with self.assertRaises(AttributeError):
+            downloader.NotExistDownloader
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试ItemBuffer并发导出
+---------
+@author: pikadoramon
+"""
+
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from beapder import Item, setting
+from beapder.buffer.item_buffer import ItemBuffer
+from beapder.pipelines import BasePipeline
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAVE_COST = 0.2
+
+
+class RecordPipeline(BasePipeline):
+    thread_safe = True
+    saved = []
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def save_items(self, table, items):
+        cls = RecordPipeline
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(SAVE_COST)
+        with cls.lock:
+            cls.running -= 1
+            cls.saved.append((self.__class__.__name__, table, len(items)))
+        return True
+
+
+class OtherPipeline(RecordPipeline):
+    pass
+
+
+class FailedPipeline(RecordPipeline):
+    def save_items(self, table, items):
+        if table == "news_1":
+            raise Exception("导出失败")
+        return super().save_items(table, items)
+
+
+class NewsItem(Item):
+    pass
+
+
+def make_item_buffer(pipelines):
+    pipelines = [__name__ + "." + pipeline.__name__ for pipeline in pipelines]
+    with mock.patch.object(setting, "ITEM_PIPELINES", pipelines):
+        return ItemBuffer(redis_key="air_spider")
+
+
+def put_items(item_buffer, table_count=2):
+    for i in range(table_count * 2):
+        item = NewsItem(id=i)
+        item.table_name = "news_%s" % (i % table_count)
+        item_buffer.put_item(item)
+
+
+class TestItemBuffer(unittest.TestCase):
+    def setUp(self):
+        RecordPipeline.saved = []
+        RecordPipeline.running = RecordPipeline.max_running = 0
+
+        for name, value in (
+            ("ITEM_EXPORT_THREAD_COUNT", 4),
+            ("ITEM_FILTER_ENABLE", False),
+        ):
+            patcher = mock.patch.object(setting, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_concurrent_export(self):
+        item_buffer = make_item_buffer([RecordPipeline, OtherPipeline])
+        self.addCleanup(item_buffer.close)
+
+        callback = mock.Mock()
+        put_items(item_buffer)
+        item_buffer.put_item(callback)
+
+        start = time.time()
+        item_buffer.flush()
+        cost = time.time() - start
+
+        # 2个pipeline x 2个表 并发导出
+        self.assertEqual(
+            sorted(RecordPipeline.saved),
+            [
+                ("OtherPipeline", "news_0", 2),
+                ("OtherPipeline", "news_1", 2),
+                ("RecordPipeline", "news_0", 2),
+                ("RecordPipeline", "news_1", 2),
+            ],
+        )
+        self.assertEqual(RecordPipeline.max_running, 4)
+        self.assertLess(cost, SAVE_COST * 3)
+        callback.assert_called_once_with()
+        self.assertEqual(
+            set(item_buffer.get_export_stats()), {"RecordPipeline", "OtherPipeline"}
+        )
+
+    def test_not_thread_safe(self):
+        with mock.patch.object(OtherPipeline, "thread_safe", False):
+            item_buffer = make_item_buffer([OtherPipeline])
+        self.addCleanup(item_buffer.close)
+
+        put_items(item_buffer, table_count=3)
+        item_buffer.flush()
+        self.assertEqual(len(RecordPipeline.saved), 3)
+        self.assertEqual(RecordPipeline.max_running, 1)
+
+    def test_pipeline_failed(self):
+        item_buffer = make_item_buffer([RecordPipeline, FailedPipeline])
+        self.addCleanup(item_buffer.close)
+
+        callback = mock.Mock()
+        put_items(item_buffer)
+        item_buffer.put_item(callback)
+        item_buffer.flush()
+
+        # 其他pipeline及表照常导出，但任一导出失败时本批数据不执行回调
+        self.assertEqual(
+            sorted(RecordPipeline.saved),
+            [
+                ("FailedPipeline", "news_0", 2),
+                ("RecordPipeline", "news_0", 2),
+                ("RecordPipeline", "news_1", 2),
+            ],
+        )
+        callback.assert_not_called()
+        self.assertEqual(item_buffer.export_falied_times, 1)
+
+    def test_export_after_main_thread_exit(self):
+        # 爬虫的主线程在 spider.start() 后即退出，导出仍在后台线程中进行
+        code = """
+import threading
+import time
+from unittest import mock
+from beapder import setting
+from tests.test_item_buffer import RecordPipeline, make_item_buffer, put_items
+
+def flush():
+    while threading.main_thread().is_alive():
+        time.sleep(0.01)
+    with mock.patch.object(setting, "ITEM_FILTER_ENABLE", False):
+        item_buffer = make_item_buffer([RecordPipeline, RecordPipeline])
+        put_items(item_buffer)
+        item_buffer.flush()
+    print(len(RecordPipeline.saved))
+
+threading.Thread(target=flush).start()
+"""
+        output = subprocess.check_output(
+            [sys.executable, "-c", code], cwd=ROOT_PATH, text=True
+        )
+        self.assertEqual(output.strip(), "4")
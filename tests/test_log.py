@@ -8,7 +8,8 @@ Created on 2021/6/18 10:36 上午
 @email: boris_liu@foxmail.com
 """
 
-from beapder.utils.log import log
+import beapder.utils.tools as tools
+from beapder.utils.log import lazy, log
 
 log.debug("debug")
 log.info("info")
@@ -16,4 +17,5 @@ log.success("success")
 log.warning("warning")
 log.error("error")
 log.critical("critical")
-log.exception("exception")
\ No newline at end of file
+log.exception("exception")
+log.info("lazy %s", lazy(tools.dumps_json, {"lazy": True}))
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试代理池后台检测及补充代理
+---------
+@author: pikadoramon
+"""
+
+import asyncio
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from beapder import Request
+from beapder.network import proxy_pool
+from beapder.network.proxy_pool import ProxyItem, ProxyPool
+from beapder.utils import load_settings
+
+
+class TestProxyPool(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 可连接的端口作为有效的代理
+        cls.listeners = []
+        valid = []
+        for _ in range(3):
+            listener = socket.socket()
+            listener.bind(("127.0.0.1", 0))
+            listener.listen(16)
+            cls.listeners.append(listener)
+            valid.append("127.0.0.1:%s" % listener.getsockname()[1])
+
+        closed = socket.socket()
+        closed.bind(("127.0.0.1", 0))
+        invalid = "127.0.0.1:%s" % closed.getsockname()[1]
+        closed.close()
+
+        cls.valid = valid
+        cls.invalid = invalid
+        body = "\r\n".join(valid + [invalid]).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%s/proxies.txt" % cls.server.server_port
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        for listener in cls.listeners:
+            listener.close()
+
+    def setUp(self):
+        # 代理源的本地缓存文件写入临时目录，不写入包内
+        patcher = mock.patch.object(proxy_pool, "proxy_path", tempfile.mkdtemp())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_pool(self, **kwargs):
+        pool = ProxyPool(
+            proxy_source_url=self.url,
+            local_proxy_file_cache_timeout=0,
+            valid_timeout=1,
+            **kwargs
+        )
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_validate_in_background(self):
+        pool = self.make_pool()
+        proxies = pool.get()
+        self.assertIn(proxies["http"].replace("http://", ""), self.valid)
+
+        # 无效的代理检测后丢弃，不会被get返回
+        time.sleep(0.5)
+        self.assertIn(self.invalid, pool.invalid_proxy_dict)
+        self.assertEqual(pool.queue_size, len(self.valid))
+        got = {pool.get(timeout=0)["http"] for _ in range(10)}
+        self.assertEqual(got, {"http://" + proxy for proxy in self.valid})
+
+    def test_get_without_wait(self):
+        pool = self.make_pool(use_interval=60)
+        pool.get()
+        time.sleep(0.5)
+        for _ in range(len(self.valid) - 1):
+            self.assertTrue(pool.get(timeout=0))
+
+        # 代理都在使用间隔内，不等待直接返回
+        start = time.time()
+        self.assertIsNone(pool.get(timeout=0))
+        self.assertLess(time.time() - start, 0.5)
+
+    def test_tag_proxy(self):
+        pool = self.make_pool()
+        proxies = pool.get()
+        pool.tag_proxy(proxies, -1)
+        time.sleep(0.5)
+        got = {pool.get(timeout=0)["http"] for _ in range(10)}
+        self.assertNotIn(proxies["http"], got)
+
+    def test_tag_proxy_after_reset(self):
+        pool = self.make_pool()
+        proxies = pool.get()
+        time.sleep(0.5)
+        pool.tag_proxy(proxies, 1, delay=60)
+
+        # 重置后同一代理仍在延迟使用中
+        pool.last_reset_time = 0
+        pool.reset_proxy_pool(force=True)
+        self.assertTrue(pool.get_proxy_item(proxies=proxies).is_delay())
+
+    def test_small_source_not_reset(self):
+        # 代理源的代理数少于 min_ready_size 时，不会反复重置代理池
+        pool = self.make_pool(reset_interval=0.1)
+        pool.get()
+        with mock.patch.object(pool, "clear", wraps=pool.clear) as clear, mock.patch.object(
+            proxy_pool, "get_proxy_from_url", wraps=proxy_pool.get_proxy_from_url
+        ) as get_proxy_from_url:
+            time.sleep(1.5)
+        clear.assert_not_called()
+        get_proxy_from_url.assert_not_called()
+
+    def test_choose_by_score(self):
+        pool = self.make_pool()
+        pool.get()
+        time.sleep(0.5)
+        bad, *good = ["http://" + proxy for proxy in self.valid]
+        for _ in range(3):
+            pool.report({"http": bad}, success=False, banned=True)
+        for proxies in good:
+            pool.report({"http": proxies}, latency=0.1)
+
+        # 每次随机取两个代理使用评分高的，评分最低的不会被选中
+        got = {pool.get(timeout=0)["http"] for _ in range(30)}
+        self.assertEqual(got, set(good))
+
+    def test_sync_stats(self):
+        stats_key = "test:h_proxy_stats"
+        pools = [self.make_pool(share_stats=True, stats_key=stats_key) for _ in range(2)]
+        for pool in pools:
+            pool._redisdb = None
+            pool.get()
+        time.sleep(0.5)
+        self.addCleanup(lambda: pools[0]._redisdb.clear(stats_key))
+
+        proxies = {"http": "http://" + self.valid[0]}
+        pools[0].report(proxies, latency=0.2)
+        pools[0].sync_stats()
+        pools[1].sync_stats()
+        proxy_item = pools[1].get_proxy_item(proxies=proxies)
+        self.assertEqual(proxy_item.success_count, 1)
+        self.assertAlmostEqual(proxy_item.latency, 0.2)
+
+        # 只合并其他进程新增的统计，不重复累加
+        pools[0].report(proxies, success=False, banned=True)
+        pools[0].sync_stats()
+        pools[1].sync_stats()
+        pools[1].sync_stats()
+        self.assertEqual(proxy_item.success_count, 1)
+        self.assertEqual(proxy_item.failure_count, 1)
+        self.assertGreater(proxy_item.get_ban_score(), 0)
+        self.assertEqual(pools[0].get_proxy_item(proxies=proxies).failure_count, 1)
+
+    def test_bounded_sample(self):
+        pool = self.make_pool(use_interval=60)
+        # 维护线程不重置代理池，只取手动放入的代理
+        patcher = mock.patch.object(pool, "reset_proxy_pool")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        pool.start()
+        for i in range(100):
+            proxy = "http://127.0.0.1:%s" % (10000 + i)
+            proxy_item = ProxyItem({"http": proxy, "https": proxy}, use_interval=60)
+            proxy_item.use_ts = time.time()
+            pool.proxy_dict[proxy_item.proxy_id] = proxy_item
+            pool.proxy_queue.put_nowait(proxy_item)
+
+        # 都在使用间隔内时，取样的代理数有上限，不遍历全部就绪的代理
+        with mock.patch.object(
+            pool.proxy_queue, "sample", wraps=pool.proxy_queue.sample
+        ) as sample:
+            self.assertIsNone(pool.get(timeout=0))
+        self.assertLessEqual(
+            sum(call.args[0] for call in sample.call_args_list),
+            2 + 8 + ProxyPool.MAX_SAMPLE_SIZE,
+        )
+
+
+class TestRequestProxies(unittest.TestCase):
+    def test_make_proxies_async(self):
+        pool = mock.Mock()
+        pool.get.side_effect = [None, None, {"http": "http://127.0.0.1:8888"}]
+        ticks = []
+
+        async def tick():
+            for _ in range(5):
+                ticks.append(time.time())
+                await asyncio.sleep(0.05)
+
+        async def main():
+            request = Request("http://www.example.com")
+            request.make_requests_kwargs(wait_proxies=False)
+            await asyncio.gather(request.make_proxies_async(), tick())
+            return request
+
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        with mock.patch.object(Request, "proxies_pool", pool), mock.patch.dict(
+            load_settings._config.attr,
+            PROXY_ENABLE=True,
+            PROXY_EXTRACT_API="http://127.0.0.1/",
+        ):
+            request = loop.run_until_complete(main())
+
+        # 无可用代理时不阻塞事件循环等待
+        pool.get.assert_called_with(timeout=0)
+        self.assertEqual(len(ticks), 5)
+        self.assertEqual(request.get_proxies(), {"http": "http://127.0.0.1:8888"})
+        self.assertFalse(request.custom_proxies)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试redis批量读写位
+---------
+@author: pikadoramon
+"""
+
+import unittest
+from unittest import mock
+
+from beapder.db import redisdb
+from beapder.db.redisdb import RedisDB
+
+
+class TestRedisBits(unittest.TestCase):
+    table = "test_redis_bits"
+
+    def setUp(self):
+        self.redis = RedisDB(url="redis://localhost:6379/0")
+        self.redis.clear(self.table)
+
+    def tearDown(self):
+        self.redis.clear(self.table)
+
+    def test_setbit_getbit(self):
+        # 批次内重复的偏移量返回前一次设置后的值
+        self.assertEqual(self.redis.setbit(self.table, [1, 5, 1], 1), [0, 0, 1])
+        self.assertEqual(self.redis.getbit(self.table, [0, 1, 5, 2**32 - 1]), [0, 1, 1, 0])
+        self.assertEqual(self.redis.setbit(self.table, [1, 7], [0, 1]), [1, 0])
+        self.assertEqual(self.redis.getbit(self.table, [1, 7]), [0, 1])
+        self.assertEqual(self.redis.setbit(self.table, 9, 1), 0)
+        self.assertEqual(self.redis.getbit(self.table, 9), 1)
+        self.assertEqual(self.redis.getbit(self.table, []), [])
+
+    def test_chunk(self):
+        offsets = list(range(0, 1000, 3))
+        with mock.patch.object(redisdb, "BITS_SCRIPT_CHUNK_SIZE", 7):
+            self.assertEqual(self.redis.setbit(self.table, offsets, 1), [0] * len(offsets))
+            self.assertEqual(
+                self.redis.getbit(self.table, list(range(1000))),
+                [int(i % 3 == 0) for i in range(1000)],
+            )
+
+        # 脚本被清除后重新加载
+        self.redis.get_redis_obj().script_flush()
+        with mock.patch.object(redisdb, "BITS_SCRIPT_CHUNK_SIZE", 7):
+            self.assertEqual(self.redis.setbit(self.table, offsets, 0), [1] * len(offsets))
+        self.redis.get_redis_obj().script_flush()
+        with mock.patch.object(redisdb, "BITS_SCRIPT_CHUNK_SIZE", 7):
+            self.assertEqual(self.redis.getbit(self.table, offsets), [0] * len(offsets))
+
+    def test_bytes_response(self):
+        redis = RedisDB(url="redis://localhost:6379/0", decode_responses=False)
+        self.assertEqual(redis.setbit(self.table, [3, 4], 1), [0, 0])
+        self.assertEqual(redis.getbit(self.table, [3, 4, 5]), [1, 1, 0])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试request编解码器
+---------
+@author: pikadoramon
+"""
+
+import unittest
+
+from beapder import Request
+from beapder.network.request_codec import MsgpackRequestCodec, ReprRequestCodec
+
+
+class TestRequestCodec(unittest.TestCase):
+    def setUp(self) -> None:
+        self.request = Request(
+            "https://example.com/list?page=1",
+            callback="parse_list",
+            priority=10,
+            headers={"Referer": "https://example.com"},
+            timeout=(3, 10),
+            data={"keyword": "beapder"},
+            page=1,
+            tags={"a", "b"},
+        )
+        self.request_dict = self.request.to_dict
+
+    def test_msgpack_roundtrip(self):
+        codec = MsgpackRequestCodec()
+        data = codec.dumps(self.request)
+
+        self.assertIsInstance(data, bytes)
+        self.assertTrue(data.startswith(MsgpackRequestCodec.HEADER))
+        self.assertFalse(codec.is_legacy(data))
+
+        request_dict = codec.loads(data)
+        self.assertEqual(request_dict, self.request_dict)
+        self.assertIsInstance(request_dict["timeout"], tuple)
+
+        request = Request.from_dict(request_dict)
+        self.assertEqual(request.url, self.request.url)
+        self.assertEqual(request.tags, {"a", "b"})
+        self.assertEqual(request.fingerprint, self.request.fingerprint)
+
+    def test_legacy_detect(self):
+        codec = MsgpackRequestCodec()
+        legacy = str(self.request_dict)
+
+        self.assertTrue(codec.is_legacy(legacy))
+        self.assertTrue(codec.is_legacy(legacy.encode()))
+        self.assertEqual(codec.loads(legacy.encode()), self.request_dict)
+
+        # 老版本数据只解析字面量，不执行代码
+        with self.assertRaises(ValueError):
+            codec.loads("{'url': __import__('os').getcwd()}")
+
+    def test_repr_codec(self):
+        codec = ReprRequestCodec()
+        data = codec.dumps(self.request)
+
+        self.assertEqual(data, str(self.request_dict).encode())
+        self.assertEqual(codec.loads(data), self.request_dict)
+
+    def test_unknown_version(self):
+        codec = MsgpackRequestCodec()
+        data = codec.dumps(self.request)
+
+        with self.assertRaises(ValueError):
+            codec.loads(MsgpackRequestCodec.MAGIC + b"\x09" + data[2:])
+
+
+if __name__ == "__main__":
+    unittest.main()
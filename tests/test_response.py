@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试response 流式读取响应体
+---------
+@author: pikadoramon
+"""
+
+import codecs
+import io
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from beapder import Request
+from beapder.network.document import Document
+from beapder.network.response import Response, ResponseTooLarge
+
+BODY = '<html><head><meta charset="gbk"></head><body>{}</body></html>'.format(
+    "中文" * 50000
+).encode("gbk")
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        if self.path == "/chunked":
+            # 不返回 Content-Length，只能在读取时判断大小
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(BODY), 8192):
+                chunk = BODY[i : i + 8192]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestResponseStream(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        cls.url = "http://127.0.0.1:%s" % cls.server.server_port
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def get_response(self, path="/", **kwargs):
+        return Request(self.url + path, proxies={}, **kwargs).get_response()
+
+    def test_lazy_encoding(self):
+        response = self.get_response("/chunked")
+        # 只预读开头部分猜测编码，不读取全部响应体
+        self.assertEqual(response.encoding, "gb18030")
+        self.assertIs(response._content, False)
+        self.assertEqual(response.content, BODY)
+        self.assertIn("中文中文", response.text)
+
+    def test_max_body_size(self):
+        self.assertRaises(
+            ResponseTooLarge, self.get_response, max_body_size=len(BODY) - 1
+        )
+
+        response = self.get_response("/chunked", max_body_size=len(BODY) - 1)
+        with self.assertRaises(ResponseTooLarge):
+            response.content
+
+        response = self.get_response("/chunked", max_body_size=len(BODY))
+        self.assertEqual(response.content, BODY)
+
+    def test_save_to(self):
+        response = self.get_response("/chunked")
+        response.encoding
+        file = io.BytesIO()
+        self.assertEqual(response.save_to(file, chunk_size=1024), len(BODY))
+        self.assertEqual(file.getvalue(), BODY)
+
+        chunks = []
+        response = self.get_response()
+        self.assertEqual(response.stream_to(chunks.append), len(BODY))
+        self.assertEqual(b"".join(chunks), BODY)
+
+
+class TestResponseText(unittest.TestCase):
+    URL = "https://www.example.com/list/index.html?page=1"
+
+    def make_response(self, body, headers=None, make_absolute_links=True):
+        response = Response.from_dict(
+            {
+                "_content": body,
+                "cookies": {},
+                "encoding": None,
+                "headers": headers or {"Content-Type": "text/html"},
+                "status_code": 200,
+                "elapsed": 0,
+                "url": self.URL,
+            }
+        )
+        response.make_absolute_links = make_absolute_links
+        return response
+
+    def test_absolute_links(self):
+        html = (
+            '<link href="/a.css"><script src="//cdn.com/a.js"></script>'
+            '<a class="x" href="b.html">b</a><a data-href="c.html" href="../d.html">d</a>'
+            '<img src="https://img.com/e.png"><a href="javascript:;">f</a><a href="">g</a>'
+        )
+        self.assertEqual(
+            self.make_response(html.encode()).text,
+            '<link href="https://www.example.com/a.css"><script src="https://cdn.com/a.js"></script>'
+            '<a class="x" href="https://www.example.com/list/b.html">b</a>'
+            '<a data-href="c.html" href="https://www.example.com/d.html">d</a>'
+            '<img src="https://img.com/e.png"><a href="javascript:;">f</a><a href="">g</a>',
+        )
+
+    def test_absolute_links_in_selector(self):
+        response = self.make_response(
+            b'<a href="b.html">b</a><a data-href="c.html"></a>',
+            make_absolute_links="selector",
+        )
+        self.assertEqual(response.text, '<a href="b.html">b</a><a data-href="c.html"></a>')
+        self.assertEqual(
+            response.xpath("//a/@href").get(), "https://www.example.com/list/b.html"
+        )
+        self.assertEqual(
+            response.css("a")[0].css("::attr(href)").get(),
+            "https://www.example.com/list/b.html",
+        )
+        self.assertEqual(response.xpath("//a/@data-href").get(), "c.html")
+
+    def test_encoding(self):
+        self.assertEqual(
+            self.make_response(codecs.BOM_UTF8 + "中文".encode()).text, "中文"
+        )
+        self.assertEqual(
+            self.make_response(
+                "中文".encode("gbk"), {"Content-Type": "text/html; charset=gbk"}
+            ).encoding,
+            "gb18030",
+        )
+        self.assertEqual(self.make_response("中文".encode()).encoding, "utf-8")
+        self.assertEqual(self.make_response("中文".encode("utf-16")).text, "中文")
+
+
+class TestResponseDocument(unittest.TestCase):
+    def test_shared_document(self):
+        response = Response.from_text(
+            '<html><body><a href="/a">a&nbsp;b</a></body></html>',
+            url="https://www.example.com/",
+        )
+        count = Document.stats()["count"]
+
+        self.assertIs(response.selector.root, response.document)
+        self.assertEqual(response.xpath("//a/text()").get(), "a b")
+        self.assertEqual(response.document.xpath("//a/@href"), ["https://www.example.com/a"])
+        self.assertIs(response.bs4(), response.bs4())
+        self.assertEqual(Document.stats()["count"], count + 1)
+
+        response.release_document()
+        self.assertEqual(Document.stats()["count"], count)
+        self.assertIsNone(response._cached_selector)
+
+        # 释放后再使用时重新解析
+        self.assertEqual(response.css("a::attr(href)").get(), "https://www.example.com/a")
+        self.assertEqual(Document.stats()["count"], count + 1)
+        del response
+        self.assertEqual(Document.stats()["count"], count)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试response缓存
+---------
+@author: pikadoramon
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from beapder import Request
+from beapder.db.redisdb import RedisDB
+from beapder.network.response import Response
+from beapder.network.response_cache import (
+    RedisResponseCache,
+    ResponseCodec,
+    SqliteResponseCache,
+)
+
+
+def make_response(body=b"<html>hello</html>", headers=None):
+    return Response.from_dict(
+        {
+            "_content": body,
+            "cookies": {"session": "1"},
+            "encoding": None,
+            "headers": headers or {"Content-Type": "text/html; charset=utf-8"},
+            "status_code": 200,
+            "elapsed": 1000,
+            "url": "https://www.example.com/",
+        }
+    )
+
+
+class TestResponseCodec(unittest.TestCase):
+    def test_codec(self):
+        body = "中文".encode() * 1000
+        for compression in ("", "gzip"):
+            codec = ResponseCodec(compression)
+            data = codec.encode(make_response(body))
+            response = codec.decode(data)
+            self.assertEqual(response.content, body)
+            self.assertEqual(response.text, "中文" * 1000)
+            self.assertEqual(response.headers["content-type"], "text/html; charset=utf-8")
+            self.assertEqual(response.cookies.get_dict(), {"session": "1"})
+            self.assertEqual(response.elapsed.microseconds, 1000)
+
+        self.assertLess(len(ResponseCodec("gzip").encode(make_response(body))), len(body))
+
+    def test_legacy(self):
+        response = ResponseCodec().decode(str(make_response().to_dict))
+        self.assertEqual(response.content, b"<html>hello</html>")
+
+        # 老版本数据按字面量解析，不执行其中的代码
+        self.assertRaises(
+            ValueError, ResponseCodec().decode, "{'url': __import__('os').getpid()}"
+        )
+
+
+class TestSqliteResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "cache.db")
+
+    def tearDown(self):
+        self.cache.close()
+
+    def test_get_set(self):
+        self.cache = SqliteResponseCache(self.path, max_size=0)
+        response = make_response(
+            headers={"ETag": '"abc"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}
+        )
+        self.cache.set("a", response)
+        self.assertEqual(self.cache.get("a").content, response.content)
+        self.assertEqual(
+            self.cache.get_metadata("a"),
+            {"etag": '"abc"', "last_modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+        )
+        self.assertIsNone(self.cache.get_metadata("b"))
+
+        self.cache.delete("a")
+        self.assertIsNone(self.cache.get("a"))
+
+        self.cache.set("c", response, expire_time=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get("c"))
+
+    def test_evict(self):
+        self.cache = SqliteResponseCache(self.path, max_size=0, compression="")
+        self.cache.set("0", make_response(os.urandom(1000)))
+        size = self.cache._size
+
+        self.cache = SqliteResponseCache(self.path, max_size=size * 5, compression="")
+        for i in range(1, 5):
+            self.cache.set(str(i), make_response(os.urandom(1000)))
+        # 访问过的不淘汰
+        self.cache.get("0")
+        self.cache.set("5", make_response(os.urandom(1000)))
+
+        self.assertLessEqual(self.cache._size, size * 5)
+        self.assertIsNotNone(self.cache.get("0"))
+        self.assertIsNone(self.cache.get("1"))
+        self.assertIsNotNone(self.cache.get("5"))
+
+
+class TestRedisResponseCache(unittest.TestCase):
+    def test_get_set(self):
+        cache = RedisResponseCache()
+        cache.set("response_cached:test:test_response_cache", make_response(), 10)
+        response = cache.get("response_cached:test:test_response_cache")
+        self.assertEqual(response.content, b"<html>hello</html>")
+
+        cache.delete("response_cached:test:test_response_cache")
+        self.assertIsNone(cache.get("response_cached:test:test_response_cache"))
+
+    def test_cache_db(self):
+        # 兼容老版本的 Request.cache_db，默认解码响应的RedisDB也可使用
+        request = Request("https://www.example.com/test_cache_db")
+        with mock.patch.object(Request, "cache_db", RedisDB()):
+            request.save_cached(make_response(), expire_time=10)
+            self.assertEqual(
+                request.get_response_from_cached().content, b"<html>hello</html>"
+            )
+            request.del_response_cached()
+            self.assertIsNone(Request.cache_db.strget(request._cached_redis_key))
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试按域名调度下载
+---------
+@author: pikadoramon
+"""
+
+import queue
+import time
+import unittest
+from collections import deque
+
+from beapder import Request
+from beapder.core.slot_scheduler import SlotScheduler
+
+
+def task_source(urls):
+    tasks = deque(Request(url) for url in urls)
+    return lambda timeout: tasks.popleft() if tasks else None
+
+
+def blocking_task_source(urls):
+    tasks = queue.Queue()
+    for url in urls:
+        tasks.put(Request(url))
+
+    def get_task(timeout):
+        try:
+            return tasks.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    return get_task
+
+
+def get_request(task):
+    return task
+
+
+class TestSlotScheduler(unittest.TestCase):
+    def test_concurrency(self):
+        scheduler = SlotScheduler(concurrency=1)
+        get_task = task_source(
+            ["https://a.com/1", "https://a.com/2", "https://b.com/1"]
+        )
+
+        task_a1 = scheduler.get(get_task, get_request)
+        # a.com 并发已满，a.com/2 暂存，先处理 b.com
+        task_b1 = scheduler.get(get_task, get_request)
+        self.assertEqual(task_a1.url, "https://a.com/1")
+        self.assertEqual(task_b1.url, "https://b.com/1")
+        self.assertEqual(scheduler.held_count, 1)
+
+        self.assertIsNone(scheduler.get(get_task, get_request, timeout=0.1))
+
+        scheduler.release(task_a1)
+        scheduler.release(task_a1)
+        task_a2 = scheduler.get(get_task, get_request, timeout=0.1)
+        self.assertEqual(task_a2.url, "https://a.com/2")
+        self.assertEqual(scheduler.held_count, 0)
+
+    def test_delay(self):
+        scheduler = SlotScheduler(delay=0.2)
+        get_task = task_source(["https://a.com/1", "https://a.com/2"])
+
+        start = time.time()
+        task = scheduler.get(get_task, get_request)
+        scheduler.release(task)
+        task = scheduler.get(get_task, get_request)
+        self.assertEqual(task.url, "https://a.com/2")
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_blocking_task_source(self):
+        # 取新任务时最多等到暂存的任务可下载，不阻塞到取任务超时
+        scheduler = SlotScheduler(delay=0.01)
+        get_task = blocking_task_source(["https://a.com/%s" % i for i in range(20)])
+
+        start = time.time()
+        for _ in range(20):
+            task = scheduler.get(get_task, get_request)
+            self.assertIsNotNone(task)
+            scheduler.release(task)
+        self.assertLess(time.time() - start, 1)
+
+    def test_autothrottle(self):
+        scheduler = SlotScheduler(
+            delay=0.1, autothrottle=True, start_delay=1, max_delay=2
+        )
+        get_task = task_source(["https://a.com/%s" % i for i in range(3)])
+        task = scheduler.get(get_task, get_request)
+        slot = scheduler._slots["a.com"]
+        self.assertEqual(slot.delay, 1)
+
+        scheduler.release(task, latency=0.2)
+        self.assertAlmostEqual(slot.delay, 0.6)
+
+        slot.last_time = 0
+        task = scheduler.get(get_task, get_request)
+        # 下载失败时间隔不缩短
+        scheduler.release(task, latency=0.01, success=False)
+        self.assertAlmostEqual(slot.delay, 0.6)
+
+        slot.last_time = 0
+        task = scheduler.get(get_task, get_request)
+        scheduler.release(task, latency=10)
+        self.assertEqual(slot.delay, 2)
+
+    def test_slot_by_proxy(self):
+        scheduler = SlotScheduler(slot_by="proxy")
+        request = Request(
+            "https://a.com", proxies={"https": "http://127.0.0.1:8080"}
+        )
+        self.assertEqual(scheduler.get_slot_key(request), "http://127.0.0.1:8080")
+        self.assertEqual(scheduler.get_slot_key(Request("https://a.com")), "a.com")
+
+    def test_renew_held_tasks(self):
+        scheduler = SlotScheduler(concurrency=1, renew_interval=0.1)
+        get_task = task_source(["https://a.com/1", "https://a.com/2"])
+        renewed = []
+
+        task_a1 = scheduler.get(get_task, get_request, renew_tasks=renewed.extend)
+        self.assertIsNone(
+            scheduler.get(get_task, get_request, timeout=0.1, renew_tasks=renewed.extend)
+        )
+        self.assertEqual(renewed, [])
+
+        # 暂存超过续约间隔的任务被续约，下载中的任务不续约
+        time.sleep(0.1)
+        scheduler.get(get_task, get_request, timeout=0, renew_tasks=renewed.extend)
+        self.assertEqual([task.url for task in renewed], ["https://a.com/2"])
+        self.assertIsNot(renewed[0], task_a1)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试多进程解析 SPIDER_PROCESS_COUNT，需要本地redis
+---------
+@author: pikadoramon
+"""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = """
+import json
+import os
+import threading
+import time
+
+import beapder
+from beapder import Item, setting
+from beapder.db.redisdb import RedisDB
+from beapder.network.response import Response
+from beapder.pipelines import BasePipeline
+
+PAGE_COUNT = 40
+REDIS_KEY = "test:spider_process"
+STAT_KEY = REDIS_KEY + ":stat"
+
+
+class StatPipeline(BasePipeline):
+    thread_safe = True
+
+    def save_items(self, table, items):
+        RedisDB().hincrby(STAT_KEY, os.getpid(), len(items))
+        return True
+
+
+class PageItem(Item):
+    pass
+
+
+class ProcessSpider(beapder.Spider):
+    __custom_setting__ = dict(
+        SPIDER_THREAD_COUNT=2,
+        SPIDER_PROCESS_COUNT=2,
+        LOG_LEVEL="ERROR",
+    )
+
+    def _start_worker_processes(self):
+        # 记录fork时所在的线程及其他运行中的线程
+        if not self._worker_processes:
+            fork_threads.append(
+                (
+                    threading.current_thread() is threading.main_thread(),
+                    threading.active_count(),
+                )
+            )
+        super()._start_worker_processes()
+
+    def start_requests(self):
+        for i in range(PAGE_COUNT):
+            yield beapder.Request("https://example.com/list?page=%s" % i)
+
+    def download_midware(self, request):
+        return request, Response.from_text("<html></html>", url=request.url)
+
+    def parse(self, request, response):
+        time.sleep(0.05)
+        yield PageItem(url=request.url)
+
+
+setting.ITEM_PIPELINES = ["__main__.StatPipeline"]
+setting.ITEM_UPLOAD_INTERVAL = 0.1
+
+fork_threads = []
+redis = RedisDB()
+for key in redis.getkeys(REDIS_KEY + "*"):
+    redis.clear(key)
+
+spider = ProcessSpider(redis_key=REDIS_KEY, delete_keys=True)
+spider.start()
+spider.join()
+
+stat = {int(pid): int(count) for pid, count in redis.hgetall(STAT_KEY).items()}
+for key in redis.getkeys(REDIS_KEY + "*"):
+    redis.clear(key)
+print(json.dumps({"fork_threads": fork_threads, "stat": stat, "pid": os.getpid()}))
+"""
+
+
+class TestSpiderProcess(unittest.TestCase):
+    def test_worker_process(self):
+        output = subprocess.check_output(
+            [sys.executable, "-c", CODE], cwd=ROOT_PATH, text=True, timeout=120
+        )
+        result = json.loads(output.strip().splitlines()[-1])
+
+        # 在主线程中、爬虫的线程启动前fork
+        self.assertEqual(result["fork_threads"], [[True, 1]])
+
+        # 主进程与子进程共同消费任务
+        stat = {int(pid): count for pid, count in result["stat"].items()}
+        self.assertEqual(sum(stat.values()), 40)
+        self.assertEqual(len(stat), 2)
+        self.assertIn(result["pid"], stat)
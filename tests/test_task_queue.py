@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试任务队列 需要本地redis
+---------
+@author: pikadoramon
+"""
+
+import unittest
+
+from beapder import Request
+from beapder.core.task_queue import (
+    ShardedZSetTaskQueue,
+    StreamTaskQueue,
+    ZSetTaskQueue,
+)
+from beapder.db.redisdb import RedisDB
+
+
+class TaskQueueTestMixin:
+    task_queue_cls = None
+    redis_key = None
+
+    def setUp(self) -> None:
+        self.redis = RedisDB()
+        self.clear()
+        self.task_queue = self.task_queue_cls(self.redis_key)
+
+    def tearDown(self) -> None:
+        self.clear()
+
+    def clear(self):
+        for key in self.redis.getkeys(self.redis_key + "*"):
+            self.redis.clear(key)
+
+    def test_lease_by_priority(self):
+        self.task_queue.put([b"low", b"normal", b"high"], [500, 300, 10])
+        self.assertEqual(self.task_queue.get_count(), 3)
+
+        tasks = self.task_queue.lease(2)
+        self.assertEqual([data for _, data in tasks], [b"high", b"normal"])
+
+        tasks.extend(self.task_queue.lease(10))
+        self.assertEqual(len(tasks), 3)
+        self.assertEqual(self.task_queue.lease(10), [])
+
+        # 已取出未确认的任务仍计入任务数
+        self.assertEqual(self.task_queue.get_count(), 3)
+        self.assertEqual(self.task_queue.ack([handle for handle, _ in tasks]), 3)
+        self.assertEqual(self.task_queue.get_count(), 0)
+
+    def test_release(self):
+        self.task_queue.put([b"a", b"b"], [300, 300])
+        tasks = self.task_queue.lease(10)
+        self.assertEqual(self.task_queue.lease(10), [])
+
+        self.assertEqual(self.task_queue.release([handle for handle, _ in tasks]), 2)
+        self.assertEqual(sorted(data for _, data in self.task_queue.lease(10)), [b"a", b"b"])
+
+
+class TestZSetTaskQueue(TaskQueueTestMixin, unittest.TestCase):
+    task_queue_cls = ZSetTaskQueue
+    redis_key = "test:zset_task_queue"
+
+
+class TestStreamTaskQueue(TaskQueueTestMixin, unittest.TestCase):
+    task_queue_cls = StreamTaskQueue
+    redis_key = "test:stream_task_queue"
+
+    def test_reset_lost_tasks(self):
+        self.task_queue.put([b"a", b"b"], [300, 300])
+        self.assertEqual(len(self.task_queue.lease(10)), 2)
+
+        # 其他进程的消费者重置后认领
+        task_queue = StreamTaskQueue(self.redis_key)
+        self.assertEqual(task_queue.reset_lost_tasks(), 2)
+        self.assertEqual(len(task_queue.lease(10)), 2)
+
+
+class TestShardedZSetTaskQueue(TaskQueueTestMixin, unittest.TestCase):
+    task_queue_cls = ShardedZSetTaskQueue
+    redis_key = "test:sharded_task_queue"
+
+    def put(self, urls):
+        requests = [Request(url) for url in urls]
+        self.task_queue.put(
+            [request.url.encode() for request in requests],
+            [300] * len(requests),
+            [self.task_queue.get_shard_key(request) for request in requests],
+        )
+
+    def test_lease_by_priority(self):
+        # 优先级只在分片内有效，同一分片的任务按优先级下发
+        self.task_queue.put(
+            [b"low", b"normal", b"high"], [500, 300, 10], ["key", "key", "key"]
+        )
+        tasks = self.task_queue.lease(2)
+        self.assertEqual([data for _, data in tasks], [b"high", b"normal"])
+
+    def test_get_handle_data(self):
+        # 确认完成时按编码后的request排除刚重新添加的任务
+        self.put(["https://example.com/1"])
+        (handle, data), = self.task_queue.lease(1)
+        self.assertEqual(self.task_queue.get_handle_data(handle), data)
+
+    def test_work_stealing(self):
+        self.put(["https://example.com/%s" % i for i in range(100)])
+        self.assertEqual(self.task_queue.get_count(), 100)
+        self.assertGreater(len(self.redis.getkeys(self.redis_key + "*")), 1)
+
+        # 主分片取完后从其他分片窃取
+        tasks = self.task_queue.lease(1000)
+        self.assertEqual(len(tasks), 100)
+        self.assertEqual(self.task_queue.ack([handle for handle, _ in tasks]), 100)
+        self.assertEqual(self.task_queue.get_count(), 0)
+
+    def test_shard_by_domain(self):
+        self.task_queue._shard_by = "domain"
+        self.put(["https://example.com/%s" % i for i in range(100)])
+        self.assertEqual(len(self.redis.getkeys(self.redis_key + "*")), 1)
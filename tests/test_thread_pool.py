@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Created on 2026/10/18
+---------
+@summary: 测试守护线程的线程池
+---------
+@author: pikadoramon
+"""
+
+import asyncio
+import unittest
+
+from beapder.utils.thread_pool import ThreadPool
+
+
+class TestThreadPool(unittest.TestCase):
+    def test_submit(self):
+        pool = ThreadPool(max_workers=2)
+        futures = [pool.submit(pow, i, 2) for i in range(10)]
+        self.assertEqual([future.result() for future in futures], [i * i for i in range(10)])
+        self.assertLessEqual(len(pool._threads), 2)
+
+        future = pool.submit(int, "x")
+        self.assertRaises(ValueError, future.result)
+
+        pool.shutdown()
+        self.assertRaises(RuntimeError, pool.submit, pow, 1, 2)
+
+    def test_default_executor(self):
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPool(max_workers=1))
+        try:
+            result = loop.run_until_complete(loop.run_in_executor(None, pow, 3, 2))
+        finally:
+            loop.close()
+        self.assertEqual(result, 9)